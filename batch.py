@@ -0,0 +1,140 @@
+import csv
+import json
+import os
+import shutil
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Tuple
+
+from main import CPU_WORKERS, IO_WORKERS, RENDER_WORKERS, run_streaming_pipeline
+from utils.output_dirs import BATCH_OUTPUT_DIR
+from utils.parallel import run_in_parallel
+from utils.scheduler import DONE, FAILED, DagScheduler
+from utils.workspace import Workspace
+
+DEFAULT_NUM_ITEMS = 5
+# Every job writes to its own workspace and all of them share one OpenAI client, rate
+# limit governor, caches and worker pools, so jobs only compete for pool slots.
+MAX_CONCURRENT_JOBS = 4
+SUMMARY_FILE_NAME = "batch_summary.json"
+
+
+def read_topics(path: str) -> Tuple[List[Tuple[str, int]], List[dict]]:
+    """
+    Read the batch file: one "topic,num_items" per line. The item count may be left out
+    (DEFAULT_NUM_ITEMS is used); blank lines and lines starting with # are ignored.
+    Returns the jobs to run and a failed summary entry for every row whose item count is
+    not a positive integer, so one bad row does not stop the rest of the batch.
+    """
+    jobs = []
+    invalid_rows = []
+    with open(path, newline='') as f:
+        for line_number, row in enumerate(csv.reader(f), start=1):
+            if not row or not row[0].strip() or row[0].lstrip().startswith("#"):
+                continue
+            topic = row[0].strip()
+            count = row[1].strip() if len(row) > 1 else ""
+            try:
+                num_items = int(count) if count else DEFAULT_NUM_ITEMS
+                if num_items < 1:
+                    raise ValueError
+            except ValueError:
+                print(f"Skipping line {line_number} of {path}: invalid item count '{count}'")
+                invalid_rows.append({
+                    "topic": topic,
+                    "line": line_number,
+                    "status": "failed",
+                    "error": f"Invalid item count '{count}': must be a positive integer",
+                })
+                continue
+            jobs.append((topic, num_items))
+    return jobs, invalid_rows
+
+
+def run_job(topic: str, num_items: int, scheduler: DagScheduler) -> dict:
+    """
+    Generate one video in a fresh workspace and move it to the batch output directory,
+    named after the workspace.
+    Returns the job's entry for the batch summary.
+    """
+    print(f"\n=== {topic} ({num_items} items) ===")
+    workspace = Workspace.for_run(topic)
+    start = time.monotonic()
+    result = {"topic": topic, "num_items": num_items, "workspace": workspace.root}
+    try:
+        tasks = run_streaming_pipeline(topic, num_items, scheduler=scheduler, workspace=workspace)
+    except Exception as e:
+        tasks = {}
+        result["error"] = str(e)
+
+    video_task = tasks.get("video")
+    if video_task is not None and video_task.state == DONE:
+        os.makedirs(BATCH_OUTPUT_DIR, exist_ok=True)
+        # Named after the run's workspace (<topic>_<timestamp>_<id>), so topics that give the
+        # same folder name, or a topic listed twice, never overwrite each other's video
+        video_path = os.path.join(BATCH_OUTPUT_DIR, f"{os.path.basename(os.path.normpath(workspace.root))}.mp4")
+        shutil.move(workspace.video_output_path, video_path)
+        result["status"] = "succeeded"
+        result["video_path"] = video_path
+    else:
+        result["status"] = "failed"
+
+    result["failed_tasks"] = {task.name: str(task.error) for task in tasks.values() if task.state == FAILED}
+    if result["status"] == "failed" and "error" not in result and result["failed_tasks"]:
+        result["error"] = "; ".join(f"{name}: {error}" for name, error in result["failed_tasks"].items())
+    result["tasks"] = scheduler.summary()
+    result["duration_seconds"] = round(time.monotonic() - start, 2)
+    return result
+
+
+def run_batch(topics_path: str, max_concurrent_jobs: int = MAX_CONCURRENT_JOBS) -> List[dict]:
+    """
+    Generate a video for every topic in the batch file on one set of worker pools and
+    write a per-topic summary to the batch output directory.
+
+    Args:
+        topics_path (str): CSV file with one "topic,num_items" per line
+        max_concurrent_jobs (int): Number of topics processed at the same time
+    """
+    jobs, invalid_rows = read_topics(topics_path)
+    io_executor = ThreadPoolExecutor(max_workers=IO_WORKERS, thread_name_prefix="io")
+    cpu_executor = ThreadPoolExecutor(max_workers=CPU_WORKERS, thread_name_prefix="cpu")
+    render_executor = ThreadPoolExecutor(max_workers=RENDER_WORKERS, thread_name_prefix="render")
+
+    def run_shared_job(topic: str, num_items: int) -> dict:
+        scheduler = DagScheduler(io_executor=io_executor, cpu_executor=cpu_executor, render_executor=render_executor)
+        return run_job(topic, num_items, scheduler)
+
+    errors = {}
+
+    def on_error(index, args, e):
+        print(f"Job for '{args[0]}' failed: {str(e)}")
+        errors[index] = str(e)
+
+    try:
+        results = run_in_parallel(run_shared_job, jobs, max_workers=max_concurrent_jobs, on_error=on_error)
+    finally:
+        for executor in (io_executor, cpu_executor, render_executor):
+            executor.shutdown(wait=True)
+
+    summary = [
+        result if result is not None else {"topic": topic, "num_items": num_items, "status": "failed",
+                                           "error": errors.get(index)}
+        for index, ((topic, num_items), result) in enumerate(zip(jobs, results))
+    ] + invalid_rows
+    os.makedirs(BATCH_OUTPUT_DIR, exist_ok=True)
+    summary_path = os.path.join(BATCH_OUTPUT_DIR, SUMMARY_FILE_NAME)
+    with open(summary_path, 'w') as f:
+        json.dump(summary, f, indent=2)
+
+    succeeded = sum(1 for result in summary if result["status"] == "succeeded")
+    print(f"\nBatch finished: {succeeded}/{len(summary)} videos generated, summary written to {summary_path}")
+    return summary
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Usage: python batch.py topics.csv")
+        sys.exit(1)
+    run_batch(sys.argv[1])
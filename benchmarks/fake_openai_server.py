@@ -0,0 +1,267 @@
+"""
+Local stand-in for the three OpenAI endpoints the pipeline uses, for load tests and
+benchmarks that must not spend money:
+
+- POST /v1/chat/completions (plain and stream=True): a JSON list of items about the
+  requested topic, with as many items as the prompt asks for
+- POST /v1/audio/speech: a silent MP3 whose length follows the length of the input text
+- POST /v1/images/generations: a b64_json PNG of the requested size
+
+Payloads are deterministic: the same request always gets the same response. Latency,
+server errors and 429 responses can be injected per request, and every response
+carries x-ratelimit-* headers like the real API.
+
+Point the pipeline at it with OPENAI_BASE_URL (any OPENAI_API_KEY is accepted):
+
+    python -m benchmarks.fake_openai_server --port 8765 --latency 0.5 --rate-limit-rate 0.05
+    OPENAI_BASE_URL=http://127.0.0.1:8765/v1 OPENAI_API_KEY=fake python main.py
+"""
+import argparse
+import base64
+import hashlib
+import io
+import json
+import random
+import re
+import sys
+import threading
+import time
+from functools import lru_cache
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+
+from PIL import Image
+
+# One silent MPEG-1 Layer III frame: 128 kbps, 44.1 kHz, mono, 1152 samples
+MP3_FRAME = bytes([0xFF, 0xFB, 0x90, 0xC0]) + bytes(413)
+MP3_FRAME_SECONDS = 1152 / 44100
+SPEECH_CHARS_PER_SECOND = 15
+
+ENDPOINTS = {
+    "/v1/chat/completions": "chat",
+    "/v1/audio/speech": "audio.speech",
+    "/v1/images/generations": "images",
+}
+
+
+class _QuietHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # Clients closing keep-alive connections is normal, not worth a traceback
+        if not isinstance(sys.exc_info()[1], (ConnectionResetError, BrokenPipeError)):
+            super().handle_error(request, client_address)
+
+
+def fake_list_items(topic: str, num_items: int):
+    """The deterministic list returned for a topic."""
+    return [
+        {
+            "title": f"{topic.title()} {k}",
+            "description": f"Fact number {k} about {topic}. It is surprising and entirely made up.",
+            "image_prompts": [f"{topic} {k}", f"{topic} {k} at a birthday party", f"{topic} {k} as a watercolor"],
+        }
+        for k in range(1, num_items + 1)
+    ]
+
+
+def fake_speech(text: str) -> bytes:
+    """A silent MP3 lasting as long as the text would take to read aloud."""
+    seconds = max(1.0, len(text) / SPEECH_CHARS_PER_SECOND)
+    return MP3_FRAME * int(seconds / MP3_FRAME_SECONDS)
+
+
+@lru_cache(maxsize=256)
+def fake_image_png(prompt: str, size: str) -> bytes:
+    """A PNG whose colours are derived from the prompt."""
+    width, height = (int(value) for value in size.split("x"))
+    digest = hashlib.sha256(prompt.encode("utf-8")).digest()
+    top, bottom = Image.new("RGB", (1, 1), tuple(digest[:3])), Image.new("RGB", (1, 1), tuple(digest[3:6]))
+    gradient = Image.linear_gradient("L").resize((width, height))
+    image = Image.composite(bottom.resize((width, height)), top.resize((width, height)), gradient)
+    buffer = io.BytesIO()
+    image.save(buffer, format="PNG", compress_level=1)
+    return buffer.getvalue()
+
+
+class FakeOpenAIServer:
+    """
+    The stand-in server. start() serves it from a background thread (for benchmarks that
+    run the pipeline in the same process), serve_forever() blocks.
+
+    Args:
+        port (int): Port to listen on, 0 picks a free one
+        latency (float): Seconds before each response starts
+        jitter (float): Up to this many extra seconds of latency, drawn per request
+        stream_chunk_delay (float): Seconds between streamed chat chunks
+        error_rate (float): Fraction of requests answered with a 500 error
+        rate_limit_rate (float): Fraction of requests answered with a 429 and a Retry-After header
+        retry_after (float): Retry-After value sent with injected 429s
+        seed (int): Seed for the latency and fault injection draws
+    """
+
+    def __init__(self, port: int = 8765, latency: float = 0.0, jitter: float = 0.0, stream_chunk_delay: float = 0.01,
+                 error_rate: float = 0.0, rate_limit_rate: float = 0.0, retry_after: float = 1.0, seed: int = 0):
+        self.latency = latency
+        self.jitter = jitter
+        self.stream_chunk_delay = stream_chunk_delay
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.retry_after = retry_after
+        self.requests = {name: 0 for name in ENDPOINTS.values()}
+        self.rate_limited = 0
+        self.errors = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self.httpd = _QuietHTTPServer(("127.0.0.1", port), self._make_handler())
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self) -> "FakeOpenAIServer":
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def serve_forever(self):
+        self.httpd.serve_forever()
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def _draw(self, endpoint: str):
+        # Latency and injected fault for one request
+        with self._lock:
+            self.requests[endpoint] += 1
+            delay = self.latency + self._random.uniform(0, self.jitter)
+            roll = self._random.random()
+            if roll < self.rate_limit_rate:
+                self.rate_limited += 1
+                return delay, 429
+            if roll < self.rate_limit_rate + self.error_rate:
+                self.errors += 1
+                return delay, 500
+            return delay, 200
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                endpoint = ENDPOINTS.get(self.path.split("?")[0])
+                if endpoint is None:
+                    return self._send_json(404, {"error": {"message": f"Unknown path {self.path}", "type": "invalid_request_error"}})
+                request = json.loads(body or b"{}")
+
+                delay, status = server._draw(endpoint)
+                time.sleep(delay)
+                if status == 429:
+                    return self._send_json(
+                        429,
+                        {"error": {"message": "Rate limit reached (injected)", "type": "requests", "code": "rate_limit_exceeded"}},
+                        {"Retry-After": f"{server.retry_after:g}", "x-ratelimit-remaining-requests": "0",
+                         "x-ratelimit-reset-requests": f"{server.retry_after:g}s"},
+                    )
+                if status == 500:
+                    return self._send_json(500, {"error": {"message": "Internal server error (injected)", "type": "server_error"}})
+
+                if endpoint == "chat":
+                    return self._chat(request)
+                if endpoint == "audio.speech":
+                    return self._send(200, fake_speech(request.get("input", "")), "audio/mpeg")
+                return self._images(request)
+
+            def _rate_limit_headers(self):
+                return {"x-ratelimit-limit-requests": "10000", "x-ratelimit-remaining-requests": "9999",
+                        "x-ratelimit-reset-requests": "6ms"}
+
+            def _send(self, status: int, payload: bytes, content_type: str, headers: Optional[dict] = None):
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(payload)))
+                for name, value in {**self._rate_limit_headers(), **(headers or {})}.items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def _send_json(self, status: int, data, headers: Optional[dict] = None):
+                self._send(status, json.dumps(data).encode("utf-8"), "application/json", headers)
+
+            def _chat(self, request: dict):
+                prompt = " ".join(str(message.get("content", "")) for message in request.get("messages", []))
+                count = re.search(r"list of (\d+) items", prompt)
+                topic = re.search(r"topic: '(.*?)'", prompt)
+                content = json.dumps(fake_list_items(topic.group(1) if topic else "things",
+                                                     int(count.group(1)) if count else 5), indent=2)
+                completion_id = "chatcmpl-" + hashlib.sha256(prompt.encode("utf-8")).hexdigest()[:24]
+                model = request.get("model", "gpt-4")
+
+                if not request.get("stream"):
+                    return self._send_json(200, {
+                        "id": completion_id, "object": "chat.completion", "created": 0, "model": model,
+                        "choices": [{"index": 0, "finish_reason": "stop",
+                                     "message": {"role": "assistant", "content": content}}],
+                    })
+
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Transfer-Encoding", "chunked")
+                for name, value in self._rate_limit_headers().items():
+                    self.send_header(name, value)
+                self.end_headers()
+                pieces = [content[k:k + 16] for k in range(0, len(content), 16)]
+                for k, piece in enumerate(pieces):
+                    chunk = {
+                        "id": completion_id, "object": "chat.completion.chunk", "created": 0, "model": model,
+                        "choices": [{"index": 0, "delta": {"content": piece},
+                                     "finish_reason": "stop" if k == len(pieces) - 1 else None}],
+                    }
+                    self._write_chunk(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+                    time.sleep(server.stream_chunk_delay)
+                self._write_chunk(b"data: [DONE]\n\n")
+                self._write_chunk(b"")
+
+            def _write_chunk(self, data: bytes):
+                self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+                self.wfile.flush()
+
+            def _images(self, request: dict):
+                png = fake_image_png(request.get("prompt", ""), request.get("size", "1024x1024"))
+                self._send_json(200, {"created": 0, "data": [{"b64_json": base64.b64encode(png).decode("ascii")}]})
+
+        return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local stand-in for the OpenAI endpoints used by the pipeline.")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds before each response")
+    parser.add_argument("--jitter", type=float, default=0.0, help="up to this many extra seconds per request")
+    parser.add_argument("--stream-chunk-delay", type=float, default=0.01, help="seconds between streamed chat chunks")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests failing with a 500")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="fraction of requests failing with a 429")
+    parser.add_argument("--retry-after", type=float, default=1.0, help="Retry-After seconds sent with 429s")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    server = FakeOpenAIServer(args.port, args.latency, args.jitter, args.stream_chunk_delay, args.error_rate,
+                              args.rate_limit_rate, args.retry_after, args.seed)
+    print(f"Fake OpenAI server listening on {server.base_url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""
+Cold-start cost of the CLI and of every stage module.
+
+Each module is imported in a fresh interpreter (as a worker or a single-stage command
+would be) a few times. The benchmark reports the median wall time over a bare
+interpreter, the import time python -X importtime measures for it, and the
+modules that took the longest. It also lists which heavy dependencies the import
+pulled in.
+
+It doubles as a guard: it exits with status 1 if any module loads a dependency from
+HEAVY_MODULES at import time, or takes longer than the budget to import.
+
+Usage: python -m benchmarks.import_benchmark [--runs N] [--budget-ms MS] [--top N]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from typing import Dict, List
+
+# Each of these takes longer to import than most stages take to run, so they may only be
+# imported by the functions that use them
+HEAVY_MODULES = ["moviepy", "openai", "IPython", "imageio"]
+
+MODULES = [
+    "main",
+    "scripts.ai.generate_list.generate_list",
+    "scripts.ai.generate_audios.generate_audio",
+    "scripts.ai.generate_images.generate_images",
+    "scripts.non_ai.create_titled_images_short.create_titled_images_short",
+    "scripts.non_ai.generate_video_short.generate_video_short",
+]
+IMPORT_BUDGET_MS = 400
+
+
+def run_python(code: str, importtime: bool = False):
+    """Run code in a fresh interpreter; returns the wall time, stdout and stderr."""
+    command = [sys.executable, *(["-X", "importtime"] if importtime else []), "-c", code]
+    started_at = time.perf_counter()
+    result = subprocess.run(command, check=True, capture_output=True, text=True, cwd=os.getcwd(),
+                            env={**os.environ, "PYTHONPATH": os.getcwd()})
+    return time.perf_counter() - started_at, result.stdout, result.stderr
+
+
+def parse_importtime(stderr: str) -> Dict[str, int]:
+    """Cumulative import time in microseconds of every module in -X importtime output."""
+    times = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        times[name.strip()] = int(cumulative)
+    return times
+
+
+def measure(module: str, runs: int, baseline: float, startup_modules: set) -> dict:
+    probe = (f"import sys, json, {module}; "
+             f"print(json.dumps([m for m in {HEAVY_MODULES!r} if m in sys.modules]))")
+    walls = [run_python(probe)[0] for _ in range(runs)]
+    _, stdout, stderr = run_python(probe, importtime=True)
+    times = parse_importtime(stderr)
+    dependencies = [(name, us) for name, us in times.items() if name != module and name not in startup_modules]
+    return {
+        "module": module,
+        "wall_ms": (statistics.median(walls) - baseline) * 1000,
+        "import_ms": times.get(module, 0) / 1000,
+        "heavy": json.loads(stdout.strip().splitlines()[-1]),
+        "slowest": sorted(dependencies, key=lambda entry: entry[1], reverse=True),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cold-start cost of the CLI and stage modules.")
+    parser.add_argument("--runs", type=int, default=5, help="fresh interpreters per module")
+    parser.add_argument("--budget-ms", type=float, default=IMPORT_BUDGET_MS,
+                        help=f"longest import time allowed per module (default: {IMPORT_BUDGET_MS})")
+    parser.add_argument("--top", type=int, default=3, help="slowest dependencies listed per module")
+    args = parser.parse_args()
+
+    baseline = statistics.median(run_python("pass")[0] for _ in range(args.runs))
+    startup_modules = set(parse_importtime(run_python("pass", importtime=True)[2]))  # site and what it loads
+    results = [measure(module, args.runs, baseline, startup_modules) for module in MODULES]
+
+    print(f"\nImport benchmark: median of {args.runs} fresh interpreters, "
+          f"over a bare interpreter ({baseline * 1000:.0f} ms)")
+    print(f"  {'module':<70s} {'wall ms':>8s} {'import ms':>10s}  heavy modules loaded")
+    failures: List[str] = []
+    for result in results:
+        print(f"  {result['module']:<70s} {result['wall_ms']:8.0f} {result['import_ms']:10.0f}  "
+              f"{', '.join(result['heavy']) or '-'}")
+        for name, us in result["slowest"][:args.top]:
+            print(f"      {name:<66s} {'':8s} {us / 1000:10.0f}")
+        if result["heavy"]:
+            failures.append(f"{result['module']} imports {', '.join(result['heavy'])}")
+        if result["import_ms"] > args.budget_ms:
+            failures.append(f"{result['module']} takes {result['import_ms']:.0f} ms to import "
+                            f"(budget {args.budget_ms:.0f} ms)")
+
+    if failures:
+        print("\nFAILED:")
+        for failure in failures:
+            print(f"  {failure}")
+        sys.exit(1)
+    print(f"\nAll modules import in under {args.budget_ms:.0f} ms without heavy dependencies")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""
+Check of run_in_parallel's contract against the fake OpenAI server with injected errors.
+
+Generates audio for num_items items through run_in_parallel (serially and with a
+thread pool, in a temporary directory, bypassing the audio cache) while the fake
+server fails a fraction of the requests, and checks that:
+
+- results come back in input order: item i's slot holds item i's audio path
+- the slot of every item whose call raised is None, and only those slots are
+- on_error is called exactly once per failed item, with that item's index and arguments
+
+Retries still apply, but without their backoff so the check takes seconds; a failed
+item is one whose every attempt failed. The check exits with status 1 if any of the
+above does not hold, or if the run had no failed item (raise --error-rate).
+
+Usage: python -m benchmarks.parallel_check [num_items] [--workers N] [--error-rate F] [--seed N]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+from typing import List
+
+from benchmarks.fake_openai_server import FakeOpenAIServer
+
+
+def check(num_items: int, max_workers: int) -> List[str]:
+    """Run one generation through run_in_parallel; returns the contract violations found."""
+    import scripts.ai.generate_audios.utils as audio_utils
+    from utils.parallel import run_in_parallel
+    from utils.workspace import Workspace
+
+    workspace = Workspace.for_run(f"parallel check {max_workers}")
+    args_list = [(i, {"title": f"Item {i}", "description": f"Description of item {i}."}, False, workspace)
+                 for i in range(1, num_items + 1)]
+    raised = set()
+    errors = []
+    lock = threading.Lock()
+
+    def generate(i, item, use_cache, workspace):
+        try:
+            return audio_utils.generate_audio_for_item(i, item, use_cache, workspace)
+        except Exception:
+            with lock:
+                raised.add(i - 1)
+            raise
+
+    def on_error(index, args, e):
+        with lock:
+            errors.append((index, args))
+
+    results = run_in_parallel(generate, args_list, max_workers=max_workers, on_error=on_error)
+
+    problems = []
+    if len(results) != num_items:
+        problems.append(f"{len(results)} results for {num_items} items")
+    for index, (args, result) in enumerate(zip(args_list, results)):
+        if index in raised and result is not None:
+            problems.append(f"item {index + 1} failed but its slot holds {result!r}")
+        elif index not in raised and result != workspace.audio_path(args[0]):
+            problems.append(f"item {index + 1}'s slot holds {result!r} instead of its audio path")
+    error_indices = sorted(index for index, _ in errors)
+    if error_indices != sorted(raised):
+        problems.append(f"on_error called for items {[k + 1 for k in error_indices]}, "
+                        f"failed items are {[k + 1 for k in sorted(raised)]}")
+    for index, args in errors:
+        if args != args_list[index]:
+            problems.append(f"on_error for item {index + 1} got the arguments of another item")
+    if not raised:
+        problems.append("no item failed, so failures were not checked (raise --error-rate)")
+
+    print(f"  {max_workers} worker(s): {num_items - len(raised)} succeeded, {len(raised)} failed, "
+          f"{len(errors)} on_error call(s){'' if problems else ', OK'}")
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check run_in_parallel against the fake OpenAI server with errors.")
+    parser.add_argument("num_items", type=int, nargs="?", default=24)
+    parser.add_argument("--workers", type=int, default=4, help="thread pool size of the parallel run")
+    parser.add_argument("--error-rate", type=float, default=0.6, help="fraction of API calls failing with a 500")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    server = FakeOpenAIServer(port=0, error_rate=args.error_rate, seed=args.seed).start()
+    os.environ["OPENAI_BASE_URL"] = server.base_url
+    os.environ.setdefault("OPENAI_API_KEY", "fake")
+    os.chdir(tempfile.mkdtemp())
+
+    # Imported after the environment is set up, so the client points at the fake server
+    from tenacity import wait_none
+
+    import scripts.ai.generate_audios.utils as audio_utils
+
+    audio_utils.request_audio = audio_utils.request_audio.retry_with(wait=wait_none())
+
+    print(f"run_in_parallel check: {args.num_items} items, {args.error_rate:.0%} of API calls failing")
+    problems = []
+    for max_workers in (1, args.workers):
+        problems += check(args.num_items, max_workers)
+    server.stop()
+
+    for problem in problems:
+        print(f"  FAIL: {problem}")
+    if problems:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+End-to-end benchmark of the whole pipeline against the local fake OpenAI server.
+
+Runs the streaming pipeline (list, audio, images, titled images, segments, video)
+for a topic with num_items items, in a temporary directory with empty caches, and
+reports the wall time of every stage (first task start to last task end), the time
+its tasks were busy in total, and the resulting videos per hour.
+
+Usage: python -m benchmarks.pipeline_benchmark [num_items] [--runs N] [--latency S]
+       [--jitter S] [--error-rate F] [--rate-limit-rate F] [--in-memory [--no-persist]]
+       [--profile draft|review|final]
+"""
+import argparse
+import os
+import tempfile
+import time
+from typing import Dict
+
+from benchmarks.fake_openai_server import FakeOpenAIServer
+
+STAGES = ["list", "audio", "image", "titled", "segment", "video", "save"]
+
+
+def stage_timings(tasks: Dict) -> Dict[str, Dict[str, float]]:
+    """Per stage: number of tasks, wall time from first start to last finish, and summed task time."""
+    timings = {}
+    for stage in STAGES:
+        stage_tasks = [task for name, task in tasks.items()
+                       if name.split("_")[0] == stage and task.started_at is not None and task.finished_at is not None]
+        if not stage_tasks:
+            continue
+        timings[stage] = {
+            "tasks": len(stage_tasks),
+            "wall": max(task.finished_at for task in stage_tasks) - min(task.started_at for task in stage_tasks),
+            "busy": sum(task.duration for task in stage_tasks),
+        }
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description="End-to-end pipeline benchmark against the fake OpenAI server.")
+    parser.add_argument("num_items", type=int, nargs="?", default=5)
+    parser.add_argument("--runs", type=int, default=1, help="videos to generate, one after the other")
+    parser.add_argument("--latency", type=float, default=0.5, help="seconds before each API response")
+    parser.add_argument("--jitter", type=float, default=0.5, help="up to this many extra seconds per response")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of API calls failing with a 500")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="fraction of API calls failing with a 429")
+    parser.add_argument("--in-memory", action="store_true", help="hand images between stages in memory")
+    parser.add_argument("--no-persist", action="store_true", help="with --in-memory, do not write the titled images")
+    parser.add_argument("--profile", choices=["draft", "review", "final"], help="encoding profile of the videos")
+    args = parser.parse_args()
+
+    server = FakeOpenAIServer(port=0, latency=args.latency, jitter=args.jitter, error_rate=args.error_rate,
+                              rate_limit_rate=args.rate_limit_rate).start()
+    os.environ["OPENAI_BASE_URL"] = server.base_url
+    os.environ.setdefault("OPENAI_API_KEY", "fake")
+    os.chdir(tempfile.mkdtemp())
+
+    # Imported after the environment is set up, so the client points at the fake server
+    import main as pipeline
+    from utils.scheduler import DONE
+    from utils.workspace import Workspace
+
+    pipeline.IN_MEMORY_HANDOFF = args.in_memory
+    pipeline.PERSIST_TITLED_IMAGES = not args.no_persist
+
+    results = []
+    for run in range(1, args.runs + 1):
+        topic = f"benchmark topic {run}"
+        start = time.perf_counter()
+        tasks = pipeline.run_streaming_pipeline(topic, args.num_items, workspace=Workspace.for_run(topic),
+                                                profile=args.profile)
+        wall = time.perf_counter() - start
+        succeeded = "video" in tasks and tasks["video"].state == DONE
+        results.append((wall, succeeded, stage_timings(tasks)))
+    server.stop()
+
+    print(f"\nPipeline benchmark: {args.runs} run(s) of {args.num_items} items, "
+          f"API latency {args.latency}s + up to {args.jitter}s, "
+          f"{args.error_rate:.0%} errors, {args.rate_limit_rate:.0%} rate limited"
+          f"{', images handed over in memory' if args.in_memory else ''}"
+          f"{f', {args.profile} profile' if args.profile else ''}")
+    for run, (wall, succeeded, timings) in enumerate(results, start=1):
+        print(f"\n  Run {run}: {wall:.2f}s{'' if succeeded else ' (FAILED)'}")
+        print(f"    {'stage':8s} {'tasks':>5s} {'wall s':>8s} {'busy s':>8s}")
+        for stage, timing in timings.items():
+            print(f"    {stage:8s} {timing['tasks']:5d} {timing['wall']:8.2f} {timing['busy']:8.2f}")
+
+    total_wall = sum(wall for wall, _, _ in results)
+    videos = sum(1 for _, succeeded, _ in results if succeeded)
+    print(f"\n  {videos}/{args.runs} videos in {total_wall:.2f}s: {3600 * videos / total_wall:.1f} videos per hour")
+    print(f"  API requests: {server.requests}, injected 429s: {server.rate_limited}, injected errors: {server.errors}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+"""
+Peak memory of rendering a whole video, by number of items.
+
+For every item count, a fresh process renders a synthetic compilation (silent
+narration and the same three titled frames for every item) with write_final_video,
+and reports its RSS before rendering, the peak RSS sampled while rendering and the
+most file descriptors it had open (Linux only). With streaming rendering the peak
+should not grow with the item count.
+
+Usage: python -m benchmarks.render_memory_benchmark [item counts...] [--backend ffmpeg|moviepy]
+       [--profile draft|review|final] [--no-stream]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+from benchmarks.fake_openai_server import fake_speech
+
+ITEM_COUNTS = [10, 50, 200]
+NARRATION_TEXT = "A short synthetic narration."  # about two seconds of speech
+
+
+def make_synthetic_workspace(root: str, num_items: int):
+    """A workspace with the audio and titled frames of num_items items, linked to three shared files."""
+    from scripts.non_ai.generate_video_short.utils import CANVAS_SIZE, IMAGES_PER_ITEM
+    from utils.frame_store import save_image
+    from utils.workspace import Workspace
+    from PIL import Image
+
+    workspace = Workspace(root)
+    os.makedirs(workspace.audio_dir, exist_ok=True)
+    os.makedirs(workspace.titled_image_dir, exist_ok=True)
+
+    width, height = CANVAS_SIZE
+    shared_audio = os.path.join(root, "narration.mp3")
+    with open(shared_audio, "wb") as f:
+        f.write(fake_speech(NARRATION_TEXT))
+    shared_frames = []
+    for j in range(1, IMAGES_PER_ITEM + 1):
+        frame = np.empty((height, width, 3), dtype=np.uint8)
+        frame[:] = (np.arange(width, dtype=np.uint16) * 255 // (width * j)).astype(np.uint8)[None, :, None]
+        path = os.path.join(root, f"frame_{j}{os.path.splitext(workspace.titled_image_path(1, j))[1]}")
+        save_image(Image.fromarray(frame), path)
+        shared_frames.append(path)
+
+    for i in range(1, num_items + 1):
+        os.link(shared_audio, workspace.audio_path(i))
+        for j, frame in enumerate(shared_frames, start=1):
+            os.link(frame, workspace.titled_image_path(i, j))
+    return workspace
+
+
+def current_rss_mb() -> float:
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+
+
+class ResourceSampler:
+    """Samples the RSS and open file descriptors of this process in the background (Linux only)."""
+
+    def __init__(self, interval: float = 0.02):
+        self.interval = interval
+        self.peak_rss_mb = 0.0
+        self.peak_fds = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _sample(self):
+        self.peak_rss_mb = max(self.peak_rss_mb, current_rss_mb())
+        self.peak_fds = max(self.peak_fds, len(os.listdir("/proc/self/fd")))
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._sample()
+            time.sleep(self.interval)
+
+    def __enter__(self):
+        self._sample()
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self._sample()
+
+
+def run_worker(num_items: int, backend: str, profile: str, stream: bool):
+    """Render one synthetic compilation in this process and print its measurements as JSON."""
+    from scripts.non_ai.generate_video_short import generate_video_short as video
+    from scripts.non_ai.generate_video_short.generate_video_short import create_item_segment, write_final_video
+
+    video.STREAM_RENDER = stream
+    os.chdir(tempfile.mkdtemp())
+    workspace = make_synthetic_workspace("workspace", num_items)
+    segments = [create_item_segment(i, backend, workspace=workspace) for i in range(1, num_items + 1)]
+
+    rss_before = current_rss_mb()
+    start = time.perf_counter()
+    with ResourceSampler() as sampler:
+        write_final_video(segments, backend, workspace, profile)
+    print(json.dumps({
+        "items": num_items,
+        "video_seconds": sum(segment.duration for segment in segments),
+        "render_seconds": time.perf_counter() - start,
+        "rss_before_mb": rss_before,
+        "peak_rss_mb": sampler.peak_rss_mb,
+        "peak_fds": sampler.peak_fds,
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Peak memory of whole-video renders by number of items.")
+    parser.add_argument("item_counts", type=int, nargs="*", default=ITEM_COUNTS)
+    parser.add_argument("--backend", choices=["ffmpeg", "moviepy"], default="ffmpeg")
+    parser.add_argument("--profile", choices=["draft", "review", "final"], default="draft")
+    parser.add_argument("--no-stream", action="store_true", help="moviepy: composite every item's clips up front")
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(args.item_counts[0], args.backend, args.profile, not args.no_stream)
+        return
+
+    results = []
+    for num_items in args.item_counts:
+        command = [sys.executable, "-m", "benchmarks.render_memory_benchmark", str(num_items), "--worker",
+                   "--backend", args.backend, "--profile", args.profile]
+        if args.no_stream:
+            command.append("--no-stream")
+        output = subprocess.run(command, check=True, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+                                text=True, cwd=os.getcwd(), env={**os.environ, "PYTHONPATH": os.getcwd()}).stdout
+        results.append(json.loads(output.strip().splitlines()[-1]))
+
+    streaming = "streaming" if args.backend == "ffmpeg" or not args.no_stream else "compositing up front"
+    print(f"\nRender memory benchmark: {args.backend} backend ({streaming}), {args.profile} profile")
+    print(f"  {'items':>5s} {'video s':>8s} {'render s':>9s} {'RSS before MB':>14s} {'peak RSS MB':>12s} {'peak fds':>9s}")
+    for result in results:
+        print(f"  {result['items']:5d} {result['video_seconds']:8.1f} {result['render_seconds']:9.1f} "
+              f"{result['rss_before_mb']:14.1f} {result['peak_rss_mb']:12.1f} {result['peak_fds']:9d}")
+    growth = results[-1]["peak_rss_mb"] - results[0]["peak_rss_mb"]
+    print(f"\n  Peak RSS grew by {growth:.1f} MB from {results[0]['items']} to {results[-1]['items']} items")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+"""
+Benchmark the titled image compositor used by create_titled_images_short.
+
+Composes titled images from synthetic 1024x1024 sources with the previous
+implementation (two decodes, full resolution blur, fonts probed per image) and
+with the current one, and reports images per second. Composition and saving are
+timed separately, so the file format does not count as compositor speed. Each
+format is timed saving the same images. Composing and saving in TITLED_IMAGE_FORMAT
+is also timed serially and in a process pool. Also reports the mean pixel
+difference between the old and new backgrounds.
+
+Usage: python -m benchmarks.titled_image_benchmark [num_images] [workers]
+"""
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+from PIL import Image, ImageFilter, ImageFont
+
+from scripts.non_ai.create_titled_images_short.create_titled_images_short import create_titled_images_for_items_short
+from scripts.non_ai.create_titled_images_short.utils import (
+    FONT_OPTIONS,
+    PNG_COMPRESS_LEVEL,
+    compose_titled_image,
+    create_blurred_background,
+    create_titled_image_short,
+)
+from utils.frame_store import save_image
+from utils.output_dirs import IMAGE_OUTPUT_DIR
+from utils.output_file_names import TITLED_IMAGE_FORMAT, get_image_file_name, get_titled_image_file_name
+
+BG_SIZE = (1080, 1920)
+LEGACY_PNG_COMPRESS_LEVEL = 6  # Pillow's default, which the previous compositor saved with
+
+# Label -> (extension, PNG compression level) of every format the save is timed in
+SAVE_FORMATS = {
+    f"png, level {LEGACY_PNG_COMPRESS_LEVEL} (legacy)": ("png", LEGACY_PNG_COMPRESS_LEVEL),
+    f"png, level {PNG_COMPRESS_LEVEL}": ("png", PNG_COMPRESS_LEVEL),
+    "npy": ("npy", PNG_COMPRESS_LEVEL),
+}
+
+
+def legacy_background(image_path: str) -> Image.Image:
+    """The previous background: decode again, resize to full size, blur at radius 90."""
+    bg_image = Image.open(image_path)
+    bg_image = bg_image.resize(BG_SIZE, Image.Resampling.LANCZOS)
+    bg_image = bg_image.filter(ImageFilter.GaussianBlur(radius=90))
+    overlay = Image.new('RGBA', BG_SIZE, (255, 255, 255, 128))
+    return Image.alpha_composite(bg_image.convert('RGBA'), overlay).convert('RGB')
+
+
+def legacy_titled_image(image_path: str) -> Image.Image:
+    """Cost profile of the previous compositor: two decodes, full blur, per-image font probing."""
+    pil_image = Image.open(image_path)
+    pil_image = pil_image.resize((1080, int(1080 * pil_image.width / pil_image.height)), Image.Resampling.LANCZOS)
+    bg_image = legacy_background(image_path)
+    bg_image.paste(pil_image, (0, 0))
+    for font_path in FONT_OPTIONS:
+        try:
+            ImageFont.truetype(font_path, 120)
+            break
+        except (IOError, OSError):
+            continue
+    return bg_image
+
+
+def current_titled_image(image_path: str, title: str) -> Image.Image:
+    """The current compositor without the save: one decode, then the layout."""
+    with Image.open(image_path) as opened:
+        source = opened.convert('RGB')
+    return compose_titled_image(source, title)
+
+
+def make_sources(num_images: int):
+    os.makedirs(IMAGE_OUTPUT_DIR, exist_ok=True)
+    rng = np.random.default_rng(0)
+    items = []
+    for i in range(1, num_images + 1):
+        pixels = rng.integers(0, 256, size=(16, 16, 3), dtype=np.uint8)
+        image = Image.fromarray(pixels).resize((1024, 1024), Image.Resampling.BICUBIC)
+        image.save(os.path.join(IMAGE_OUTPUT_DIR, get_image_file_name(i, 1)))
+        items.append({"title": f"Benchmark item {i}", "image_prompts": ["benchmark"]})
+    return items
+
+
+def main(num_images: int = 12, workers: int = os.cpu_count() or 1):
+    import json
+
+    os.chdir(tempfile.mkdtemp())
+    items = make_sources(num_images)
+    items_json = json.dumps(items)
+    source_paths = [os.path.join(IMAGE_OUTPUT_DIR, get_image_file_name(i, 1)) for i in range(1, num_images + 1)]
+
+    compose_rates = {}
+    start = time.perf_counter()
+    for path in source_paths:
+        legacy_titled_image(path)
+    compose_rates["legacy"] = num_images / (time.perf_counter() - start)
+
+    start = time.perf_counter()
+    composed = [current_titled_image(path, item["title"]) for path, item in zip(source_paths, items)]
+    compose_rates["current"] = num_images / (time.perf_counter() - start)
+
+    save_ms = {}
+    for label, (extension, compress_level) in SAVE_FORMATS.items():
+        start = time.perf_counter()
+        for i, image in enumerate(composed, start=1):
+            save_image(image, os.path.join("saved", f"item_{i:02d}.{extension}"), compress_level)
+        save_ms[label] = (time.perf_counter() - start) / num_images * 1000
+
+    # Compose and save in the pipeline's format, serially and in the process pool
+    end_to_end_rates = {}
+    start = time.perf_counter()
+    for i, (path, item) in enumerate(zip(source_paths, items), start=1):
+        create_titled_image_short(path, item["title"], get_titled_image_file_name(i, 1))
+    end_to_end_rates["serial"] = num_images / (time.perf_counter() - start)
+
+    start = time.perf_counter()
+    create_titled_images_for_items_short(items_json, max_workers=workers)
+    end_to_end_rates[f"{workers} processes"] = num_images / (time.perf_counter() - start)
+
+    with Image.open(source_paths[0]) as source:
+        new_background = np.asarray(create_blurred_background(source.convert('RGB'), BG_SIZE), dtype=np.int16)
+    old_background = np.asarray(legacy_background(source_paths[0]), dtype=np.int16)
+
+    print(f"\nTitled image benchmark: {num_images} images")
+    print("  Composition (decode and layout, not saved):")
+    for name, rate in compose_rates.items():
+        print(f"    {name:28s} {rate:6.2f} images/s  ({rate / compose_rates['legacy']:4.1f}x)")
+    print("  Save, same images in every format:")
+    for label, ms in save_ms.items():
+        print(f"    {label:28s} {ms:6.1f} ms/image")
+    print(f"  Compose and save as {TITLED_IMAGE_FORMAT} (current compositor):")
+    for name, rate in end_to_end_rates.items():
+        print(f"    {name:28s} {rate:6.2f} images/s  ({rate / end_to_end_rates['serial']:4.1f}x)")
+    print(f"  mean background difference: {np.abs(new_background - old_background).mean():.2f} / 255")
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:3]))
@@ -0,0 +1,65 @@
+"""
+Benchmark the zoom effect used by generate_video_short.
+
+Compares the previous per-frame implementation (full-size LANCZOS resize of the
+titled image to the zoomed size, then composited onto the canvas) with
+ZoomRenderer at both quality settings, and reports frames per second.
+
+Usage: python -m benchmarks.zoom_benchmark [num_frames]
+"""
+import sys
+import time
+
+import numpy as np
+from PIL import Image
+
+from scripts.non_ai.generate_video_short.utils import ZoomRenderer, create_zoom_effect
+
+CANVAS_SIZE = (1080, 1920)
+FPS = 24
+
+
+def legacy_zoom_frame(frame: np.ndarray, zoom: float) -> np.ndarray:
+    """The previous implementation: resize the whole frame, then center it on the canvas."""
+    h, w = frame.shape[:2]
+    new_h, new_w = int(h * zoom), int(w * zoom)
+    resized = np.array(Image.fromarray(frame).resize((new_w, new_h), Image.Resampling.LANCZOS))
+    top, left = (new_h - h) // 2, (new_w - w) // 2
+    return resized[top:top + h, left:left + w]
+
+
+def make_test_image() -> np.ndarray:
+    rng = np.random.default_rng(0)
+    width, height = CANVAS_SIZE
+    gradient = np.linspace(0, 255, width, dtype=np.float32)[None, :, None]
+    noise = rng.integers(0, 64, size=(height, width, 3))
+    return np.clip(gradient + noise, 0, 255).astype(np.uint8)
+
+
+def measure(render_frame, num_frames: int) -> float:
+    zoom_effect = create_zoom_effect(num_frames / FPS * 3)
+    start = time.perf_counter()
+    for k in range(num_frames):
+        frame = render_frame(zoom_effect(k / FPS))
+        assert frame.shape[:2] == (CANVAS_SIZE[1], CANVAS_SIZE[0])
+    return num_frames / (time.perf_counter() - start)
+
+
+def main(num_frames: int = 48):
+    image_array = make_test_image()
+    image = Image.fromarray(image_array)
+
+    results = {
+        "legacy (LANCZOS full resize)": measure(lambda zoom: legacy_zoom_frame(image_array, zoom), num_frames),
+        "ZoomRenderer final (LANCZOS)": measure(ZoomRenderer(image, CANVAS_SIZE, "final").render, num_frames),
+        "ZoomRenderer draft (bilinear)": measure(ZoomRenderer(image, CANVAS_SIZE, "draft").render, num_frames),
+    }
+
+    baseline = results["legacy (LANCZOS full resize)"]
+    print(f"Zoom benchmark: {num_frames} frames at {CANVAS_SIZE[0]}x{CANVAS_SIZE[1]}")
+    for name, fps in results.items():
+        print(f"  {name:32s} {fps:7.1f} frames/s  ({fps / baseline:4.1f}x)")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 48)
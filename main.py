@@ -1,46 +1,415 @@
-from scripts.ai.generate_audios.generate_audio import generate_audio_for_items
-from scripts.ai.generate_images.generate_images import generate_images
-from scripts.ai.generate_list.generate_list import generate_list
-from scripts.non_ai.generate_video_short.generate_video_short import generate_video_short
-from scripts.non_ai.create_titled_images_short.create_titled_images_short import create_titled_images_for_items_short
+import argparse
+import json
+import os
+import sys
+from functools import partial
+from typing import List, Optional
+
+from scripts.ai.generate_audios.utils import audio_cache, generate_audio_for_item
+from scripts.ai.generate_images.utils import generate_image, image_cache
+from scripts.ai.generate_list.generate_list import generate_list, stream_list
+from scripts.non_ai.generate_video_short.generate_video_short import (
+    FFMPEG_BACKEND,
+    MOVIEPY_BACKEND,
+    RENDER_BACKEND,
+    create_item_segment,
+    renders_segments_separately,
+    write_canvas_videos,
+    write_final_video,
+)
+from scripts.non_ai.generate_video_short.utils import ENCODING_PROFILE, ENCODING_PROFILES
+from scripts.non_ai.create_titled_images_short.create_titled_images_short import create_titled_image_in_pool
+from scripts.non_ai.create_titled_images_short.utils import create_titled_image_short
 
 from scripts.non_ai.save_to_generated_data.save_to_generated_data import save_to_generated_data
+from utils.canvas import CANVAS_SIZES, DEFAULT_CANVAS
 from utils.helper_functions import clean_json_input
-from utils.output_file_names import get_list_items_path
+from utils.manifest import RunManifest
+from utils.output_dirs import OUTPUTS_DIR
+from utils.output_file_names import get_image_file_name, get_titled_image_file_name
+from utils.pipeline_run import PipelineRun
+from utils.scheduler import CPU, IO, RENDER, DagScheduler
+from utils.workspace import Workspace
+
+IO_WORKERS = 8  # concurrent API calls, paced further by the rate limit governor
+CPU_WORKERS = os.cpu_count() or 1  # concurrent Pillow tasks; titled images are composed in a process pool
+RENDER_WORKERS = os.cpu_count() or 1  # concurrent segment and video renders
+STREAM_LIST = True  # start each item's assets as soon as it arrives from the list stream
+# Hand decoded and titled images from stage to stage in memory instead of writing PNGs and
+# decoding them again; the titled PNGs are then written in the background, or not at all
+IN_MEMORY_HANDOFF = False
+PERSIST_TITLED_IMAGES = True
+
+
+def add_item_tasks(scheduler: DagScheduler, i: int, item: dict, run: PipelineRun):
+    """
+    Add the per-item tasks to the scheduler:
+    audio_i, image_i_j and titled_i_j for every prompt, and segment_i once they are done.
+    Every asset is recorded in the run's manifest under its task's name, except titled
+    images handed over in memory: those are remade from the images whenever the run is,
+    so the segments are recorded as made from the images directly.
+    When the video is rendered on other canvases, only the audio and images are made
+    here: the video is laid out from them directly (see add_final_tasks).
+    """
+    workspace = run.workspace
+    scheduler.add(
+        f"audio_{i}",
+        run.task(f"audio_{i}", partial(generate_audio_for_item, i, item, workspace=workspace), workspace.audio_path(i)),
+        kind=IO,
+    )
+
+    titled_tasks = []
+    for j, prompt in enumerate(item['image_prompts'], start=1):
+        filename = get_image_file_name(i, j)
+        scheduler.add(
+            f"image_{i}_{j}",
+            run.task(f"image_{i}_{j}",
+                     partial(generate_image, prompt, workspace.image_dir, os.path.splitext(filename)[0],
+                             keep_in_memory=run.in_memory),
+                     workspace.image_path(i, j)),
+            kind=IO,
+        )
+        if run.renders_canvases:
+            continue
+        titled_args = (workspace.image_path(i, j), item['title'], get_titled_image_file_name(i, j), workspace)
+        if run.in_memory:
+            # The images are handed over in this process's frame store; sending them to a worker
+            # process and back would cost about what the handover saves, so compose on the CPU thread
+            create_titled = run.task(f"titled_{i}_{j}", partial(create_titled_image_short, *titled_args,
+                                                                in_memory=True, persist=run.persist_images))
+        else:
+            create_titled = run.task(f"titled_{i}_{j}", partial(create_titled_image_in_pool, *titled_args),
+                                     workspace.titled_image_path(i, j), [f"image_{i}_{j}"])
+        scheduler.add(f"titled_{i}_{j}", create_titled, deps=[f"image_{i}_{j}"], kind=CPU)
+        titled_tasks.append(f"titled_{i}_{j}")
+
+    if run.renders_canvases:
+        return
+    segment_deps = [f"audio_{i}", *titled_tasks]
+    segment_inputs = [name.replace("titled_", "image_", 1) for name in segment_deps] if run.in_memory else segment_deps
+    create_segment = partial(create_item_segment, i, render=True, workspace=workspace, in_memory=run.in_memory,
+                             profile=run.profile)
+    if renders_segments_separately():
+        def reuse_segment():
+            segment = create_item_segment(i, workspace=workspace)
+            segment.video_path = workspace.segment_path(i)
+            return segment
+
+        create_segment = run.task(f"segment_{i}", create_segment, workspace.segment_path(i), segment_inputs,
+                                  reuse=reuse_segment)
+    else:
+        create_segment = run.task(f"segment_{i}", create_segment)
+    scheduler.add(f"segment_{i}", create_segment, deps=segment_deps, kind=RENDER)
+
+
+def add_final_tasks(scheduler: DagScheduler, items: list, topic: str, run: PipelineRun):
+    """
+    Add the tasks that need every item: saving the generated content and writing the video.
+    When the video is rendered on other canvases, every canvas's video is written in one
+    task; the first is recorded as "video" and the others as "video_<canvas>".
+    """
+    workspace = run.workspace
+    item_numbers = range(1, len(items) + 1)
+    audio_tasks = [f"audio_{i}" for i in item_numbers]
+    image_tasks = [
+        f"image_{i}_{j}" for i, item in enumerate(items, start=1) for j in range(1, len(item['image_prompts']) + 1)
+    ]
+    segment_tasks = [f"segment_{i}" for i in item_numbers]
+
+    # Save AI-generated content to generated_data folder
+    scheduler.add(
+        "save",
+        run.task("save", partial(save_to_generated_data, workspace.list_items_path, topic, workspace)),
+        deps=audio_tasks + image_tasks,
+        kind=IO,
+    )
+
+    if run.renders_canvases:
+        video_inputs = audio_tasks + image_tasks
+
+        def write_videos():
+            paths = write_canvas_videos(items, run.canvases, workspace, run.profile)
+            for canvas, path in zip(run.canvases[1:], paths[1:]):
+                run.manifest.record(f"video_{canvas}", path, video_inputs)
+            return paths[0]
+
+        scheduler.add(
+            "video",
+            run.task("video", write_videos, workspace.video_path(run.canvases[0]), video_inputs),
+            deps=video_inputs,
+            kind=RENDER,
+        )
+        return
+
+    if renders_segments_separately():
+        video_inputs = segment_tasks
+    elif run.in_memory:
+        video_inputs = audio_tasks + image_tasks
+    else:
+        video_inputs = audio_tasks + [name.replace("image_", "titled_", 1) for name in image_tasks]
+    scheduler.add(
+        "video",
+        run.task(
+            "video",
+            lambda: write_final_video([scheduler.result(name) for name in segment_tasks], workspace=workspace,
+                                      profile=run.profile),
+            workspace.video_output_path,
+            video_inputs,
+        ),
+        deps=segment_tasks,
+        kind=RENDER,
+    )
+
+
+def finish_pipeline(scheduler: DagScheduler, run: PipelineRun, topic: str):
+    """
+    Run every task, then write the run's metrics report next to its manifest.
+    """
+    tasks = scheduler.run()
+    run.release()
+    print(f"\nPipeline finished: {scheduler.summary()}")
+    print(f"Audio cache: {audio_cache.stats()}")
+    print(f"Image cache: {image_cache.stats()}")
+    run.write_report(topic=topic, summary=scheduler.summary())
+    return tasks
+
+
+def create_scheduler() -> DagScheduler:
+    return DagScheduler(io_workers=IO_WORKERS, cpu_workers=CPU_WORKERS, render_workers=RENDER_WORKERS)
+
+
+def run_pipeline(items_json: str, topic: str, scheduler: Optional[DagScheduler] = None,
+                 workspace: Optional[Workspace] = None, resume: bool = False, profile: Optional[str] = None,
+                 canvases: Optional[List[str]] = None):
+    """
+    Generate every asset for the items and render the video. Each task starts as soon
+    as its inputs exist, so image processing for one item overlaps API calls for others.
+    Pass a scheduler built on shared executors to run several pipelines on one pool.
+    Every file is written to the workspace, which must hold the saved list (defaults to outputs/),
+    and recorded in its run manifest. With resume=True assets that are already complete
+    are reused and only missing, corrupt or stale ones are made again; resuming with another
+    encoding profile (e.g. "final" after a "draft" preview) renders the segments and video again.
+    With canvases (e.g. ["vertical", "square"]) the video is rendered on each of them in one pass.
+    """
+    items = json.loads(clean_json_input(items_json))
+    run = PipelineRun(workspace or Workspace(), resume, IN_MEMORY_HANDOFF, PERSIST_TITLED_IMAGES,
+                      profile or ENCODING_PROFILE, canvases)
+    if run.manifest.info.get("encoding_profile", run.profile) != run.profile:
+        for name in list(run.manifest.assets):
+            if name.startswith("segment_") or name.startswith("video"):
+                run.manifest.invalidate(name)
+    if (run.manifest.info.get("canvases", [DEFAULT_CANVAS]) != run.canvases
+            or not all(run.manifest.is_complete(f"video_{canvas}") for canvas in run.canvases[1:])):
+        run.manifest.invalidate("video")
+    run.manifest.set_info(topic=topic, num_items=len(items), encoding_profile=run.profile, canvases=run.canvases)
+    if not (resume and run.manifest.is_complete("list")):
+        run.manifest.record("list", run.workspace.list_items_path)
+
+    scheduler = scheduler or create_scheduler()
+    for i, item in enumerate(items, start=1):
+        add_item_tasks(scheduler, i, item, run)
+    add_final_tasks(scheduler, items, topic, run)
+
+    return finish_pipeline(scheduler, run, topic)
+
+
+def run_streaming_pipeline(topic: str, num_items: int, scheduler: Optional[DagScheduler] = None,
+                           workspace: Optional[Workspace] = None, profile: Optional[str] = None,
+                           canvases: Optional[List[str]] = None):
+    """
+    Like run_pipeline, but the list itself is generated by a task that streams it:
+    each item's audio and image tasks are added as soon as the item has been received,
+    while the model is still writing the rest of the list.
+    """
+    run = PipelineRun(workspace or Workspace(), in_memory=IN_MEMORY_HANDOFF, persist_images=PERSIST_TITLED_IMAGES,
+                      profile=profile or ENCODING_PROFILE, canvases=canvases)
+    run.manifest.set_info(topic=topic, num_items=num_items, encoding_profile=run.profile, canvases=run.canvases)
+    scheduler = scheduler or create_scheduler()
+
+    def generate_items():
+        items = []
+
+        def on_item(i: int, item: dict):
+            items.append(item)
+            add_item_tasks(scheduler, i, item, run)
+
+        content = stream_list(topic, num_items, on_item=on_item, workspace=run.workspace)
+        add_final_tasks(scheduler, items, topic, run)
+        return content
+
+    scheduler.add("list", run.task("list", generate_items, run.workspace.list_items_path), kind=IO)
+    return finish_pipeline(scheduler, run, topic)
+
+
+def resume_run(workspace: Workspace, scheduler: Optional[DagScheduler] = None, profile: Optional[str] = None,
+               canvases: Optional[List[str]] = None):
+    """
+    Finish an interrupted run in its workspace. If the list was saved, the run continues
+    from it and only missing, corrupt or stale assets are made again; otherwise the whole
+    run starts over with the topic and item count recorded in the manifest.
+    The video is rendered with the run's encoding profile and on the run's canvases
+    unless others are given.
+    """
+    manifest = RunManifest.for_workspace(workspace)
+    if "topic" not in manifest.info:
+        raise ValueError(f"No run manifest in {workspace.root}, nothing to resume")
+    topic = manifest.info["topic"]
+    profile = profile or manifest.info.get("encoding_profile")
+    canvases = canvases or manifest.info.get("canvases")
+
+    if manifest.is_complete("list"):
+        with open(workspace.list_items_path, 'r') as f:
+            items_json = f.read()
+        return run_pipeline(items_json, topic, scheduler, workspace, resume=True, profile=profile, canvases=canvases)
+    return run_streaming_pipeline(topic, manifest.info["num_items"], scheduler, workspace, profile, canvases)
+
+
+def print_videos(workspace: Workspace, canvases: Optional[List[str]] = None):
+    print()
+    for canvas in canvases or [DEFAULT_CANVAS]:
+        print(f"Video ({canvas}): {workspace.video_path(canvas)}")
+
+
+def run_all(args: argparse.Namespace):
+    """The whole pipeline: finish the run given with --resume, or start a new one."""
+    if args.resume:
+        workspace = Workspace(args.resume)
+        print(f"\nResuming the run in {workspace.root}")
+        resume_run(workspace, profile=args.profile, canvases=args.canvases)
+        print_videos(workspace, args.canvases or RunManifest.for_workspace(workspace).info.get("canvases"))
+        return
 
-def main():
     # Get the topic from user input
-    topic = input("Enter a topic for your video: ")
+    topic = args.topic or input("Enter a topic for your video: ")
+
+    num_items = args.num_items or input("Enter the number of items for your video: ")
+
+    # Every run writes to its own workspace, so several runs can share the machine
+    workspace = Workspace.for_run(topic)
+    print(f"\nWriting outputs to {workspace.root}")
+
+    if STREAM_LIST:
+        # Generate the list and start each item's assets and video as soon as it arrives
+        print("\nGenerating list of items, assets and video...")
+        run_streaming_pipeline(topic, int(num_items), workspace=workspace, profile=args.profile,
+                               canvases=args.canvases)
+        print_videos(workspace, args.canvases)
+        return
 
-    num_items = input("Enter the number of items for your video: ")
-    
     # First generate the list of items
     print("\nGenerating list of items...")
-    items_json = generate_list(topic, int(num_items))
+    items_json = generate_list(topic, int(num_items), workspace=workspace)
 
-    # with open("outputs/json_output/list_items_with_prompts.json", "r") as f:
-    #     items_json = f.read()
-    
-    # Then generate audio for the items
-    print("\nGenerating audio for items...")
-    generate_audio_for_items(items_json)
+    # Then generate audio, images, titled images and the video, each step as soon as its inputs are ready
+    print("\nGenerating assets and video for items...")
+    run_pipeline(items_json, topic, workspace=workspace, profile=args.profile, canvases=args.canvases)
+    print_videos(workspace, args.canvases)
 
-    # Then generate images for the items
-    print("\nGenerating images for items...")
-    generate_images(items_json)
 
-    # Save AI-generated content to generated_data folder
-    save_to_generated_data(get_list_items_path(), topic)
+# The single-stage commands import their stage when they run, so a command only loads what it
+# needs (see benchmarks/import_benchmark.py): none of them pays for another stage's dependencies.
+
+def read_items_json(workspace: Workspace) -> str:
+    with open(workspace.list_items_path, 'r') as f:
+        return f.read()
+
+
+def run_list(args: argparse.Namespace):
+    generate_list(args.topic, args.num_items, workspace=Workspace(args.workspace))
+
+
+def run_audio(args: argparse.Namespace):
+    from scripts.ai.generate_audios.generate_audio import generate_audio_for_items
+
+    workspace = Workspace(args.workspace)
+    generate_audio_for_items(read_items_json(workspace), workspace=workspace)
+
+
+def run_images(args: argparse.Namespace):
+    from scripts.ai.generate_images.generate_images import generate_images
+
+    workspace = Workspace(args.workspace)
+    generate_images(read_items_json(workspace), workspace=workspace)
+
+
+def run_titles(args: argparse.Namespace):
+    from scripts.non_ai.create_titled_images_short.create_titled_images_short import (
+        create_titled_images_for_items_short,
+    )
+
+    workspace = Workspace(args.workspace)
+    create_titled_images_for_items_short(read_items_json(workspace), workspace=workspace)
+
+
+def run_render(args: argparse.Namespace):
+    from scripts.non_ai.generate_video_short.generate_video_short import generate_video_short
+
+    workspace = Workspace(args.workspace)
+    generate_video_short(args.backend, workspace, args.profile, args.canvases)
+    print_videos(workspace, args.canvases)
+
+
+COMMANDS = {
+    "all": run_all,
+    "list": run_list,
+    "audio": run_audio,
+    "images": run_images,
+    "titles": run_titles,
+    "render": run_render,
+}
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        description="Generate a YouTube Shorts video about a topic. Without a command, runs the whole pipeline (all)."
+    )
+    commands = parser.add_subparsers(dest="command", metavar="COMMAND")
+
+    def add_workspace(command: argparse.ArgumentParser):
+        command.add_argument("--workspace", default=OUTPUTS_DIR,
+                             help=f"workspace to read from and write to (default: {OUTPUTS_DIR})")
+
+    def add_video_options(command: argparse.ArgumentParser, resumed: str):
+        command.add_argument("--profile", choices=list(ENCODING_PROFILES),
+                             help=f"encoding profile of the video (default: {ENCODING_PROFILE}{resumed})")
+        command.add_argument("--canvas", dest="canvases", action="append", choices=list(CANVAS_SIZES),
+                             help=f"canvas to lay the video out on, repeat for several videos rendered in one pass "
+                                  f"(default: {DEFAULT_CANVAS}{resumed})")
+
+    run_all_command = commands.add_parser("all", help="generate the list, assets and video (the default)")
+    run_all_command.add_argument("--resume", metavar="WORKSPACE",
+                                 help="finish an interrupted run in this workspace (e.g. outputs/runs/<run>), "
+                                      "redoing only missing or corrupt assets")
+    run_all_command.add_argument("--topic", help="topic of the video (asked for if not given)")
+    run_all_command.add_argument("--items", dest="num_items", type=int,
+                                 help="number of items (asked for if not given)")
+    add_video_options(run_all_command, ", or the resumed run's")
+
+    list_command = commands.add_parser("list", help="generate the list of items")
+    list_command.add_argument("topic")
+    list_command.add_argument("num_items", type=int, nargs="?", default=5)
+    add_workspace(list_command)
+
+    for name, help_text in (("audio", "generate the narration of every item in the list"),
+                            ("images", "generate the images of every item in the list"),
+                            ("titles", "create the titled images from the images")):
+        add_workspace(commands.add_parser(name, help=help_text))
+
+    render_command = commands.add_parser("render", help="render the video from the audio and titled images")
+    render_command.add_argument("--backend", choices=[FFMPEG_BACKEND, MOVIEPY_BACKEND], default=RENDER_BACKEND,
+                                help=f"render backend (default: {RENDER_BACKEND})")
+    add_video_options(render_command, "")
+    add_workspace(render_command)
+    return parser
 
-    # Then generate titled images for the items
-    print("\nGenerating titled images for items...")
-    
-    create_titled_images_for_items_short(clean_json_input(items_json))
 
-    # Then generate video for the items
-    print("\nGenerating video for items...")
-    generate_video_short()
+def main(argv: Optional[List[str]] = None):
+    argv = list(sys.argv[1:] if argv is None else argv)
+    # No command (e.g. "python main.py --resume ...") runs the whole pipeline, as it always has
+    if not argv or (argv[0] not in COMMANDS and argv[0] not in ("-h", "--help")):
+        argv.insert(0, "all")
+    args = build_parser().parse_args(argv)
+    COMMANDS[args.command](args)
 
 if __name__ == "__main__":
     main()
-    
\ No newline at end of file
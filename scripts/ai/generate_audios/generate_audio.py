@@ -1,39 +1,50 @@
 import json
 import os
-import time
+from typing import List, Optional
 
 from .utils import generate_audio_for_item
-from utils.output_dirs import AUDIO_OUTPUT_DIR
+from utils.parallel import run_in_parallel
+from utils.workspace import Workspace, get_workspace
 
 MAX_RETRIES = 3
-DELAY_BETWEEN_REQUESTS = 5  # seconds
+MAX_WORKERS = 4  # upper bound on concurrent TTS requests, the rate limit governor may allow fewer
 
 
-
-def generate_audio_for_items(items_json: str):
+def generate_audio_for_items(items_json: str, max_workers: int = MAX_WORKERS,
+                             workspace: Optional[Workspace] = None) -> List[Optional[str]]:
     """
     Generate audio files for each item in the list using OpenAI's Text-to-Speech API.
     Each item will have its title and description spoken in sequence.
-    
+    Up to max_workers requests are in flight at the same time, paced by the shared
+    rate limit governor; a failed item does not stop the others.
+
     Args:
         items_json (str): JSON string containing list of items with title and description
+        max_workers (int): Number of concurrent requests (1 runs the items one at a time)
+        workspace (Workspace, optional): Run workspace to write to (defaults to outputs/)
+
+    Returns:
+        List[Optional[str]]: Audio file path per item, in item order (None for failed items)
     """
     # Create output directory if it doesn't exist
-    os.makedirs(AUDIO_OUTPUT_DIR, exist_ok=True)
-    
-    try:        
+    workspace = get_workspace(workspace)
+    os.makedirs(workspace.audio_dir, exist_ok=True)
+
+    try:
         # Parse the JSON string into a list of dictionaries
         items = json.loads(items_json)
-                
-        for i, item in enumerate(items, 1):
-            try:
-                generate_audio_for_item(i, item)
-                # Add a small delay between requests to avoid rate limiting
-                time.sleep(DELAY_BETWEEN_REQUESTS)
-            except Exception as e:
-                print(f"Failed to generate audio for item {i} after {MAX_RETRIES} attempts: {str(e)}")
-                print("Continuing with next item...")
-                continue
+
+        def on_error(index: int, args: tuple, e: Exception):
+            print(f"Failed to generate audio for item {index + 1} after {MAX_RETRIES} attempts: {str(e)}")
+            print("Continuing with next item...")
+
+        return run_in_parallel(
+            generate_audio_for_item,
+            [(i, item, True, workspace) for i, item in enumerate(items, 1)],
+            max_workers=max_workers,
+            on_error=on_error,
+        )
     except Exception as e:
         print(f"Error processing items_json: {e}")
-        
+        return []
+
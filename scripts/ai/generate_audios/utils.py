@@ -1,46 +1,82 @@
 import os
-from typing import Dict
-from tenacity import retry, stop_after_attempt, wait_exponential
+from typing import Dict, Optional
+from tenacity import retry, stop_after_attempt
+from utils.asset_cache import AssetCache
+from utils.metrics import get_metrics, record_retry
 from utils.open_ai_client import get_open_ai_client
-from utils.output_dirs import AUDIO_OUTPUT_DIR
+from utils.output_dirs import AUDIO_CACHE_DIR
+from utils.rate_limiter import ENDPOINT_AUDIO_SPEECH, get_rate_limit_governor, retry_wait
+from utils.workspace import Workspace, get_workspace
 
 MAX_RETRIES = 3
+AUDIO_CACHE_MAX_BYTES = 500 * 1024 * 1024
 
-@retry(stop=stop_after_attempt(MAX_RETRIES), wait=wait_exponential(multiplier=1, min=4, max=10))
-def generate_audio_for_item(i: int, item: Dict):
+TTS_MODEL = "tts-1"
+TTS_VOICE = "ash"
+TTS_INSTRUCTIONS = "Speak in a engaging tone that would be informative and interesting for a youtube video. Use a professional, conversational style."
+
+audio_cache = AssetCache(AUDIO_CACHE_DIR, AUDIO_CACHE_MAX_BYTES, extension=".mp3")
+
+def generate_audio_for_item(i: int, item: Dict, use_cache: bool = True, workspace: Optional[Workspace] = None) -> str:
     """
     Generate audio for a single item using OpenAI's Text-to-Speech API.
-    
+    Audio is cached by (text, model, voice, instructions), so unchanged items are
+    linked from the cache instead of calling the API again. The cache is looked up
+    once; only the API call is retried (see request_audio).
+    Safe to call from several threads at once.
+
     Args:
         i (int): Index of the item
         item (Dict): Dictionary containing title and description
+        use_cache (bool): Set to False to skip the cache lookup and regenerate the audio
+        workspace (Workspace, optional): Run workspace to write to (defaults to outputs/)
+
+    Returns:
+        str: Path to the generated audio file
     """
-    try:
-        # Combine title and description with a pause
-        text = f"{item['title']}. {item['description']}"
+    # Combine title and description with a pause
+    text = f"{item['title']}. {item['description']}"
+
+    # Generate filename
+    filepath = get_workspace(workspace).audio_path(i)
+    os.makedirs(os.path.dirname(filepath), exist_ok=True)
+
+    cache_key = AssetCache.make_key(text, TTS_MODEL, TTS_VOICE, TTS_INSTRUCTIONS)
+    if use_cache and audio_cache.link_to(cache_key, filepath):
+        print(f"Reused cached audio for item {i}: {item['title']}")
+        return filepath
+
+    return request_audio(i, item, text, filepath, cache_key)
 
+
+@retry(stop=stop_after_attempt(MAX_RETRIES), wait=retry_wait, before_sleep=record_retry)
+def request_audio(i: int, item: Dict, text: str, filepath: str, cache_key: str) -> str:
+    """
+    Call the TTS API for text, store the audio in the cache under cache_key and link
+    filepath to it. Retried on failure, including rate limiting.
+    """
+    try:
         client = get_open_ai_client()
-                
+
         # Generate audio using OpenAI's TTS API
-        response = client.audio.speech.create(
-            model="tts-1",
-            voice="ash",
-            instructions="Speak in a engaging tone that would be informative and interesting for a youtube video. Use a professional, conversational style.",
-            input=text
+        response = get_rate_limit_governor().call(
+            ENDPOINT_AUDIO_SPEECH,
+            lambda: client.audio.speech.with_raw_response.create(
+                model=TTS_MODEL,
+                voice=TTS_VOICE,
+                instructions=TTS_INSTRUCTIONS,
+                input=text
+            )
         )
-                
-        # Generate filename
-        filename = f"item_{i:02d}.mp3"
-        filepath = os.path.join(AUDIO_OUTPUT_DIR, filename)
-                
-        # Save the audio file using streaming response
-        with open(filepath, 'wb') as f:
-            for chunk in response.iter_bytes():
-                f.write(chunk)
+
+        # Store the streamed audio in the cache and save the audio file
+        audio = b"".join(response.iter_bytes())
+        audio_cache.store_to(cache_key, audio, filepath)
+        get_metrics().increment("api_bytes_received_total", len(audio), endpoint=ENDPOINT_AUDIO_SPEECH)
 
         print(f"Generated audio for item {i}: {item['title']}")
-        return True
-    
+        return filepath
+
     except Exception as e:
         print(f"Error generating audio for item {i}: {str(e)}")
-        raise  # Re-raise the exception to be handled by the retry decorator
\ No newline at end of file
+        raise  # Re-raise the exception to be handled by the retry decorator
@@ -1,56 +1,60 @@
 import json
-import time
-from typing import List
+from typing import List, Optional
 
 from .utils import generate_image
 from utils.helper_functions import clean_json_input
-from utils.output_dirs import IMAGE_OUTPUT_DIR
+from utils.output_file_names import get_list_items_path
+from utils.parallel import run_in_parallel
+from utils.workspace import Workspace, get_workspace
 
 MAX_RETRIES = 3
-DELAY_BETWEEN_REQUESTS = 5  # seconds
+MAX_WORKERS = 4  # upper bound on concurrent image requests, the rate limit governor may allow fewer
 
 
-def generate_images(items_json: str) -> List[str]:
+def _generate_item_image(i: int, j: int, prompt: str, workspace: Workspace) -> str:
+    print(f"\nGenerating image for item {i}, prompt {j}:")
+    print(f"Using prompt: {prompt}")
+
+    # Generate a filename based on the item and prompt index
+    filename = f"item_{i:02d}_prompt_{j:02d}"
+
+    # Generate and save the image
+    image_path = generate_image(prompt, workspace.image_dir, filename)
+    print(f"Successfully generated image: {image_path}")
+    return image_path
+
+
+def generate_images(items_json: str, max_workers: int = MAX_WORKERS, workspace: Optional[Workspace] = None) -> List[str]:
     """
     Generate images for each item in the JSON list.
-    Generates images for each prompt in the image_prompts array.
-    Returns a list of paths to the generated images.
+    Generates images for each prompt in the image_prompts array, with up to max_workers
+    requests in flight at the same time, paced by the shared rate limit governor. A failed prompt does not stop the others.
+    Images are written to the workspace's image directory (outputs/ by default).
+    Returns a list of paths to the generated images, in item and prompt order.
     """
+    workspace = get_workspace(workspace)
+
     # Clean and parse the JSON string into a list of items
     cleaned_json = clean_json_input(items_json)
     items = json.loads(cleaned_json)
-    
-    image_paths = []
+
+    tasks = []
     for i, item in enumerate(items, start=1):
-        try:
-            print(f"\nProcessing item {i}: {item['title']}")
-            
-            # Generate images for each prompt in the image_prompts array
-            for j, prompt in enumerate(item['image_prompts'], start=1):
-                print(f"\nGenerating image for prompt {j}:")
-                print(f"Using prompt: {prompt}")
-                
-                # Generate a filename based on the item and prompt index
-                filename = f"item_{i:02d}_prompt_{j:02d}"
-                
-                # Generate and save the image
-                image_path = generate_image(prompt, IMAGE_OUTPUT_DIR, filename)
-                image_paths.append(image_path)
-                print(f"Successfully generated image: {image_path}")
-                
-                # Add delay between requests to avoid rate limiting
-                time.sleep(DELAY_BETWEEN_REQUESTS)
-            
-        except Exception as e:
-            print(f"Failed to generate images for item {i} after {MAX_RETRIES} attempts: {str(e)}")
-            print("Continuing with next item...")
-            continue
-    
-    return image_paths
+        print(f"\nProcessing item {i}: {item['title']}")
+        for j, prompt in enumerate(item['image_prompts'], start=1):
+            tasks.append((i, j, prompt, workspace))
+
+    def on_error(index: int, args: tuple, e: Exception):
+        i, j = args[:2]
+        print(f"Failed to generate image {j} for item {i} after {MAX_RETRIES} attempts: {str(e)}")
+        print("Continuing with next image...")
+
+    results = run_in_parallel(_generate_item_image, tasks, max_workers=max_workers, on_error=on_error)
+    return [path for path in results if path is not None]
 
 if __name__ == "__main__":
     # Read the JSON file from the output directory
-    json_path = f"outputs/json_output/list_items_with_prompts.json"
+    json_path = get_list_items_path()
     with open(json_path, 'r') as f:
         items_json = f.read()
     
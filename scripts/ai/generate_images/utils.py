@@ -1,33 +1,71 @@
 
 import base64
+import io
 import os
 from pathlib import Path
-from tenacity import retry, stop_after_attempt, wait_exponential
+from PIL import Image
+from tenacity import retry, stop_after_attempt
+from utils.asset_cache import AssetCache
+from utils.frame_store import get_frame_store
+from utils.metrics import get_metrics, record_retry
 from utils.open_ai_client import get_open_ai_client
+from utils.output_dirs import IMAGE_CACHE_DIR
+from utils.rate_limiter import ENDPOINT_IMAGES, get_rate_limit_governor, retry_wait
 
 MAX_RETRIES = 3
-DELAY_BETWEEN_REQUESTS = 5  # seconds
+IMAGE_CACHE_MAX_BYTES = 2 * 1024 * 1024 * 1024
 
+IMAGE_MODEL = "gpt-image-1"
+IMAGE_SIZE = "1024x1024"
+IMAGE_QUALITY = "low"
 
-@retry(stop=stop_after_attempt(MAX_RETRIES), wait=wait_exponential(multiplier=1, min=4, max=10))
-def generate_image(prompt: str, output_dir: str, filename: str) -> str:
+image_cache = AssetCache(IMAGE_CACHE_DIR, IMAGE_CACHE_MAX_BYTES, extension=".png")
+
+
+def generate_image(prompt: str, output_dir: str, filename: str, use_cache: bool = True,
+                   keep_in_memory: bool = False) -> str:
     """
     Generate an image using OpenAI's image generation API and save it to the specified directory.
+    Images are stored in a content-addressed cache keyed by (prompt, model, size, quality) and the
+    output file is linked into the cache, so a prompt that was already generated (e.g. an item name
+    shared by several topics) costs nothing. Pass use_cache=False to always call the API.
+    The cache is looked up once; only the API call is retried (see request_image).
+    With keep_in_memory=True the decoded image is also handed to the next stage through the
+    frame store, so it is not read back from disk.
+    Safe to call from several threads at once.
     Returns the path to the saved image.
     """
     # Create the output directory if it doesn't exist
     Path(output_dir).mkdir(parents=True, exist_ok=True)
-    
+    image_path = os.path.join(output_dir, f"{filename}.png")
+
+    cache_key = AssetCache.make_key(prompt, IMAGE_MODEL, IMAGE_SIZE, IMAGE_QUALITY)
+    if use_cache and image_cache.link_to(cache_key, image_path):
+        print(f"Reused cached image for prompt '{prompt}'")
+        return image_path
+
+    return request_image(prompt, image_path, cache_key, keep_in_memory)
+
+
+@retry(stop=stop_after_attempt(MAX_RETRIES), wait=retry_wait, before_sleep=record_retry)
+def request_image(prompt: str, image_path: str, cache_key: str, keep_in_memory: bool = False) -> str:
+    """
+    Call the image API for prompt, store the image in the cache under cache_key and link
+    image_path to it. Retried on failure, including rate limiting.
+    """
     try:
         client = get_open_ai_client()
 
         # Generate the image
-        response = client.images.generate(
-            model="gpt-image-1",
-            prompt=prompt,
-            size="1024x1024",
-            n=1,
-            quality="low"
+        response = get_rate_limit_governor().call(
+            ENDPOINT_IMAGES,
+            lambda: client.images.with_raw_response.generate(
+                model=IMAGE_MODEL,
+                prompt=prompt,
+                size=IMAGE_SIZE,
+                n=1,
+                quality=IMAGE_QUALITY
+            )
         )
         
         if not response.data or not response.data[0]:
@@ -36,12 +74,13 @@ def generate_image(prompt: str, output_dir: str, filename: str) -> str:
         if not b64_json:
             raise ValueError("No image data returned from API.")
         image_bytes = base64.b64decode(b64_json)
+        get_metrics().increment("api_bytes_received_total", len(image_bytes), endpoint=ENDPOINT_IMAGES)
 
-        image_path = os.path.join(output_dir, f"{filename}.png")
-        with open(image_path, "wb") as f:
-            f.write(image_bytes)
-        
+        image_cache.store_to(cache_key, image_bytes, image_path)
+        if keep_in_memory:
+            with Image.open(io.BytesIO(image_bytes)) as opened:
+                get_frame_store().put(image_path, opened.convert('RGB'), persist=False)
         return image_path
     except Exception as e:
         print(f"Error generating image with prompt '{prompt}': {str(e)}")
-        raise  # Re-raise the exception to be handled by the retry decorator
\ No newline at end of file
+        raise  # Re-raise the exception to be handled by the retry decorator
@@ -1,12 +1,23 @@
+import time
+import uuid
+from typing import Callable, Optional
+
+from tenacity import retry, stop_after_attempt
 from utils.helper_functions import clean_json_input
+from utils.json_stream import JsonArrayStream
+from utils.metrics import get_metrics, record_retry
 from utils.open_ai_client import get_open_ai_client
+from utils.rate_limiter import ENDPOINT_CHAT, get_rate_limit_governor, retry_wait
 import os
 
-from utils.output_dirs import JSON_OUTPUT_DIR
+from utils.workspace import Workspace, get_workspace
 
+LIST_MODEL = "gpt-4"
+LIST_TEMPERATURE = 0.7
+MAX_RETRIES = 3
 
 
-def generate_list(prompt_topic: str, num_items: int = 5):
+def build_list_messages(prompt_topic: str, num_items: int = 5):
     system_msg = "You are a helpful assistant that generates a list of interesting facts, places, or concepts, along with creative image prompts. Always ensure all content is family-friendly and appropriate for all audiences."
     user_msg = (
         f"Give me a list of {num_items} items for a YouTube video on the topic: '{prompt_topic}'. "
@@ -39,36 +50,100 @@ def generate_list(prompt_topic: str, num_items: int = 5):
         f"[{{'title': '...', 'description': '...', 'image_prompts': ['...', '...', '...']}}, ...]"
     )
 
-    client = get_open_ai_client()
+    return [
+        {"role": "system", "content": system_msg},
+        {"role": "user", "content": user_msg}
+    ]
 
-    response = client.chat.completions.create(
-        model="gpt-4",
-        messages=[
-            {"role": "system", "content": system_msg},
-            {"role": "user", "content": user_msg}
-        ],
-        temperature=0.7
-    )
 
-    content = response.choices[0].message.content
+def save_list_content(content: str, workspace: Optional[Workspace] = None) -> str:
+    """
+    Clean the model's JSON output and save it to the workspace's list items file.
+    """
+    workspace = get_workspace(workspace)
 
     # Clean the JSON input
     content = clean_json_input(content or "")
-    
+
     # Create outputs directory if it doesn't exist
-    os.makedirs(JSON_OUTPUT_DIR, exist_ok=True)
-    
-    # Save the JSON response to a file
-    filename = f"{JSON_OUTPUT_DIR}/list_items_with_prompts.json"
-    with open(filename, 'w') as f:
+    os.makedirs(workspace.json_dir, exist_ok=True)
+
+    # Save the JSON response to a file; replaced rather than written in place, since the
+    # previous file may be linked from elsewhere
+    temp_path = f"{workspace.list_items_path}.{uuid.uuid4().hex}.tmp"
+    with open(temp_path, 'w') as f:
         f.write(content)
+    os.replace(temp_path, workspace.list_items_path)
 
     print("\nGenerated Items with Image Prompts:\n")
     print(f"Content: {content}")
-    
+
     return content
 
 
+@retry(stop=stop_after_attempt(MAX_RETRIES), wait=retry_wait, before_sleep=record_retry)
+def request_list(prompt_topic: str, num_items: int = 5, stream: bool = False):
+    """
+    Send the list request through the rate limit governor. Rate limited and failed
+    requests are retried here, since the client's own retries are disabled. With
+    stream=True only opening the stream is retried: once items have been handed on,
+    a broken stream cannot be replayed.
+    """
+    client = get_open_ai_client()
+
+    return get_rate_limit_governor().call(
+        ENDPOINT_CHAT,
+        lambda: client.chat.completions.with_raw_response.create(
+            model=LIST_MODEL,
+            messages=build_list_messages(prompt_topic, num_items),
+            temperature=LIST_TEMPERATURE,
+            **({"stream": True} if stream else {})
+        )
+    )
+
+
+def generate_list(prompt_topic: str, num_items: int = 5, workspace: Optional[Workspace] = None):
+    response = request_list(prompt_topic, num_items)
+
+    return save_list_content(response.choices[0].message.content, workspace)
+
+
+def stream_list(prompt_topic: str, num_items: int = 5, on_item: Optional[Callable[[int, dict], None]] = None,
+                workspace: Optional[Workspace] = None):
+    """
+    Generate the list with a streamed chat completion. The JSON array is parsed as it
+    arrives and on_item(item_number, item) is called as soon as each item is complete,
+    so work on the first items can start while the rest are still being written.
+    The full list is saved to the list items file once the stream ends.
+
+    Args:
+        prompt_topic (str): Topic of the video
+        num_items (int): Number of items to generate
+        on_item (Callable, optional): Called with the 1-based item number and the item dict
+        workspace (Workspace, optional): Run workspace to write to (defaults to outputs/)
+    """
+    stream = request_list(prompt_topic, num_items, stream=True)
+
+    parser = JsonArrayStream()
+    chunks = []
+    started_at = time.perf_counter()
+    for chunk in stream:
+        if not chunk.choices or not chunk.choices[0].delta.content:
+            continue
+        text = chunk.choices[0].delta.content
+        chunks.append(text)
+        completed = parser.feed(text)
+        if completed:
+            get_metrics().observe("list_item_arrival_seconds", time.perf_counter() - started_at)
+        first_number = len(parser.items) - len(completed) + 1
+        for item_number, item in enumerate(completed, start=first_number):
+            print(f"Received item {item_number}: {item.get('title')}")
+            if on_item is not None:
+                on_item(item_number, item)
+
+    return save_list_content("".join(chunks), workspace)
+
+
 # Main function
 if __name__ == "__main__":
     topic = input("Enter a topic for your video: ")
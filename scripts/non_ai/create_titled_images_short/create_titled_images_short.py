@@ -1,43 +1,93 @@
 import json
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
 
 from .utils import create_titled_image_short
-from utils.output_dirs import IMAGE_OUTPUT_DIR
-from utils.output_file_names import get_image_file_name, get_list_items_path, get_titled_image_file_name
+from utils.metrics import MetricsRegistry, get_metrics, use_metrics
+from utils.output_file_names import get_list_items_path, get_titled_image_file_name
+from utils.parallel import get_process_context, run_in_parallel
+from utils.workspace import Workspace, get_workspace
 
+MAX_WORKERS = os.cpu_count() or 1  # processes composing titled images
 
-def create_titled_images_for_items_short(items_json: str):
+_titled_image_pool = None
+_titled_image_pool_lock = threading.Lock()
+
+
+def get_titled_image_pool() -> ProcessPoolExecutor:
+    """
+    Get or create the process pool shared by every titled image the pipeline composes.
+    """
+    global _titled_image_pool
+    with _titled_image_pool_lock:
+        if _titled_image_pool is None:
+            _titled_image_pool = ProcessPoolExecutor(max_workers=MAX_WORKERS, mp_context=get_process_context())
+    return _titled_image_pool
+
+
+def _create_titled_image_with_timings(image_path: str, title: str, output_filename: str, workspace: Workspace):
+    # Runs in a worker process: the steps are timed in a registry of their own and sent back
+    registry = MetricsRegistry()
+    with use_metrics(registry):
+        path = create_titled_image_short(image_path, title, output_filename, workspace)
+    timings = [(name, dict(labels), value) for (name, labels), histogram in registry.histograms.items()
+               for value in histogram.samples]
+    return path, timings
+
+
+def create_titled_image_in_pool(image_path: str, title: str, output_filename: str,
+                                workspace: Optional[Workspace] = None) -> str:
+    """
+    create_titled_image_short in the titled image process pool, for callers on a thread
+    (the pipeline's CPU tasks): composing is CPU bound, and on a thread it contends for
+    the GIL with every other stage. Blocks until the image is written; the
+    step timings are recorded in the caller's metrics.
+    """
+    path, timings = get_titled_image_pool().submit(
+        _create_titled_image_with_timings, image_path, title, output_filename, get_workspace(workspace)
+    ).result()
+    metrics = get_metrics()
+    for name, labels, value in timings:
+        metrics.observe(name, value, **labels)
+    return path
+
+
+def create_titled_images_for_items_short(items_json: str, max_workers: int = MAX_WORKERS,
+                                         workspace: Optional[Workspace] = None):
     """
     Generate titled images for each item in the JSON list, optimized for YouTube Shorts.
-    Generates titled images for each prompt in the image_prompts array.
+    Generates titled images for each prompt in the image_prompts array, using a pool of
+    max_workers processes. A failed image does not stop the others.
     
     Args:
         items_json (str): JSON string containing list of items with title, description, and image_prompts
+        max_workers (int): Number of worker processes (1 composes the images one at a time)
+        workspace (Workspace, optional): Run workspace to read from and write to (defaults to outputs/)
     """
+    workspace = get_workspace(workspace)
+
     # Parse the JSON string into a list of dictionaries
     items = json.loads(items_json)
-    
-    image_paths = []
+
+    tasks = []
     for i, item in enumerate(items, start=1):
-        try:
-            # Generate titled images for each prompt in the image_prompts array
-            for j, prompt in enumerate(item['image_prompts'], start=1):
-                # Get the source image path for this prompt
-                source_image_path = f"{IMAGE_OUTPUT_DIR}/{get_image_file_name(i, j)}"
-                
-                # Generate the titled image
-                output_filename = get_titled_image_file_name(i, j)
-                image_path = create_titled_image_short(
-                    source_image_path,
-                    item['title'],
-                    output_filename
-                )
-                image_paths.append(image_path)
-                print(f"Generated titled image for Shorts (prompt {j}): {image_path}")
-            
-        except Exception as e:
-            print(f"Failed to generate titled image for item {i}: {str(e)}")
-            continue
-    
+        # Generate titled images for each prompt in the image_prompts array
+        for j, _ in enumerate(item['image_prompts'], start=1):
+            # Get the source image path for this prompt
+            source_image_path = workspace.image_path(i, j)
+            tasks.append((source_image_path, item['title'], get_titled_image_file_name(i, j), workspace))
+
+    def on_error(index: int, args: tuple, e: Exception):
+        print(f"Failed to generate titled image for '{args[1]}' from '{args[0]}': {str(e)}")
+
+    results = run_in_parallel(
+        create_titled_image_short, tasks, max_workers=max_workers, on_error=on_error, use_processes=max_workers > 1
+    )
+    image_paths = [path for path in results if path is not None]
+    for path in image_paths:
+        print(f"Generated titled image for Shorts: {path}")
     return image_paths
 
 if __name__ == "__main__":
@@ -1,9 +1,14 @@
 import os
 import textwrap
+from functools import lru_cache
+from typing import Optional
 from PIL import Image, ImageDraw, ImageFont, ImageFilter
 from pathlib import Path
 
-from utils.output_dirs import TITLED_IMAGE_OUTPUT_DIR
+from utils.canvas import CANVAS_SIZES, DEFAULT_CANVAS
+from utils.frame_store import get_frame_store, save_image
+from utils.metrics import get_metrics
+from utils.workspace import Workspace, get_workspace
 
 def wrap_text(text, font, max_width):
     """
@@ -42,101 +47,156 @@ def wrap_text(text, font, max_width):
     
     return lines
 
-def create_titled_image_short(image_path: str, title: str, output_filename: str):
+# Font files to try for the title, in order of preference
+FONT_OPTIONS = [
+    "arial.ttf",
+    "Arial.ttf",
+    "arialbd.ttf",
+    "Arial-Bold.ttf",
+    "arial-bold.ttf",
+]
+TITLE_FONT_SIZE = 120
+
+# The background blur is computed at 1/BLUR_DOWNSCALE of the canvas size and scaled back
+# up. A radius 90 blur removes all detail that the lower resolution loses, so the result
+# looks the same at a fraction of the cost.
+BLUR_RADIUS = 90
+BLUR_DOWNSCALE = 8
+OVERLAY_OPACITY = 128  # white overlay over the blurred background, 0-255
+
+# Titled images saved as PNG (see TITLED_IMAGE_FORMAT) are intermediates, so favour encode speed
+# over file size (level 1 encodes about 3x faster than Pillow's default of 6, for ~25% larger files)
+PNG_COMPRESS_LEVEL = 1
+
+@lru_cache(maxsize=None)
+def get_title_font(font_size: int = TITLE_FONT_SIZE):
+    """
+    Load the title font once per process. Tries the fonts in FONT_OPTIONS and falls
+    back to Pillow's default font.
+    """
+    for font_path in FONT_OPTIONS:
+        try:
+            return ImageFont.truetype(font_path, font_size)
+        except (IOError, OSError):
+            continue
+
+    # If no system fonts work, use the default font
+    # Note: Default font size is usually small, but we'll work with what we have
+    return ImageFont.load_default()
+
+def create_blurred_background(source: Image.Image, size):
+    """
+    Create the blurred, lightened background for a titled image.
+    """
+    bg_width, bg_height = size
+    small_size = (max(1, bg_width // BLUR_DOWNSCALE), max(1, bg_height // BLUR_DOWNSCALE))
+    small = source.resize(small_size, Image.Resampling.BILINEAR, reducing_gap=2.0)
+    small = small.filter(ImageFilter.GaussianBlur(radius=BLUR_RADIUS / BLUR_DOWNSCALE))
+
+    # Add a semi-transparent white overlay to ensure text readability
+    overlay = Image.new('RGB', small_size, (255, 255, 255))
+    small = Image.blend(small, overlay, OVERLAY_OPACITY / 255)
+
+    return small.resize(size, Image.Resampling.BILINEAR)
+
+def compose_titled_image(source: Image.Image, title: str, canvas_size=CANVAS_SIZES[DEFAULT_CANVAS]) -> Image.Image:
+    """
+    Lay out a titled image on a canvas: the source image over a blurred copy of itself,
+    with the title below it. The layout was made for the 1080x1920 canvas; on other
+    canvases the image, title and gaps are scaled to the canvas height (the image is as
+    wide as a 9:16 canvas of that height, or the whole canvas if that is narrower), so
+    one decoded source can be laid out on every canvas.
+
+    Args:
+        source (Image.Image): The decoded source image, in RGB
+        title (str): Title text to add below the image
+        canvas_size (tuple): Width and height of the canvas
+    """
+    metrics = get_metrics()
+    bg_width, bg_height = canvas_size
+    image_width = min(bg_width, round(bg_height * 9 / 16))
+    scale = image_width / 1080  # 1 on the 1080x1920 canvas
+
+    # Resize the image to the width of the image area
+    aspect_ratio = source.width / source.height
+    new_height = int(image_width * aspect_ratio)
+    pil_image = source.resize((image_width, new_height), Image.Resampling.LANCZOS)
+
+    # Create blurred background from the source image
+    with metrics.timer("titled_image_step_seconds", step="blur"):
+        bg_image = create_blurred_background(source, (bg_width, bg_height))
+
+    # Calculate positions
+    image_y = (bg_height - new_height - round(80 * scale)) // 2  # 80px gap for text
+    image_x = (bg_width - image_width) // 2
+
+    # Paste the image onto the background
+    bg_image.paste(pil_image, (image_x, image_y))
+
+    # Add title text
+    draw = ImageDraw.Draw(bg_image)
+    font_size = round(TITLE_FONT_SIZE * scale)
+    font = get_title_font(font_size)
+
+    # Calculate text position and wrap text if needed
+    max_text_width = image_width - round(100 * scale)  # Leave 50px margin on each side
+    wrapped_lines = wrap_text(title, font, max_text_width)
+
+    # Calculate line height and total text height
+    line_height = font_size + round(10 * scale)  # Add some spacing between lines
+    total_text_height = len(wrapped_lines) * line_height
+
+    # Calculate text position
+    text_y = image_y + new_height + round(220 * scale)  # 150px gap below image (increased from 80px)
+
+    # Draw each line of text
+    for i, line in enumerate(wrapped_lines):
+        line_y = text_y + (i * line_height) - (total_text_height // 2)
+        draw.text((bg_width//2, line_y), line, fill='black', font=font, anchor="mm")
+
+    return bg_image
+
+def create_titled_image_short(image_path: str, title: str, output_filename: str, workspace: Optional[Workspace] = None,
+                              in_memory: bool = False, persist: bool = True):
     """
     Create an image with a title below it, matching the YouTube Shorts video layout.
     The background will be a blurred version of the source image.
+    The source image is decoded once and the title font is loaded once per process,
+    so this is cheap to call for many images, including from a process pool.
     
     Args:
         image_path (str): Path to the source image
         title (str): Title text to add below the image
-        output_filename (str): Name of the output file (without extension)
+        output_filename (str): Name of the output file; its extension (.npy or .png) sets the format
+        workspace (Workspace, optional): Run workspace to write to (defaults to outputs/)
+        in_memory (bool): Hand the titled image to the renderer through the frame store instead
+            of encoding it here; the source image is taken from the frame store when it is there
+        persist (bool): With in_memory, still write the PNG, in the background
     """
     try:
         # Create output directory if it doesn't exist
-        Path(TITLED_IMAGE_OUTPUT_DIR).mkdir(parents=True, exist_ok=True)
-        
-        # Load and resize image
-        pil_image = Image.open(image_path)
-        aspect_ratio = pil_image.width / pil_image.height
-        new_height = int(1080 * aspect_ratio)
-        pil_image = pil_image.resize((1080, new_height), Image.Resampling.LANCZOS)
-        
-        # Create background dimensions (1080x1920 for vertical video)
-        bg_width = 1080
-        bg_height = 1920
-        
-        # Create blurred background from the source image
-        bg_image = Image.open(image_path)
-        bg_image = bg_image.resize((bg_width, bg_height), Image.Resampling.LANCZOS)
-        bg_image = bg_image.filter(ImageFilter.GaussianBlur(radius=90))
-        
-        # Add a semi-transparent white overlay to ensure text readability
-        overlay = Image.new('RGBA', (bg_width, bg_height), (255, 255, 255, 128))
-        bg_image = Image.alpha_composite(bg_image.convert('RGBA'), overlay)
-        bg_image = bg_image.convert('RGB')
-        
-        # Calculate positions
-        image_y = (bg_height - new_height - 80) // 2  # 80px gap for text
-        image_x = (bg_width - 1080) // 2
+        output_dir = get_workspace(workspace).titled_image_dir
+        Path(output_dir).mkdir(parents=True, exist_ok=True)
         
-        # Paste the image onto the background
-        bg_image.paste(pil_image, (image_x, image_y))
-        
-        # Add title text
-        draw = ImageDraw.Draw(bg_image)
-        
-        # Try multiple font options with larger size for better visibility
-        font = None
-        font_size = 120  # Increased from 80 to 120 for better visibility
-        
-        # Try different font options in order of preference
-        font_options = [
-            "arial.ttf",
-            "Arial.ttf", 
-            "arialbd.ttf",
-            "Arial-Bold.ttf",
-            "arial-bold.ttf",
-        ]
-        
-        for font_path in font_options:
-            try:
-                font = ImageFont.truetype(font_path, font_size)
-                break
-            except (IOError, OSError):
-                continue
-        
-        # If no system fonts work, create a larger default font
-        if font is None:
-            try:
-                # Try to create a larger default font
-                font = ImageFont.load_default()
-                # Note: Default font size is usually small, but we'll work with what we have
-            except:
-                # Last resort - create a basic font
-                font = ImageFont.load_default()
-        
-        # Calculate text position and wrap text if needed
-        max_text_width = bg_width - 100  # Leave 50px margin on each side
-        wrapped_lines = wrap_text(title, font, max_text_width)
-        
-        # Calculate line height and total text height
-        line_height = font_size + 10  # Add some spacing between lines
-        total_text_height = len(wrapped_lines) * line_height
-        
-        # Calculate text position
-        text_y = image_y + new_height + 220  # 150px gap below image (increased from 80px)
-        
-        # Draw each line of text
-        for i, line in enumerate(wrapped_lines):
-            line_y = text_y + (i * line_height) - (total_text_height // 2)
-            draw.text((bg_width//2, line_y), line, fill='black', font=font, anchor="mm")
+        metrics = get_metrics()
+
+        # Load the source image once
+        source = get_frame_store().pop(image_path) if in_memory else None
+        if source is None:
+            with metrics.timer("titled_image_step_seconds", step="decode"), Image.open(image_path) as opened:
+                source = opened.convert('RGB')
+
+        bg_image = compose_titled_image(source, title)
         
         # Save the final image
-        output_path = os.path.join(TITLED_IMAGE_OUTPUT_DIR, output_filename)
-        bg_image.save(output_path)
+        output_path = os.path.join(output_dir, output_filename)
+        if in_memory:
+            get_frame_store().put(output_path, bg_image, persist, PNG_COMPRESS_LEVEL)
+            return output_path
+        with metrics.timer("titled_image_step_seconds", step="encode"):
+            save_image(bg_image, output_path, PNG_COMPRESS_LEVEL)
         
         return output_path
     except Exception as e:
         print(f"Error generating titled image for '{title}' from '{image_path}': {str(e)}")
-        raise  # Re-raise the exception to be handled by the caller
\ No newline at end of file
+        raise  # Re-raise the exception to be handled by the caller
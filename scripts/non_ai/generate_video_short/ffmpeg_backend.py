@@ -0,0 +1,411 @@
+import bisect
+import hashlib
+import math
+import os
+import subprocess
+import tempfile
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from PIL import Image
+
+from scripts.non_ai.generate_video_short.utils import (
+    AUDIO_CODEC,
+    AUDIO_END_PADDING,
+    AUDIO_SAMPLE_RATE,
+    AUDIO_START_PADDING,
+    CANVAS_SIZE,
+    FPS,
+    VIDEO_CODEC,
+    EncodingProfile,
+    ZoomRenderer,
+    create_zoom_effect,
+    get_encoding_profile,
+    get_ffmpeg_binary,
+)
+from scripts.non_ai.create_titled_images_short.utils import compose_titled_image
+from scripts.non_ai.generate_video_short.soundtrack import write_narration_wav
+from utils.asset_cache import AssetCache
+from utils.frame_store import get_frame_store, load_image
+
+
+class ItemSegment:
+    """
+    Everything needed to render one item: its duration, titled images and narration.
+    The images are only decoded when the segment is opened for rendering, so closed
+    segments are cheap to pickle and send to worker processes. When the titled images
+    were handed over in memory, take_images() moves them into the segment instead, and
+    they travel to the worker with it as raw pixels. The images are laid out on a
+    canvas of canvas_size.
+    """
+
+    def __init__(self, item_index: int, duration: float, image_paths: List[str], audio_path: str,
+                 canvas_size=CANVAS_SIZE):
+        self.item_index = item_index
+        self.duration = duration
+        self.image_paths = image_paths
+        self.audio_path = audio_path
+        self.canvas_size = canvas_size
+        self.video_path: Optional[str] = None  # set once the segment is rendered on its own
+        self.images: Optional[List[Image.Image]] = None
+        self._renderers: Optional[List[ZoomRenderer]] = None
+        self._zoom_effect = None
+
+    def take_images(self) -> bool:
+        """
+        Move the titled images out of the frame store into the segment.
+        Returns False (and takes nothing) unless all of them are there.
+        """
+        store = get_frame_store()
+        images = [store.get(path) for path in self.image_paths]
+        if any(image is None for image in images):
+            return False
+        self.images = images
+        store.discard(self.image_paths)
+        return True
+
+    def frame_count(self, fps: float = FPS) -> int:
+        """Number of frames when the segment is rendered on its own."""
+        return math.ceil(self.duration * fps)
+
+    def open(self, profile: Optional[EncodingProfile] = None):
+        if self._renderers is None:
+            profile = get_encoding_profile(profile)
+            images = self.images or [load_image(path) for path in self.image_paths]
+            self._renderers = [
+                ZoomRenderer(image, self.canvas_size, profile.zoom_quality, profile.scaled_size(self.canvas_size))
+                for image in images
+            ]
+            self._zoom_effect = create_zoom_effect(self.duration)
+
+    def close(self):
+        self._renderers = None
+        self._zoom_effect = None
+
+    def render(self, t: float) -> np.ndarray:
+        """Frame at time t (seconds from the start of the segment), same layout as the moviepy path."""
+        image_duration = self.duration / len(self._renderers)
+        j = min(int(t / image_duration), len(self._renderers) - 1)
+        return self._renderers[j].render(self._zoom_effect(t - j * image_duration))
+
+
+class MultiCanvasSegment:
+    """
+    One item laid out on several canvases at once. Opening it decodes each source image
+    once and composes the titled image for every canvas from that decode; render(t)
+    returns the frame of every canvas at time t, in the order of canvas_sizes. It plays
+    back in a SegmentCursor like an ItemSegment.
+    """
+
+    def __init__(self, item_index: int, duration: float, title: str, source_paths: List[str], audio_path: str,
+                 canvas_sizes: List[Tuple[int, int]]):
+        self.item_index = item_index
+        self.duration = duration
+        self.title = title
+        self.source_paths = source_paths
+        self.audio_path = audio_path
+        self.segments = [ItemSegment(item_index, duration, [], audio_path, size) for size in canvas_sizes]
+        self._opened = False
+
+    def open(self, profile: Optional[EncodingProfile] = None):
+        if self._opened:
+            return
+        sources = [load_image(path).convert("RGB") for path in self.source_paths]
+        for segment in self.segments:
+            segment.images = [compose_titled_image(source, self.title, segment.canvas_size) for source in sources]
+            segment.open(profile)
+            segment.images = None  # the renderers keep their own copy
+        self._opened = True
+
+    def close(self):
+        for segment in self.segments:
+            segment.close()
+        self._opened = False
+
+    def render(self, t: float) -> List[np.ndarray]:
+        return [segment.render(t) for segment in self.segments]
+
+
+LOOKAHEAD_SEGMENTS = 1  # segments opened ahead of the one being rendered
+
+
+class SegmentCursor:
+    """
+    Frames of segments played back to back, for renders of a whole video. Only the
+    segment being rendered is open; the next LOOKAHEAD_SEGMENTS are opened (their images
+    decoded) in a background thread meanwhile, and segments are closed as soon as
+    playback leaves them. Memory stays flat however many segments there are.
+    Works the same over MultiCanvasSegments, whose frames are lists of frames.
+    """
+
+    def __init__(self, segments: List[ItemSegment], profile: Optional[EncodingProfile] = None,
+                 lookahead: int = LOOKAHEAD_SEGMENTS):
+        self.segments = segments
+        self.profile = get_encoding_profile(profile)
+        self.lookahead = lookahead
+        self.starts = [0.0]
+        for segment in segments:
+            self.starts.append(self.starts[-1] + segment.duration)
+        self._opening: Dict[int, Future] = {}
+        self._opener = ThreadPoolExecutor(max_workers=1, thread_name_prefix="segment-lookahead")
+        self._index: Optional[int] = None
+
+    @property
+    def duration(self) -> float:
+        return self.starts[-1]
+
+    def _open(self, index: int) -> Future:
+        if index not in self._opening:
+            self._opening[index] = self._opener.submit(self.segments[index].open, self.profile)
+        return self._opening[index]
+
+    def _move_to(self, index: int):
+        keep = range(index, min(index + self.lookahead, len(self.segments) - 1) + 1)
+        for opened in [k for k in self._opening if k not in keep]:
+            self._opening.pop(opened).result()
+            self.segments[opened].close()
+        self._open(index).result()
+        for k in keep[1:]:
+            self._open(k)
+        self._index = index
+
+    def frame(self, t: float):
+        """Frame at time t from the start of the first segment."""
+        index = min(max(bisect.bisect_right(self.starts, t) - 1, 0), len(self.segments) - 1)
+        if index != self._index:
+            self._move_to(index)
+        return self.segments[index].render(t - self.starts[index])
+
+    def close(self):
+        for index in list(self._opening):
+            self._opening.pop(index).result()
+            self.segments[index].close()
+        self._opener.shutdown()
+        self._index = None
+
+
+class FFmpegFrameWriter:
+    """
+    Pipe raw RGB frames to an ffmpeg process over stdin and mux them with the given audio.
+    Frames have the profile's output size (or size) and rate and are encoded with its settings,
+    the same ones the moviepy path uses. Without audio_args only the video stream is written.
+    """
+
+    def __init__(self, output_path: str, audio_args: Optional[List[str]] = None, audio_map: Optional[str] = None,
+                 profile: Optional[EncodingProfile] = None, threads: Optional[int] = None,
+                 size: Optional[Tuple[int, int]] = None):
+        profile = get_encoding_profile(profile)
+        width, height = size or profile.output_size
+        command = [
+            get_ffmpeg_binary(), '-y', '-loglevel', 'error',
+            '-f', 'rawvideo', '-vcodec', 'rawvideo',
+            '-s', f'{width}x{height}', '-pix_fmt', 'rgb24', '-r', f'{profile.fps:.02f}',
+            '-i', '-',
+        ]
+        if audio_args:
+            command += [*audio_args, '-map', '0:v', '-map', audio_map]
+        command += get_video_encoder_args(profile, threads)
+        if audio_args:
+            command += get_audio_encoder_args()
+        else:
+            command += ['-an']
+        command.append(output_path)
+        # A previous output may be a hardlink into a cache; replace it rather than write through it
+        if os.path.lexists(output_path):
+            os.remove(output_path)
+        self.process = subprocess.Popen(command, stdin=subprocess.PIPE)
+
+    def write(self, frame: np.ndarray):
+        self.process.stdin.write(memoryview(frame))
+
+    def close(self):
+        self.process.stdin.close()
+        if self.process.wait() != 0:
+            raise RuntimeError(f"ffmpeg exited with code {self.process.returncode}")
+
+
+def get_video_encoder_args(profile: Optional[EncodingProfile] = None, threads: Optional[int] = None) -> List[str]:
+    """
+    Video encoder settings of a profile, identical for whole videos and separately rendered
+    segments. threads overrides the profile's thread count.
+    """
+    profile = get_encoding_profile(profile)
+    args = ['-vcodec', VIDEO_CODEC, '-preset', profile.preset, '-crf', str(profile.crf), '-pix_fmt', 'yuv420p']
+    threads = threads if threads is not None else profile.threads
+    if threads is not None:
+        args += ['-threads', str(threads)]
+    return args
+
+
+def get_audio_encoder_args() -> List[str]:
+    return ['-acodec', AUDIO_CODEC, '-ar', str(AUDIO_SAMPLE_RATE), '-ac', '2']
+
+
+def segment_fingerprint(segment: ItemSegment, profile: Optional[EncodingProfile] = None) -> str:
+    """
+    Hash of everything that determines a rendered segment: the titled images, the
+    narration (which sets the duration), the padding and the encoding profile.
+    Images held in memory are hashed by their pixels, since they have no file yet.
+    """
+    profile = get_encoding_profile(profile)
+    if segment.images is not None:
+        image_hashes = [hashlib.sha256(image.tobytes()).hexdigest() for image in segment.images]
+    else:
+        image_hashes = [AssetCache.hash_file(path) for path in segment.image_paths]
+    return AssetCache.make_key(
+        image_hashes,
+        AssetCache.hash_file(segment.audio_path),
+        AUDIO_START_PADDING,
+        AUDIO_END_PADDING,
+        get_video_encoder_args(profile),
+        profile.zoom_quality,
+        list(profile.scaled_size(segment.canvas_size)),
+        profile.fps,
+    )
+
+
+@contextmanager
+def narration_wav(segments: List[ItemSegment], durations: Optional[List[float]] = None):
+    """
+    Write the narration for the segments to a temporary WAV file, one item at a time
+    (see write_narration_wav), and yield its path. Each segment's slot lasts
+    segment.duration unless durations are given.
+    """
+    if durations is None:
+        durations = [segment.duration for segment in segments]
+
+    fd, wav_path = tempfile.mkstemp(suffix='.wav')
+    os.close(fd)
+    try:
+        write_narration_wav(wav_path, [segment.audio_path for segment in segments], durations)
+        yield wav_path
+    finally:
+        os.remove(wav_path)
+
+
+@contextmanager
+def narration_track(segments: List[ItemSegment], durations: Optional[List[float]] = None):
+    """
+    Build the narration for the segments as one PCM track (see narration_wav) and yield
+    the ffmpeg input arguments and stream map for it. Input 0 is the video stream, so
+    the track is input 1.
+    """
+    with narration_wav(segments, durations) as wav_path:
+        yield ['-i', wav_path], '1:a'
+
+
+def render_segments(segments: List[ItemSegment], output_path: str, profile: Optional[EncodingProfile] = None):
+    """
+    Render the segments back to back into output_path without moviepy's compositing:
+    each rendered frame is piped straight to ffmpeg.
+    Frame timing matches moviepy (frames at k / fps over the concatenated duration).
+    Only the current segment and the next one are held in memory at a time.
+    """
+    profile = get_encoding_profile(profile)
+    with narration_track(segments) as (audio_args, audio_map):
+        writer = FFmpegFrameWriter(output_path, audio_args, audio_map, profile)
+        cursor = SegmentCursor(segments, profile)
+        try:
+            for t in np.arange(0, cursor.duration, 1.0 / profile.fps):
+                writer.write(cursor.frame(t))
+        finally:
+            cursor.close()
+            writer.close()
+
+    return output_path
+
+
+def render_canvases(segments: List[MultiCanvasSegment], output_paths: List[str],
+                    profile: Optional[EncodingProfile] = None) -> List[str]:
+    """
+    Render the segments back to back on every canvas in one pass, into one output path
+    per canvas. The narration is decoded once into a track every encoder reads, each item's
+    source images are decoded once for all canvases, and every frame time is rendered for
+    all canvases before moving on, so the encoders (one ffmpeg process per canvas) run
+    side by side.
+    """
+    profile = get_encoding_profile(profile)
+    sizes = [profile.scaled_size(segment.canvas_size) for segment in segments[0].segments]
+    with narration_track(segments) as (audio_args, audio_map):
+        writers = [
+            FFmpegFrameWriter(path, audio_args, audio_map, profile, size=size)
+            for path, size in zip(output_paths, sizes)
+        ]
+        cursor = SegmentCursor(segments, profile)
+        try:
+            for t in np.arange(0, cursor.duration, 1.0 / profile.fps):
+                for writer, frame in zip(writers, cursor.frame(t)):
+                    writer.write(frame)
+        finally:
+            cursor.close()
+            for writer in writers:
+                writer.close()
+
+    return output_paths
+
+
+def render_segment_video(segment: ItemSegment, output_path: str, profile: Optional[EncodingProfile] = None,
+                         threads: Optional[int] = None) -> Tuple[str, Dict[str, float]]:
+    """
+    Render a single segment's video stream (no audio) into output_path. The segment is
+    rendered as a whole number of frames; concat_segments pads the narration to match,
+    so segments rendered separately stay in sync when joined.
+    Runs in worker processes, so everything it needs travels with the segment and the
+    time spent is returned with the path: decoding the images ("open"), rendering frames
+    ("frames"), waiting on the x264 encoder ("encode") and flushing it ("flush").
+    """
+    profile = get_encoding_profile(profile)
+    timings = {"open": 0.0, "frames": 0.0, "encode": 0.0, "flush": 0.0}
+    writer = FFmpegFrameWriter(output_path, profile=profile, threads=threads)
+    try:
+        started_at = time.perf_counter()
+        segment.open(profile)
+        timings["open"] = time.perf_counter() - started_at
+        for k in range(segment.frame_count(profile.fps)):
+            started_at = time.perf_counter()
+            frame = segment.render(k / profile.fps)
+            rendered_at = time.perf_counter()
+            writer.write(frame)
+            timings["frames"] += rendered_at - started_at
+            timings["encode"] += time.perf_counter() - rendered_at
+    finally:
+        segment.close()
+        started_at = time.perf_counter()
+        writer.close()
+        timings["flush"] = time.perf_counter() - started_at
+    return output_path, timings
+
+
+def concat_segments(segments: List[ItemSegment], output_path: str, profile: Optional[EncodingProfile] = None) -> str:
+    """
+    Join separately rendered segment videos with ffmpeg's concat demuxer without
+    re-encoding them, and add the narration track encoded once for the whole video.
+    The segments must have been rendered with the given profile.
+    """
+    fps = get_encoding_profile(profile).fps
+    with tempfile.NamedTemporaryFile('w', suffix='.txt', delete=False) as concat_list:
+        for segment in segments:
+            escaped_path = os.path.abspath(segment.video_path).replace("'", "'\\''")
+            concat_list.write(f"file '{escaped_path}'\n")
+
+    durations = [segment.frame_count(fps) / fps for segment in segments]
+    try:
+        with narration_track(segments, durations) as (audio_args, audio_map):
+            command = [
+                get_ffmpeg_binary(), '-y', '-loglevel', 'error',
+                '-f', 'concat', '-safe', '0', '-i', concat_list.name,
+                *audio_args,
+                '-map', '0:v', '-map', audio_map,
+                '-vcodec', 'copy',
+                *get_audio_encoder_args(),
+                output_path,
+            ]
+            if os.path.lexists(output_path):
+                os.remove(output_path)
+            subprocess.run(command, check=True)
+    finally:
+        os.remove(concat_list.name)
+    return output_path
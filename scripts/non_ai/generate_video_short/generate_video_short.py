@@ -1,13 +1,265 @@
 import json
-from moviepy.editor import AudioFileClip, concatenate_videoclips
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import List, Optional, Union
 import os
+import threading
 
-from scripts.non_ai.generate_video_short.utils import create_item_video_clip
-from utils.output_dirs import AUDIO_OUTPUT_DIR, VIDEO_OUTPUT_DIR
-from utils.output_file_names import get_audio_file_name, get_list_items_path, get_video_output_path
+from scripts.non_ai.generate_video_short.ffmpeg_backend import (
+    ItemSegment,
+    MultiCanvasSegment,
+    SegmentCursor,
+    concat_segments,
+    narration_wav,
+    render_canvases,
+    render_segment_video,
+    render_segments,
+    segment_fingerprint,
+)
+from scripts.non_ai.generate_video_short.utils import (
+    AUDIO_CODEC,
+    AUDIO_SAMPLE_RATE,
+    VIDEO_CODEC,
+    EncodingProfile,
+    create_item_video_clip,
+    get_encoding_profile,
+    get_titled_image_paths,
+)
+from scripts.non_ai.generate_video_short.soundtrack import Soundtrack, get_item_duration
+from utils.asset_cache import AssetCache
+from utils.canvas import DEFAULT_CANVAS, get_canvas_size
+from utils.metrics import get_metrics
+from utils.output_dirs import SEGMENT_CACHE_DIR
+from utils.parallel import get_process_context
+from utils.workspace import Workspace, get_workspace
 
+# "moviepy" composites clips with moviepy, "ffmpeg" renders each frame at the output size
+# and pipes it straight to ffmpeg. Both produce the same layout and timing.
+MOVIEPY_BACKEND = "moviepy"
+FFMPEG_BACKEND = "ffmpeg"
+RENDER_BACKEND = FFMPEG_BACKEND
 
-def generate_video_short():
+# With the moviepy backend, draw every frame from the item on screen (plus a lookahead)
+# and stream the narration from a WAV file, instead of compositing clips for every item
+# up front, so long compilations render in flat memory. The ffmpeg backend always does.
+STREAM_RENDER = True
+
+# With the ffmpeg backend, render every item into its own segment file in a process pool
+# and join the segments without re-encoding. Rendered segments are cached by a fingerprint
+# of their inputs, so only items that changed are encoded again.
+RENDER_SEGMENTS_SEPARATELY = True
+SEGMENT_WORKERS = os.cpu_count() or 1
+SEGMENT_ENCODER_THREADS = 2  # x264 threads per segment, keeps many parallel encoders from oversubscribing
+SEGMENT_CACHE_MAX_BYTES = 5 * 1024 * 1024 * 1024
+
+segment_cache = AssetCache(SEGMENT_CACHE_DIR, SEGMENT_CACHE_MAX_BYTES, extension=".mp4")
+
+_segment_pool = None
+_segment_pool_lock = threading.Lock()
+
+
+def get_segment_pool() -> ProcessPoolExecutor:
+    """
+    Get or create the process pool shared by every segment render. Its workers are
+    started by a fork server (see get_process_context), since the pool is created from
+    a render thread while the other pools are running.
+    """
+    global _segment_pool
+    with _segment_pool_lock:
+        if _segment_pool is None:
+            _segment_pool = ProcessPoolExecutor(max_workers=SEGMENT_WORKERS, mp_context=get_process_context())
+    return _segment_pool
+
+
+def renders_segments_separately(backend: str = RENDER_BACKEND) -> bool:
+    return backend == FFMPEG_BACKEND and RENDER_SEGMENTS_SEPARATELY
+
+
+def submit_segment_render(segment: ItemSegment, workspace: Optional[Workspace] = None,
+                          profile: Union[str, EncodingProfile, None] = None) -> Future:
+    """
+    Start rendering a segment's video into the workspace's segment directory in the process pool.
+    If a segment with the same fingerprint was rendered before, it is linked from the
+    segment cache instead. Returns a future that resolves to the segment file's path.
+    """
+    workspace = get_workspace(workspace)
+    profile = get_encoding_profile(profile)
+    os.makedirs(workspace.segment_dir, exist_ok=True)
+    output_path = workspace.segment_path(segment.item_index)
+
+    fingerprint = segment_fingerprint(segment, profile)
+    if segment_cache.link_to(fingerprint, output_path):
+        print(f"Reused cached segment for item {segment.item_index}")
+        future = Future()
+        future.set_result(output_path)
+        return future
+
+    metrics = get_metrics()
+    future = Future()
+
+    def on_rendered(render: Future):
+        # Runs on the pool's thread: record the worker's timings, cache the segment, then resolve
+        try:
+            path, timings = render.result()
+            for step, seconds in timings.items():
+                metrics.observe("segment_step_seconds", seconds, step=step)
+            segment_cache.put_file(fingerprint, path)
+        except BaseException as e:
+            future.set_exception(e)
+            return
+        future.set_result(path)
+
+    get_segment_pool().submit(
+        render_segment_video, segment, output_path, profile, threads=SEGMENT_ENCODER_THREADS
+    ).add_done_callback(on_rendered)
+    return future
+
+
+def create_item_segment(item_index: int, backend: str = RENDER_BACKEND, render: bool = False,
+                        workspace: Optional[Workspace] = None, in_memory: bool = False,
+                        profile: Union[str, EncodingProfile, None] = None):
+    """
+    Prepare a single item for rendering from its audio file and titled images.
+    The segment lasts 0.2s + the audio duration + 0.5s; the duration is read from the
+    MP3 headers without decoding the audio. With render=True and segment rendering
+    enabled, the segment's video is rendered (in the process pool) before returning;
+    with in_memory=True the titled images are taken from the frame store rather than
+    decoded from disk, and released once the segment is rendered. The segment is
+    rendered with the given encoding profile (ENCODING_PROFILE by default).
+    """
+    workspace = get_workspace(workspace)
+    total_duration = get_item_duration(item_index, workspace)
+    audio_file = workspace.audio_path(item_index)
+    segment = ItemSegment(item_index, total_duration, get_titled_image_paths(item_index, workspace), audio_file)
+    if render and renders_segments_separately(backend):
+        if in_memory:
+            segment.take_images()
+        try:
+            segment.video_path = submit_segment_render(segment, workspace, profile).result()
+        finally:
+            segment.images = None
+    return segment
+
+
+def write_final_video(segments: List[ItemSegment], backend: str = RENDER_BACKEND,
+                      workspace: Optional[Workspace] = None, profile: Union[str, EncodingProfile, None] = None):
+    """
+    Concatenate the item segments and encode them into the workspace's final video
+    with the given encoding profile; rendered segments must have been rendered with it.
+    """
+    workspace = get_workspace(workspace)
+    profile = get_encoding_profile(profile)
+    output_path = workspace.video_output_path
+    os.makedirs(workspace.video_dir, exist_ok=True)
+
+    if backend == FFMPEG_BACKEND:
+        if all(segment.video_path for segment in segments):
+            print(f"Joining {len(segments)} rendered segments into {output_path}")
+            return concat_segments(segments, output_path, profile)
+        print(f"Rendering {output_path} with the ffmpeg backend")
+        return render_segments(segments, output_path, profile)
+
+    if STREAM_RENDER:
+        print(f"Rendering {output_path} with the moviepy backend, one item at a time")
+        return write_streamed_moviepy_video(segments, output_path, profile)
+
+    from moviepy.video.compositing.concatenate import concatenate_videoclips
+
+    # Create final video
+    clips = [
+        create_item_video_clip(segment.item_index, segment.duration, profile, workspace=workspace)
+        for segment in segments
+    ]
+    final_clip = concatenate_videoclips(clips)
+    soundtrack = Soundtrack.build([segment.audio_path for segment in segments],
+                                  [segment.duration for segment in segments])
+    final_clip = final_clip.set_audio(soundtrack.to_audio_clip())
+
+    # Write the final video
+    write_moviepy_clip(final_clip, output_path, profile)
+
+    # Cleanup
+    final_clip.close()
+    for clip in clips:
+        clip.close()
+
+    return output_path
+
+
+def write_canvas_videos(items: list, canvases: List[str], workspace: Optional[Workspace] = None,
+                        profile: Union[str, EncodingProfile, None] = None) -> List[str]:
+    """
+    Render the video on several canvases (e.g. "vertical", "square" and "landscape") in one
+    pass with the ffmpeg backend, straight from the generated images and narration: each
+    source image and narration file is decoded once, every canvas's titled images are laid
+    out from that decode in memory, and one encoder per canvas is fed from the same loop.
+    No titled images or segments are needed. Returns the video paths, one per canvas.
+
+    Args:
+        items (list): The items of the list, for their titles and number of images
+        canvases (list): Names of the canvases, see CANVAS_SIZES in utils/canvas.py
+        workspace (Workspace, optional): Run workspace to read from and write to (defaults to outputs/)
+        profile (str, optional): Encoding profile of every video (defaults to ENCODING_PROFILE)
+    """
+    workspace = get_workspace(workspace)
+    canvas_sizes = [get_canvas_size(canvas) for canvas in canvases]
+    segments = [
+        MultiCanvasSegment(
+            i,
+            get_item_duration(i, workspace),
+            item['title'],
+            [workspace.image_path(i, j) for j in range(1, len(item['image_prompts']) + 1)],
+            workspace.audio_path(i),
+            canvas_sizes,
+        )
+        for i, item in enumerate(items, start=1)
+    ]
+    output_paths = [workspace.video_path(canvas) for canvas in canvases]
+    os.makedirs(workspace.video_dir, exist_ok=True)
+    print(f"Rendering {', '.join(output_paths)} in one pass")
+    return render_canvases(segments, output_paths, get_encoding_profile(profile))
+
+
+def write_streamed_moviepy_video(segments: List[ItemSegment], output_path: str, profile: EncodingProfile):
+    """
+    Encode the segments with moviepy from a single clip that draws each frame from a
+    SegmentCursor, with the narration read from a WAV file as it is encoded. Only the
+    item on screen and the next one are in memory, and only one audio file is open.
+    """
+    from moviepy.audio.io.AudioFileClip import AudioFileClip
+    from moviepy.video.VideoClip import VideoClip
+
+    cursor = SegmentCursor(segments, profile)
+    try:
+        with narration_wav(segments) as wav_path:
+            audio_clip = AudioFileClip(wav_path, fps=AUDIO_SAMPLE_RATE)
+            clip = VideoClip(cursor.frame, duration=cursor.duration).set_audio(audio_clip)
+            try:
+                write_moviepy_clip(clip, output_path, profile)
+            finally:
+                clip.close()
+                audio_clip.close()
+    finally:
+        cursor.close()
+    return output_path
+
+
+def write_moviepy_clip(clip, output_path: str, profile: EncodingProfile):
+    # A previous output may be a hardlink into a cache; replace it rather than write through it
+    if os.path.lexists(output_path):
+        os.remove(output_path)
+    clip.write_videofile(
+        output_path,
+        fps=profile.fps,
+        codec=VIDEO_CODEC,
+        audio_codec=AUDIO_CODEC,
+        preset=profile.preset,
+        threads=profile.threads,
+        ffmpeg_params=['-crf', str(profile.crf)],
+    )
+
+
+def generate_video_short(backend: str = RENDER_BACKEND, workspace: Optional[Workspace] = None,
+                         profile: Union[str, EncodingProfile, None] = None, canvases: Optional[List[str]] = None):
     """
     Generate a vertical video suitable for YouTube Shorts by combining titled images and audio files based on JSON input.
     Each item will:
@@ -16,41 +268,33 @@ def generate_video_short():
     - Display all three images for the item, evenly distributed during the duration
     - Maintain 9:16 aspect ratio (1080x1920) for YouTube Shorts
     - Include a smooth zoom effect on the images
+
+    Args:
+        backend (str): "ffmpeg" (default) or "moviepy"
+        workspace (Workspace, optional): Run workspace to read from and write to (defaults to outputs/)
+        profile (str, optional): Encoding profile, "draft", "review" or "final" (defaults to ENCODING_PROFILE)
+        canvases (list, optional): Render one video per canvas in a single pass (see write_canvas_videos)
+            instead of the 9:16 video alone
     """
-    # Setup paths and create output directory
-    json_path = get_list_items_path()
-    output_path = get_video_output_path()
-    os.makedirs(VIDEO_OUTPUT_DIR, exist_ok=True)
-    
+    workspace = get_workspace(workspace)
+    profile = get_encoding_profile(profile)
+
     # Load data
-    with open(json_path, 'r') as f:
+    with open(workspace.list_items_path, 'r') as f:
         data = json.load(f)
-    
+
+    if canvases and canvases != [DEFAULT_CANVAS]:
+        return write_canvas_videos(data, canvases, workspace, profile)
+
     # Process each item
-    video_clips = []
-    for i, item in enumerate(data, start=1):
-        audio_file = os.path.join(AUDIO_OUTPUT_DIR, get_audio_file_name(i))
-        audio_clip = AudioFileClip(audio_file)
-        total_duration = 0.2 + audio_clip.duration + 0.5
-        
-        video_clip = create_item_video_clip(i, total_duration)
-        video_clips.append(video_clip)
-    
-    # Create final video
-    final_clip = concatenate_videoclips(video_clips)
-    
-    # Write the final video
-    final_clip.write_videofile(
-        output_path,
-        fps=24,
-        codec='libx264',
-        audio_codec='aac'
-    )
-    
-    # Cleanup
-    final_clip.close()
-    for clip in video_clips:
-        clip.close()
+    segments = [create_item_segment(i, backend, workspace=workspace) for i in range(1, len(data) + 1)]
+    if renders_segments_separately(backend):
+        # Render all segments in parallel, then join them
+        futures = [submit_segment_render(segment, workspace, profile) for segment in segments]
+        for segment, future in zip(segments, futures):
+            segment.video_path = future.result()
+
+    return write_final_video(segments, backend, workspace, profile)
 
 if __name__ == "__main__":
-    generate_video_short() 
\ No newline at end of file
+    generate_video_short()
@@ -0,0 +1,223 @@
+import mmap
+import os
+import subprocess
+import wave
+from typing import Iterator, List, Optional
+
+import numpy as np
+
+from scripts.non_ai.generate_video_short.utils import (
+    AUDIO_END_PADDING,
+    AUDIO_SAMPLE_RATE,
+    AUDIO_START_PADDING,
+    get_ffmpeg_binary,
+)
+from utils.workspace import Workspace, get_workspace
+
+AUDIO_CHANNELS = 2
+
+# Bitrates in kbps, indexed by [MPEG-1][layer][index] and [MPEG-2/2.5][layer][index]
+_BITRATES = {
+    True: {
+        1: [0, 32, 64, 96, 128, 160, 192, 224, 256, 288, 320, 352, 384, 416, 448],
+        2: [0, 32, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 384],
+        3: [0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320],
+    },
+    False: {
+        1: [0, 32, 48, 56, 64, 80, 96, 112, 128, 144, 160, 176, 192, 224, 256],
+        2: [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],
+        3: [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],
+    },
+}
+_SAMPLE_RATES = {3: [44100, 48000, 32000], 2: [22050, 24000, 16000], 0: [11025, 12000, 8000]}  # by version bits
+
+
+def _parse_frame_header(data: bytes, offset: int):
+    """
+    Parse the MPEG audio frame header at offset.
+    Returns (frame_length, samples_per_frame, sample_rate), or None if there is no valid header.
+    """
+    if offset + 4 > len(data) or data[offset] != 0xFF or (data[offset + 1] & 0xE0) != 0xE0:
+        return None
+    version_bits = (data[offset + 1] >> 3) & 0x3
+    layer = 4 - ((data[offset + 1] >> 1) & 0x3)
+    bitrate_index = data[offset + 2] >> 4
+    sample_rate_index = (data[offset + 2] >> 2) & 0x3
+    padding = (data[offset + 2] >> 1) & 0x1
+    if version_bits == 1 or layer == 4 or bitrate_index in (0, 15) or sample_rate_index == 3:
+        return None
+
+    is_mpeg1 = version_bits == 3
+    bitrate = _BITRATES[is_mpeg1][layer][bitrate_index] * 1000
+    sample_rate = _SAMPLE_RATES[version_bits][sample_rate_index]
+    if layer == 1:
+        return (12 * bitrate // sample_rate + padding) * 4, 384, sample_rate
+    if layer == 3 and not is_mpeg1:
+        return 72 * bitrate // sample_rate + padding, 576, sample_rate
+    return 144 * bitrate // sample_rate + padding, 1152, sample_rate
+
+
+def _xing_tag_offset(data: bytes, offset: int) -> Optional[int]:
+    """
+    Where a Xing/Info tag would start in the Layer III frame at offset: right after the
+    header and the side information, whose size depends on the version and channel mode.
+    None for other layers, which have no such tag.
+    """
+    if 4 - ((data[offset + 1] >> 1) & 0x3) != 3:
+        return None
+    is_mpeg1 = ((data[offset + 1] >> 3) & 0x3) == 3
+    is_mono = (data[offset + 3] >> 6) == 3
+    if is_mpeg1:
+        side_info_size = 17 if is_mono else 32
+    else:
+        side_info_size = 9 if is_mono else 17
+    return offset + 4 + side_info_size
+
+
+def _skip_id3v2(data: bytes) -> int:
+    if data[:3] != b"ID3" or len(data) < 10:
+        return 0
+    size = (data[6] << 21) | (data[7] << 14) | (data[8] << 7) | data[9]
+    footer = 10 if data[5] & 0x10 else 0
+    return 10 + size + footer
+
+
+def mp3_duration(path: str) -> float:
+    """
+    Duration of an MP3 file in seconds, read from the frame headers without decoding.
+    Uses the frame count in a Xing/Info header when present, otherwise walks the frame headers.
+    The file is memory-mapped, so only the pages holding the headers are read.
+    """
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            raise ValueError(f"No MPEG audio frames found in {path}")
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            return _mp3_duration(data, path)
+
+
+def _mp3_duration(data, path: str) -> float:
+    offset = _skip_id3v2(data)
+    # Find the first frame
+    while offset + 4 <= len(data) and _parse_frame_header(data, offset) is None:
+        offset += 1
+    first = _parse_frame_header(data, offset)
+    if first is None:
+        raise ValueError(f"No MPEG audio frames found in {path}")
+
+    frame_length, samples_per_frame, sample_rate = first
+    # The tag can only be at one place in the first frame; anywhere else the bytes are audio
+    tag_offset = _xing_tag_offset(data, offset)
+    if tag_offset is not None and data[tag_offset:tag_offset + 4] in (b"Xing", b"Info"):
+        if tag_offset + 12 <= offset + frame_length and data[tag_offset + 7] & 0x1:
+            frame_count = int.from_bytes(data[tag_offset + 8:tag_offset + 12], "big")
+            return frame_count * samples_per_frame / sample_rate
+        # Info frame without a frame count: it holds no audio, skip it
+        offset += frame_length
+
+    total_samples = 0
+    while True:
+        header = _parse_frame_header(data, offset)
+        if header is None:
+            break
+        frame_length, samples_per_frame, sample_rate = header
+        total_samples += samples_per_frame
+        offset += frame_length
+    return total_samples / sample_rate
+
+
+def get_item_duration(item_index: int, workspace: Optional[Workspace] = None) -> float:
+    """Duration of an item's segment: the narration plus the padding around it."""
+    audio_file = get_workspace(workspace).audio_path(item_index)
+    return AUDIO_START_PADDING + mp3_duration(audio_file) + AUDIO_END_PADDING
+
+
+def silence(duration: float, sample_rate: int = AUDIO_SAMPLE_RATE, channels: int = AUDIO_CHANNELS) -> np.ndarray:
+    """Silent 16-bit PCM of the given duration."""
+    return np.zeros((int(round(duration * sample_rate)), channels), dtype=np.int16)
+
+
+def decode_audio(path: str, sample_rate: int = AUDIO_SAMPLE_RATE, channels: int = AUDIO_CHANNELS) -> np.ndarray:
+    """Decode an audio file to 16-bit PCM with a single ffmpeg call."""
+    command = [
+        get_ffmpeg_binary(), '-loglevel', 'error', '-i', path,
+        '-f', 's16le', '-acodec', 'pcm_s16le', '-ar', str(sample_rate), '-ac', str(channels), '-',
+    ]
+    pcm = subprocess.run(command, check=True, stdout=subprocess.PIPE).stdout
+    return np.frombuffer(pcm, dtype=np.int16).reshape(-1, channels)
+
+
+def narration_slots(audio_paths: List[str], durations: List[float], sample_rate: int = AUDIO_SAMPLE_RATE,
+                    channels: int = AUDIO_CHANNELS) -> Iterator[np.ndarray]:
+    """
+    The narration track one slot at a time: each item's narration, decoded once and
+    placed AUDIO_START_PADDING into a slot of silence as long as the item's duration.
+    Slot boundaries are rounded from the running total, so they never drift.
+    """
+    slot_starts = np.concatenate([[0.0], np.cumsum(durations)])
+    slot_offsets = [int(round(start * sample_rate)) for start in slot_starts]
+    padding = int(round(AUDIO_START_PADDING * sample_rate))
+
+    for k, path in enumerate(audio_paths):
+        slot = np.zeros((slot_offsets[k + 1] - slot_offsets[k], channels), dtype=np.int16)
+        narration = decode_audio(path, sample_rate, channels)
+        length = min(len(narration), max(0, len(slot) - padding))
+        slot[padding:padding + length] = narration[:length]
+        yield slot
+
+
+def write_narration_wav(path: str, audio_paths: List[str], durations: List[float],
+                        sample_rate: int = AUDIO_SAMPLE_RATE, channels: int = AUDIO_CHANNELS) -> str:
+    """
+    Write the track Soundtrack.build would make straight to a WAV file, slot by slot,
+    so only one item's narration is in memory however long the video is.
+    """
+    with wave.open(path, "wb") as wav:
+        wav.setnchannels(channels)
+        wav.setsampwidth(2)
+        wav.setframerate(sample_rate)
+        for slot in narration_slots(audio_paths, durations, sample_rate, channels):
+            wav.writeframes(slot.tobytes())
+    return path
+
+
+class Soundtrack:
+    """
+    The whole narration track as a single 16-bit PCM buffer. Each item's narration is
+    decoded once and placed AUDIO_START_PADDING into its slot; the rest of the slot is
+    silence, so no source file is opened just to produce padding.
+    The buffer grows with the length of the video; renders that only need the track as
+    a file use write_narration_wav instead.
+    """
+
+    def __init__(self, pcm: np.ndarray, sample_rate: int = AUDIO_SAMPLE_RATE):
+        self.pcm = pcm
+        self.sample_rate = sample_rate
+
+    @classmethod
+    def build(cls, audio_paths: List[str], durations: List[float],
+              sample_rate: int = AUDIO_SAMPLE_RATE, channels: int = AUDIO_CHANNELS) -> "Soundtrack":
+        """
+        Build the track from each item's narration and the duration of its slot.
+        """
+        slots = list(narration_slots(audio_paths, durations, sample_rate, channels))
+        if not slots:
+            return cls(silence(0, sample_rate, channels), sample_rate)
+        return cls(np.concatenate(slots), sample_rate)
+
+    @property
+    def duration(self) -> float:
+        return len(self.pcm) / self.sample_rate
+
+    def write_wav(self, path: str) -> str:
+        with wave.open(path, "wb") as wav:
+            wav.setnchannels(self.pcm.shape[1])
+            wav.setsampwidth(2)
+            wav.setframerate(self.sample_rate)
+            wav.writeframes(self.pcm.tobytes())
+        return path
+
+    def to_audio_clip(self):
+        """The track as a moviepy AudioArrayClip, for the moviepy backend."""
+        from moviepy.audio.AudioClip import AudioArrayClip
+
+        return AudioArrayClip(self.pcm.astype(np.float32) / 32768, fps=self.sample_rate)
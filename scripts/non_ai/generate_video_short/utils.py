@@ -1,14 +1,41 @@
-from moviepy.editor import ImageClip, AudioFileClip, concatenate_audioclips, ColorClip, CompositeVideoClip
+from typing import Optional, Union
+
 from PIL import Image
 import numpy as np
-import os
 
-from utils.output_dirs import AUDIO_OUTPUT_DIR, TITLED_IMAGE_OUTPUT_DIR
-from utils.output_file_names import get_audio_file_name, get_titled_image_file_name
+from utils.canvas import CANVAS_SIZES, DEFAULT_CANVAS
+from utils.frame_store import load_image
+from utils.workspace import get_workspace
+
+# moviepy is only imported by the functions that build moviepy clips: importing it takes
+# longer than most short stages, and the ffmpeg backend never needs it.
+
+CANVAS_SIZE = CANVAS_SIZES[DEFAULT_CANVAS]
+AUDIO_START_PADDING = 0.2  # seconds of silence before each item's narration
+AUDIO_END_PADDING = 0.5  # seconds of silence after each item's narration
+IMAGES_PER_ITEM = 3
+
+# Encoder settings shared by every render backend
+FPS = 24
+VIDEO_CODEC = 'libx264'
+AUDIO_CODEC = 'aac'
+AUDIO_SAMPLE_RATE = 44100
 
-def create_background_clip(duration):
+def get_ffmpeg_binary():
+    """The ffmpeg executable moviepy is configured to use."""
+    from moviepy.config import get_setting
+    return get_setting("FFMPEG_BINARY")
+
+def get_titled_image_paths(item_index, workspace=None):
+    """Paths of the titled images shown for an item in the workspace, in display order."""
+    workspace = get_workspace(workspace)
+    return [workspace.titled_image_path(item_index, j) for j in range(1, IMAGES_PER_ITEM + 1)]
+
+def create_background_clip(duration, size=CANVAS_SIZE):
     """Create a white background clip with the specified duration."""
-    bg_clip = ColorClip(size=(1080, 1920), color=(255, 255, 255))
+    from moviepy.video.VideoClip import ColorClip
+
+    bg_clip = ColorClip(size=size, color=(255, 255, 255))
     return bg_clip.set_duration(duration)
 
 def create_zoom_effect(total_duration):
@@ -18,55 +45,128 @@ def create_zoom_effect(total_duration):
         return zoom_factor
     return zoom_effect
 
-def resize_with_zoom(get_frame, t, zoom_effect):
-    """Apply zoom effect to a frame using PIL resampling."""
-    frame = get_frame(t)
-    zoom = zoom_effect(t)
-    h, w = frame.shape[:2]
-    new_h, new_w = int(h * zoom), int(w * zoom)
-    pil_image = Image.fromarray(frame)
-    resized = pil_image.resize((new_w, new_h), Image.Resampling.LANCZOS)
-    return np.array(resized)
-
-def create_image_clip(image_path, total_duration, start_time):
+# Resampling filter per zoom quality: bilinear is much faster and fine for drafts
+ZOOM_RESAMPLING = {
+    "draft": Image.Resampling.BILINEAR,
+    "final": Image.Resampling.LANCZOS,
+}
+ZOOM_QUALITY = "final"
+
+class EncodingProfile:
+    """
+    How a video is rendered and encoded. Every profile renders the same layout: scale
+    shrinks the frames written to the encoder, not the canvas the layout is computed on.
+
+    Args:
+        name (str): Name of the profile
+        preset (str): x264 preset, faster presets make larger files
+        crf (int): x264 constant rate factor, lower is better quality
+        fps (float): Frames per second
+        scale (float): Output size as a fraction of the canvas size
+        zoom_quality (str): Resampling used for the zoom, see ZOOM_RESAMPLING
+        threads (int, optional): x264 threads, None lets x264 decide
+    """
+
+    def __init__(self, name: str, preset: str, crf: int, fps: float = FPS, scale: float = 1.0,
+                 zoom_quality: str = ZOOM_QUALITY, threads: Optional[int] = None):
+        self.name = name
+        self.preset = preset
+        self.crf = crf
+        self.fps = fps
+        self.scale = scale
+        self.zoom_quality = zoom_quality
+        self.threads = threads
+
+    @property
+    def output_size(self):
+        """Size of the encoded frames, rounded to even numbers as yuv420p requires."""
+        return self.scaled_size(CANVAS_SIZE)
+
+    def scaled_size(self, canvas_size):
+        """Size of the encoded frames of a video laid out on a canvas of canvas_size."""
+        return tuple(max(2, round(side * self.scale / 2) * 2) for side in canvas_size)
+
+    def __repr__(self) -> str:
+        return f"EncodingProfile({self.name!r})"
+
+# draft: a quick low-res preview; review: full quality frames with a cheap encode;
+# final: the x264 defaults (medium, CRF 23) every video was encoded with before profiles
+ENCODING_PROFILES = {
+    "draft": EncodingProfile("draft", preset="ultrafast", crf=30, fps=12, scale=0.5, zoom_quality="draft"),
+    "review": EncodingProfile("review", preset="veryfast", crf=23),
+    "final": EncodingProfile("final", preset="medium", crf=23),
+}
+ENCODING_PROFILE = "final"
+
+def get_encoding_profile(profile: Union[str, EncodingProfile, None] = None) -> EncodingProfile:
+    """The profile with the given name, or ENCODING_PROFILE when profile is None."""
+    if isinstance(profile, EncodingProfile):
+        return profile
+    name = profile or ENCODING_PROFILE
+    if name not in ENCODING_PROFILES:
+        raise ValueError(f"Unknown encoding profile '{name}', expected one of: {', '.join(ENCODING_PROFILES)}")
+    return ENCODING_PROFILES[name]
+
+class ZoomRenderer:
+    """
+    Render zoomed frames of a still image at exactly the canvas size.
+    The image is decoded once; each frame crops the visible region of the zoomed
+    image from that source and scales it straight to the canvas size, instead of
+    resizing the whole image to the zoomed size and cropping afterwards.
+    With output_size the frames are scaled to that size instead, from the same
+    visible region, so a smaller render shows exactly the same picture.
+    """
+
+    def __init__(self, image: Image.Image, canvas_size=CANVAS_SIZE, quality: str = ZOOM_QUALITY, output_size=None):
+        self.source = image.convert("RGB")
+        self.source.load()
+        self.canvas_size = canvas_size
+        self.output_size = output_size or canvas_size
+        self.resample = ZOOM_RESAMPLING[quality]
+
+    def crop_box(self, zoom: float):
+        """Region of the source image that is visible on the canvas at the given zoom."""
+        source_w, source_h = self.source.size
+        canvas_w, canvas_h = self.canvas_size
+        visible_w, visible_h = canvas_w / zoom, canvas_h / zoom
+        left = (source_w - visible_w) / 2
+        top = (source_h - visible_h) / 2
+        return (left, top, left + visible_w, top + visible_h)
+
+    def render(self, zoom: float) -> np.ndarray:
+        """Return the frame for the given zoom factor as an RGB array of the output size."""
+        frame = self.source.resize(self.output_size, self.resample, box=self.crop_box(zoom))
+        return np.asarray(frame)
+
+def create_image_clip(image_path, total_duration, start_time, quality=ZOOM_QUALITY, output_size=CANVAS_SIZE):
     """Create an image clip with zoom effect for the given image."""
-    pil_image = Image.open(image_path)
-    image_array = np.array(pil_image)
-    image_clip = ImageClip(image_array).set_duration(total_duration / 3)
-    
+    from moviepy.video.VideoClip import VideoClip
+
+    renderer = ZoomRenderer(load_image(image_path), quality=quality, output_size=output_size)
     zoom_effect = create_zoom_effect(total_duration)
-    image_clip = image_clip.fl(lambda gf, t: resize_with_zoom(gf, t, zoom_effect))
+
+    image_clip = VideoClip(lambda t: renderer.render(zoom_effect(t)), duration=total_duration / 3)
     image_clip = image_clip.set_position("center")
     image_clip = image_clip.set_start(start_time)
     
     return image_clip
 
-def create_audio_with_delays(audio_file):
-    """Create audio clip with initial and final delays."""
-    audio_clip = AudioFileClip(audio_file)
-    initial_delay = AudioFileClip(audio_file).set_duration(0.2).volumex(0)
-    final_delay = AudioFileClip(audio_file).set_duration(0.5).volumex(0)
-    return concatenate_audioclips([initial_delay, audio_clip, final_delay])
+def create_item_video_clip(item_index, total_duration, profile=None, workspace=None):
+    """Create a video clip for a single item with all its images. The narration is added for the whole video at once."""
+    from moviepy.video.compositing.CompositeVideoClip import CompositeVideoClip
+
+    profile = get_encoding_profile(profile)
 
-def create_item_video_clip(item_index, total_duration):
-    """Create a video clip for a single item with all its images and audio."""
     # Create background
-    bg_clip = create_background_clip(total_duration)
+    bg_clip = create_background_clip(total_duration, profile.output_size)
     
     # Create image clips
     image_clips = []
-    for j in range(1, 4):
-        image_file = os.path.join(TITLED_IMAGE_OUTPUT_DIR, get_titled_image_file_name(item_index, j))
+    for j, image_file in enumerate(get_titled_image_paths(item_index, workspace), start=1):
         start_time = (j - 1) * (total_duration / 3)
-        image_clip = create_image_clip(image_file, total_duration, start_time)
+        image_clip = create_image_clip(image_file, total_duration, start_time, profile.zoom_quality,
+                                       profile.output_size)
         image_clips.append(image_clip)
     
     # Create composite video
-    video_clip = CompositeVideoClip([bg_clip, *image_clips])
-    
-    # Add audio
-    audio_file = os.path.join(AUDIO_OUTPUT_DIR, get_audio_file_name(item_index))
-    combined_audio = create_audio_with_delays(audio_file)
-    video_clip = video_clip.set_audio(combined_audio)
-    
-    return video_clip
\ No newline at end of file
+    return CompositeVideoClip([bg_clip, *image_clips])
\ No newline at end of file
@@ -1,38 +1,57 @@
+import json
 import os
-import shutil
 from datetime import datetime
 from typing import Optional
 
-def save_to_generated_data(json_path: str, prompt: Optional[str] = None):
+from utils.archive import archive
+from utils.helper_functions import clean_json_input, get_topic_folder_name
+from utils.manifest import RunManifest
+from utils.output_dirs import GENERATED_DATA_DIR, OUTPUTS_DIR
+from utils.workspace import Workspace, get_workspace
+
+def save_to_generated_data(json_path: str, prompt: Optional[str] = None, workspace: Optional[Workspace] = None):
     """
     Save AI-generated content to a separate generated_data folder
     Uses prompt name if provided, otherwise uses timestamp
+    Only the audio and images of the items in json_path are saved from the workspace,
+    so files left over from earlier runs are never picked up.
+    Files are stored once in the content-addressed archive (utils/archive.py) and the
+    folder links to them, so saving the same audio or image again takes no space.
     """
+    workspace = get_workspace(workspace)
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+
     # Create folder name based on prompt or timestamp
     if prompt:
         # Clean prompt to be folder-name friendly
-        folder_name = "".join(c if c.isalnum() else "_" for c in prompt.lower())
-        folder_name = "_".join(folder_name.split())
+        folder_name = get_topic_folder_name(prompt)
     else:
-        folder_name = datetime.now().strftime("%Y%m%d_%H%M%S")
-    
-    generated_folder = f"generated_data/{folder_name}"
-    
-    # Create folder structure
-    os.makedirs(f"{generated_folder}/audio", exist_ok=True)
-    os.makedirs(f"{generated_folder}/images", exist_ok=True)
-    
-    # Copy JSON file
-    shutil.copy2(json_path, f"{generated_folder}/list_items.json")
-    
-    # Copy audio files
-    for file in os.listdir("outputs/audio_output"):
-        if file.endswith(".mp3"):
-            shutil.copy2(f"outputs/audio_output/{file}", f"{generated_folder}/audio/{file}")
+        folder_name = timestamp
     
-    # Copy image files
-    for file in os.listdir("outputs/image_output"):
-        if file.endswith(".png"):
-            shutil.copy2(f"outputs/image_output/{file}", f"{generated_folder}/images/{file}")
-    
-    print(f"\nSaved AI-generated content to: {generated_folder}")
\ No newline at end of file
+    generated_folder = f"{GENERATED_DATA_DIR}/{folder_name}"
+    if os.path.normpath(workspace.root) == os.path.normpath(OUTPUTS_DIR):
+        run_name = f"{folder_name}_{timestamp}"
+    else:
+        run_name = os.path.basename(os.path.normpath(workspace.root))
+
+    # Checksums the run already recorded spare reading every file again
+    manifest = RunManifest.for_workspace(workspace)
+    files = {"list_items.json": (json_path, manifest.recorded_sha256("list", json_path))}
+    with open(json_path, 'r') as f:
+        items = json.loads(clean_json_input(f.read()))
+
+    for i, item in enumerate(items, start=1):
+        audio_path = workspace.audio_path(i)
+        if os.path.exists(audio_path):
+            files[f"audio/{os.path.basename(audio_path)}"] = (audio_path, manifest.recorded_sha256(f"audio_{i}", audio_path))
+
+        for j in range(1, len(item['image_prompts']) + 1):
+            image_path = workspace.image_path(i, j)
+            if os.path.exists(image_path):
+                files[f"images/{os.path.basename(image_path)}"] = (image_path, manifest.recorded_sha256(f"image_{i}_{j}", image_path))
+
+    saved = archive.archive_run(files, generated_folder, run_name, info={"topic": prompt, "workspace": workspace.root})
+    new_files = [entry for entry in saved["files"].values() if entry["stored"]]
+    print(f"\nSaved AI-generated content to: {generated_folder} "
+          f"({len(new_files)} of {len(files)} files new to the archive, "
+          f"{sum(entry['size'] for entry in new_files) / 1e6:.1f} MB stored)")
@@ -0,0 +1,346 @@
+"""
+Long-running generation service with a local HTTP/JSON job API.
+
+Every video from main.py or batch.py starts a fresh process. That process reloads dotenv,
+creates an OpenAI client and its connection pool, loads the title font and starts the
+segment render pool. The service does all of that once, at startup. Its jobs then share
+them, along with the rate limit governor, the asset caches and the worker pools.
+
+    POST /jobs                 {"topic": "Space cats", "num_items": 5, "profile": "draft",
+                                "canvases": ["vertical", "square"]}; only topic is required
+    GET  /jobs                 every job
+    GET  /jobs/<id>            status, timings and failed tasks of a job
+    GET  /jobs/<id>/video      the finished video (?canvas=square for another canvas)
+    GET  /status               queue depth, running jobs, job counts and cache stats
+    GET  /metrics              job counts and timings in the Prometheus text format
+
+Usage: python service.py [--host 127.0.0.1] [--port 8080] [--jobs N]
+"""
+import argparse
+import json
+import os
+import shutil
+import signal
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+from urllib.parse import parse_qs, urlparse
+
+from main import CPU_WORKERS, IN_MEMORY_HANDOFF, IO_WORKERS, RENDER_WORKERS, run_streaming_pipeline
+from scripts.ai.generate_audios.utils import audio_cache
+from scripts.ai.generate_images.utils import image_cache
+from scripts.non_ai.create_titled_images_short.create_titled_images_short import (
+    MAX_WORKERS as TITLED_IMAGE_WORKERS,
+    get_titled_image_pool,
+)
+from scripts.non_ai.create_titled_images_short.utils import get_title_font
+from scripts.non_ai.generate_video_short.generate_video_short import (
+    SEGMENT_WORKERS,
+    get_segment_pool,
+    renders_segments_separately,
+    segment_cache,
+)
+from scripts.non_ai.generate_video_short.utils import ENCODING_PROFILES, get_ffmpeg_binary
+from utils.canvas import CANVAS_SIZES, DEFAULT_CANVAS
+from utils.metrics import MetricsRegistry
+from utils.open_ai_client import get_open_ai_client
+from utils.scheduler import DONE, FAILED, DagScheduler
+from utils.workspace import Workspace
+
+DEFAULT_PORT = 8080
+DEFAULT_NUM_ITEMS = 5
+MAX_NUM_ITEMS = 50
+# Jobs running at the same time; the others wait in the queue. They compete only for pool slots
+MAX_CONCURRENT_JOBS = 4
+MAX_FINISHED_JOBS = 1000  # finished jobs kept for polling, oldest forgotten first (their files stay)
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED_JOB = "failed"
+
+
+class Job:
+    """
+    One video requested through the API, run in its own workspace.
+    Times are wall-clock seconds (time.time()).
+    """
+
+    def __init__(self, topic: str, num_items: int, profile: Optional[str] = None,
+                 canvases: Optional[List[str]] = None):
+        self.id = uuid.uuid4().hex[:12]
+        self.topic = topic
+        self.num_items = num_items
+        self.profile = profile
+        self.canvases = canvases or [DEFAULT_CANVAS]
+        self.status = QUEUED
+        self.workspace: Optional[Workspace] = None
+        self.submitted_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.stage_seconds: Dict[str, float] = {}
+        self.tasks: Dict[str, int] = {}
+        self.failed_tasks: Dict[str, str] = {}
+        self.error: Optional[str] = None
+
+    @property
+    def finished(self) -> bool:
+        return self.status in (SUCCEEDED, FAILED_JOB)
+
+    def video_path(self, canvas: str) -> str:
+        return self.workspace.video_path(canvas)
+
+    def to_dict(self) -> dict:
+        now = time.time()
+        queued_until = self.started_at or now
+        return {
+            "id": self.id,
+            "topic": self.topic,
+            "num_items": self.num_items,
+            "profile": self.profile,
+            "canvases": self.canvases,
+            "status": self.status,
+            "workspace": self.workspace.root if self.workspace else None,
+            "submitted_at": self.submitted_at,
+            "timings": {
+                "queued_seconds": round(queued_until - self.submitted_at, 3),
+                "run_seconds": round((self.finished_at or now) - self.started_at, 3) if self.started_at else None,
+                "stage_busy_seconds": {stage: round(seconds, 3) for stage, seconds in self.stage_seconds.items()},
+            },
+            "tasks": self.tasks,
+            "failed_tasks": self.failed_tasks,
+            "error": self.error,
+            "videos": {canvas: f"/jobs/{self.id}/video?canvas={canvas}" for canvas in self.canvases}
+            if self.status == SUCCEEDED else {},
+        }
+
+
+class GenerationService:
+    """
+    Runs submitted jobs, up to max_concurrent_jobs at a time, on one set of worker pools.
+    Everything the jobs share stays loaded between them (see warm_up).
+    """
+
+    def __init__(self, max_concurrent_jobs: int = MAX_CONCURRENT_JOBS):
+        self.max_concurrent_jobs = max_concurrent_jobs
+        self.jobs: Dict[str, Job] = {}
+        self.metrics = MetricsRegistry()
+        self.started_at = time.time()
+        self._lock = threading.Lock()
+        self._job_executor = ThreadPoolExecutor(max_workers=max_concurrent_jobs, thread_name_prefix="job")
+        self._io_executor = ThreadPoolExecutor(max_workers=IO_WORKERS, thread_name_prefix="io")
+        self._cpu_executor = ThreadPoolExecutor(max_workers=CPU_WORKERS, thread_name_prefix="cpu")
+        self._render_executor = ThreadPoolExecutor(max_workers=RENDER_WORKERS, thread_name_prefix="render")
+
+    def warm_up(self):
+        """
+        Load what every job needs before the first one arrives: the OpenAI client (with
+        dotenv), the title font, ffmpeg's location, and the segment render and titled image processes.
+        Call it before serving, so the render processes are started before any other thread.
+        """
+        started_at = time.perf_counter()
+        get_open_ai_client()
+        get_title_font()
+        get_ffmpeg_binary()
+        if renders_segments_separately():
+            # Start the worker processes now rather than on the first job's first segment; the pool
+            # only starts a process when every running one is busy, so keep them all busy briefly
+            list(get_segment_pool().map(time.sleep, [0.1] * SEGMENT_WORKERS))
+        if not IN_MEMORY_HANDOFF:
+            list(get_titled_image_pool().map(time.sleep, [0.1] * TITLED_IMAGE_WORKERS))
+        print(f"Warmed up in {time.perf_counter() - started_at:.2f}s")
+
+    def submit(self, topic: str, num_items: int = DEFAULT_NUM_ITEMS, profile: Optional[str] = None,
+               canvases: Optional[List[str]] = None) -> Job:
+        job = Job(topic, num_items, profile, canvases)
+        with self._lock:
+            self.jobs[job.id] = job
+            self._forget_finished_jobs()
+        self.metrics.increment("service_jobs_submitted_total")
+        self._job_executor.submit(self._run, job)
+        print(f"Queued job {job.id}: {topic} ({num_items} items)")
+        return job
+
+    def get_job(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            return self.jobs.get(job_id)
+
+    def list_jobs(self) -> List[Job]:
+        with self._lock:
+            return list(self.jobs.values())
+
+    def _forget_finished_jobs(self):
+        finished = [job for job in self.jobs.values() if job.finished]
+        for job in finished[:max(0, len(finished) - MAX_FINISHED_JOBS)]:
+            del self.jobs[job.id]
+
+    def _run(self, job: Job):
+        job.started_at = time.time()
+        job.status = RUNNING
+        self.metrics.observe("service_job_queue_seconds", job.started_at - job.submitted_at)
+        job.workspace = Workspace.for_run(job.topic)
+        scheduler = DagScheduler(io_executor=self._io_executor, cpu_executor=self._cpu_executor,
+                                 render_executor=self._render_executor)
+        tasks = {}
+        try:
+            tasks = run_streaming_pipeline(job.topic, job.num_items, scheduler=scheduler, workspace=job.workspace,
+                                           profile=job.profile, canvases=job.canvases)
+        except Exception as e:
+            job.error = str(e)
+
+        for task in tasks.values():
+            if task.duration is not None:
+                stage = task.name.split("_")[0]
+                job.stage_seconds[stage] = job.stage_seconds.get(stage, 0.0) + task.duration
+        job.tasks = scheduler.summary()
+        job.failed_tasks = {task.name: str(task.error) for task in tasks.values() if task.state == FAILED}
+        video_task = tasks.get("video")
+        job.status = SUCCEEDED if video_task is not None and video_task.state == DONE else FAILED_JOB
+        if job.status == FAILED_JOB and job.error is None and job.failed_tasks:
+            job.error = "; ".join(f"{name}: {error}" for name, error in job.failed_tasks.items())
+        job.finished_at = time.time()
+        self.metrics.increment("service_jobs_total", status=job.status)
+        self.metrics.observe("service_job_run_seconds", job.finished_at - job.started_at, status=job.status)
+        print(f"Job {job.id} {job.status} in {job.finished_at - job.started_at:.1f}s")
+
+    def status(self) -> dict:
+        counts: Dict[str, int] = {}
+        for job in self.list_jobs():
+            counts[job.status] = counts.get(job.status, 0) + 1
+        return {
+            "queue_depth": counts.get(QUEUED, 0),
+            "running": counts.get(RUNNING, 0),
+            "max_concurrent_jobs": self.max_concurrent_jobs,
+            "jobs": counts,
+            "uptime_seconds": round(time.time() - self.started_at, 1),
+            "caches": {"audio": audio_cache.stats(), "images": image_cache.stats(), "segments": segment_cache.stats()},
+        }
+
+    def shutdown(self):
+        self._job_executor.shutdown(wait=True)
+        for executor in (self._io_executor, self._cpu_executor, self._render_executor):
+            executor.shutdown(wait=True)
+
+
+def parse_job_request(body: bytes) -> dict:
+    """The submit arguments in a POST /jobs body. Raises ValueError if they are invalid."""
+    try:
+        request = json.loads(body or b"{}")
+    except json.JSONDecodeError as e:
+        raise ValueError(f"Invalid JSON: {e}")
+    if not isinstance(request, dict):
+        raise ValueError("The body must be a JSON object")
+    topic = request.get("topic")
+    if not isinstance(topic, str) or not topic.strip():
+        raise ValueError("topic must be a non-empty string")
+    num_items = request.get("num_items", DEFAULT_NUM_ITEMS)
+    if isinstance(num_items, bool) or not isinstance(num_items, int) or not 1 <= num_items <= MAX_NUM_ITEMS:
+        raise ValueError(f"num_items must be an integer from 1 to {MAX_NUM_ITEMS}")
+    profile = request.get("profile")
+    if profile is not None and (not isinstance(profile, str) or profile not in ENCODING_PROFILES):
+        raise ValueError(f"profile must be one of: {', '.join(ENCODING_PROFILES)}")
+    canvases = request.get("canvases")
+    if canvases is not None and (not isinstance(canvases, list) or not canvases
+                                 or any(not isinstance(canvas, str) or canvas not in CANVAS_SIZES
+                                        for canvas in canvases)):
+        raise ValueError(f"canvases must be a list of: {', '.join(CANVAS_SIZES)}")
+    return {"topic": topic.strip(), "num_items": num_items, "profile": profile, "canvases": canvases}
+
+
+def make_handler(service: GenerationService):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):
+            pass
+
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            if urlparse(self.path).path != "/jobs":
+                return self._send_error(404, f"Unknown path {self.path}")
+            try:
+                job = service.submit(**parse_job_request(body))
+            except ValueError as e:
+                return self._send_error(400, str(e))
+            self._send_json(202, job.to_dict(), {"Location": f"/jobs/{job.id}"})
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            parts = [part for part in url.path.split("/") if part]
+            if parts == ["status"]:
+                return self._send_json(200, service.status())
+            if parts == ["metrics"]:
+                return self._send(200, service.metrics.to_prometheus().encode("utf-8"), "text/plain; version=0.0.4")
+            if parts == ["jobs"]:
+                return self._send_json(200, {"jobs": [job.to_dict() for job in service.list_jobs()]})
+            if len(parts) in (2, 3) and parts[0] == "jobs":
+                job = service.get_job(parts[1])
+                if job is None:
+                    return self._send_error(404, f"No job {parts[1]}")
+                if len(parts) == 2:
+                    return self._send_json(200, job.to_dict())
+                if parts[2] == "video":
+                    canvas = parse_qs(url.query).get("canvas", [job.canvases[0]])[0]
+                    return self._send_video(job, canvas)
+            self._send_error(404, f"Unknown path {self.path}")
+
+        def _send_video(self, job: Job, canvas: str):
+            if job.status != SUCCEEDED:
+                return self._send_error(409, f"Job {job.id} is {job.status}")
+            if canvas not in job.canvases:
+                return self._send_error(404, f"Job {job.id} has no {canvas} video")
+            path = job.video_path(canvas)
+            self.send_response(200)
+            self.send_header("Content-Type", "video/mp4")
+            self.send_header("Content-Length", str(os.path.getsize(path)))
+            self.end_headers()
+            with open(path, "rb") as f:
+                shutil.copyfileobj(f, self.wfile)
+
+        def _send(self, status: int, payload: bytes, content_type: str, headers: Optional[dict] = None):
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(payload)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def _send_json(self, status: int, data, headers: Optional[dict] = None):
+            self._send(status, json.dumps(data).encode("utf-8"), "application/json", headers)
+
+        def _send_error(self, status: int, message: str):
+            self._send_json(status, {"error": message})
+
+    return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve a local HTTP/JSON API that generates videos.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--jobs", type=int, default=MAX_CONCURRENT_JOBS, help="jobs run at the same time")
+    args = parser.parse_args()
+
+    service = GenerationService(args.jobs)
+    service.warm_up()
+    httpd = ThreadingHTTPServer((args.host, args.port), make_handler(service))
+    httpd.daemon_threads = True
+    print(f"Generation service listening on http://{args.host}:{args.port}")
+    # Stop on SIGTERM (e.g. from a process manager) as on Ctrl+C: stop accepting jobs, finish the rest
+    signal.signal(signal.SIGTERM, lambda *_: threading.Thread(target=httpd.shutdown).start())
+    try:
+        httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        print("Waiting for the queued and running jobs to finish...")
+        httpd.server_close()
+        service.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+import json
+import os
+import shutil
+import sys
+import time
+import uuid
+from typing import Dict, Optional, Tuple
+
+from utils.asset_cache import AssetCache, link_or_copy
+from utils.metrics import get_metrics
+from utils.output_dirs import ARCHIVE_BLOB_DIR, ARCHIVE_MANIFEST_DIR
+
+ARCHIVE_MANIFEST_FILE_NAME = "manifest.json"
+FICLONE = 0x40049409  # Linux ioctl that makes a file share another's data blocks (btrfs, XFS, ...)
+
+
+def clone_file(source: str, destination: str) -> str:
+    """
+    Put a copy of source at destination that shares nothing writable with it: a reflink
+    (Linux, on filesystems that support them) where possible, else a plain copy. Never a
+    hardlink or symlink, since source may be rewritten or deleted later. Returns which
+    one was made.
+    """
+    if sys.platform.startswith("linux"):
+        import fcntl
+
+        try:
+            with open(source, "rb") as src, open(destination, "wb") as dst:
+                fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+            return "reflink"
+        except OSError:
+            os.remove(destination)
+    shutil.copyfile(source, destination)
+    return "copy"
+
+
+class ContentArchive:
+    """
+    Content-addressed store for generated assets. Every file is stored once, as
+    <root>/<sha256[:2]>/<sha256><extension>, however many runs archive it, and a run is
+    archived as a folder of links to those blobs plus a manifest listing each file's
+    checksum and size (see archive_run). Blobs are never evicted or modified: they are
+    reflinked or copied in (see clone_file), so they share no inode with the workspace or
+    the asset caches, and only the archive's own folders link to them. With the checksums
+    a run already has, archiving a file that is already stored is a stat and a link;
+    identical files take no space after the first.
+    Safe to use from several threads and processes at once: blobs are put in place atomically.
+    """
+
+    def __init__(self, root: str = ARCHIVE_BLOB_DIR, manifest_dir: str = ARCHIVE_MANIFEST_DIR):
+        self.root = root
+        self.manifest_dir = manifest_dir
+
+    def blob_path(self, sha256: str, extension: str = "") -> str:
+        return os.path.join(self.root, sha256[:2], f"{sha256}{extension}")
+
+    def add(self, source: str, sha256: Optional[str] = None) -> Tuple[str, bool]:
+        """
+        Store the file at source unless a blob with the same contents exists. Pass its
+        sha256 if known, so the file is not read. Returns the blob's path and whether
+        it was stored (False when the contents were already in the archive).
+        """
+        sha256 = sha256 or AssetCache.hash_file(source)
+        path = self.blob_path(sha256, os.path.splitext(source)[1])
+        if os.path.exists(path):
+            return path, False
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        clone_file(source, temp_path)
+        os.replace(temp_path, path)
+        return path, True
+
+    def archive_run(self, files: Dict[str, Tuple[str, Optional[str]]], folder: str, run_name: str,
+                    info: Optional[dict] = None) -> dict:
+        """
+        Archive a run's files into folder, replacing what was there.
+
+        Args:
+            files (dict): Path in the folder -> (source path, its sha256 or None)
+            folder (str): Folder to archive the run to, e.g. generated_data/<topic>
+            run_name (str): Name of the run's manifest in the manifest directory
+            info (dict, optional): Details about the run to store in the manifest
+
+        Returns:
+            dict: The manifest, also written to folder/manifest.json and manifest_dir/<run_name>.json
+        """
+        metrics = get_metrics()
+        entries = {}
+        for relative_path, (source, sha256) in files.items():
+            sha256 = sha256 or AssetCache.hash_file(source)
+            blob, stored = self.add(source, sha256)
+            size = os.path.getsize(blob)
+            destination = os.path.join(folder, relative_path)
+            os.makedirs(os.path.dirname(destination), exist_ok=True)
+            link_or_copy(blob, destination)
+            entries[relative_path] = {
+                "sha256": sha256,
+                "size": size,
+                "blob": os.path.relpath(blob, self.root),
+                "stored": stored,
+            }
+            metrics.increment("archive_bytes_total", size, outcome="stored" if stored else "deduplicated")
+
+        # Whatever else is in the folder is left over from an earlier run
+        for dirpath, _, filenames in os.walk(folder):
+            for filename in filenames:
+                relative_path = os.path.relpath(os.path.join(dirpath, filename), folder).replace(os.sep, "/")
+                if relative_path not in entries and relative_path != ARCHIVE_MANIFEST_FILE_NAME:
+                    os.remove(os.path.join(dirpath, filename))
+
+        manifest = {"info": {**(info or {}), "run": run_name, "archived_at": time.time()}, "files": entries}
+        os.makedirs(self.manifest_dir, exist_ok=True)
+        for path in (os.path.join(folder, ARCHIVE_MANIFEST_FILE_NAME),
+                     os.path.join(self.manifest_dir, f"{run_name}.json")):
+            temp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+            with open(temp_path, "w") as f:
+                json.dump(manifest, f, indent=2)
+            os.replace(temp_path, path)
+        return manifest
+
+
+archive = ContentArchive()
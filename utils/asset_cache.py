@@ -0,0 +1,227 @@
+import errno
+import hashlib
+import json
+import os
+import shutil
+import threading
+import uuid
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+BYPASS_ENV_VAR = "BYPASS_ASSET_CACHE"
+# os.link errors meaning the filesystem cannot link these two paths, as opposed to e.g. a missing source
+LINK_UNSUPPORTED_ERRNOS = {errno.EXDEV, errno.EPERM, errno.EMLINK, errno.EOPNOTSUPP}
+
+
+def link_or_copy(source: str, destination: str):
+    """
+    Make destination point at source: a hardlink where the filesystem allows it,
+    otherwise a symlink, otherwise a plain copy. An existing destination is replaced
+    (never written through, so a linked cache entry cannot be modified by accident).
+    Only a filesystem that cannot hardlink the two paths leads to the fallbacks; any other
+    error is raised, e.g. FileNotFoundError when source is gone, so no dangling symlink
+    is ever made.
+    """
+    if os.path.lexists(destination):
+        os.remove(destination)
+    try:
+        os.link(source, destination)
+        return
+    except OSError as e:
+        if e.errno not in LINK_UNSUPPORTED_ERRNOS:
+            raise
+    try:
+        os.symlink(os.path.abspath(source), destination)
+        return
+    except OSError:
+        pass
+    shutil.copyfile(source, destination)
+
+
+class AssetCache:
+    """
+    On-disk content-addressed cache for generated assets.
+    Entries are keyed by a hash of everything that determines the asset, stored as
+    <root>/<key[:2]>/<key><extension>, and evicted least recently used first once
+    the cache grows past max_bytes. Safe to use from several threads at once.
+    The size and recency of the entries are kept in memory, filled by one walk of root
+    on first use, so neither eviction nor stats() touches the disk. Entries added by
+    other processes are picked up when they are looked up.
+    Output files are linked to entries rather than copied; hardlinked outputs keep
+    their data when an entry is evicted, symlinked ones (used when hardlinks are not
+    possible) do not.
+    """
+
+    def __init__(self, root: str, max_bytes: int, extension: str = "", bypass: Optional[bool] = None):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.extension = extension
+        if bypass is None:
+            bypass = os.getenv(BYPASS_ENV_VAR, "") not in ("", "0")
+        self.bypass = bypass
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._index: Optional["OrderedDict[str, int]"] = None  # path -> size, least recently used first
+        self._bytes = 0
+
+    @staticmethod
+    def hash_file(path: str) -> str:
+        """
+        sha256 of a file's contents, for keys that depend on input files.
+        """
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    @staticmethod
+    def make_key(*parts: Any) -> str:
+        """
+        Build a cache key from the values that determine an asset.
+        """
+        payload = json.dumps(parts, sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def path_for(self, key: str) -> str:
+        return os.path.join(self.root, key[:2], f"{key}{self.extension}")
+
+    def get(self, key: str) -> Optional[str]:
+        """
+        Return the path of a cached entry, or None on a miss or when the cache is bypassed.
+        """
+        path = self.path_for(key)
+        with self._lock:
+            if not self.bypass and os.path.exists(path):
+                # Touch the entry so eviction sees it as recently used, here and in later processes
+                os.utime(path)
+                self._record(path)
+                self.hits += 1
+                return path
+            self.misses += 1
+            return None
+
+    def put(self, key: str, data: bytes) -> str:
+        """
+        Store data under key and evict old entries if the cache is over budget.
+        Returns the path of the stored entry.
+        """
+        path = self.path_for(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        with open(temp_path, "wb") as f:
+            f.write(data)
+        os.replace(temp_path, path)
+        with self._lock:
+            self._record(path)
+            self._evict(keep=path)
+        return path
+
+    def put_file(self, key: str, source: str) -> str:
+        """
+        Store an existing file under key (linked rather than copied where possible)
+        and evict old entries if the cache is over budget.
+        """
+        path = self.path_for(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        link_or_copy(source, temp_path)
+        os.replace(temp_path, path)
+        with self._lock:
+            self._record(path)
+            self._evict(keep=path)
+        return path
+
+    def link_to(self, key: str, destination: str) -> bool:
+        """
+        Point destination at a cached entry (see link_or_copy). Returns False on a miss.
+        """
+        path = self.get(key)
+        if path is None:
+            return False
+        try:
+            link_or_copy(path, destination)
+        except FileNotFoundError:
+            if os.path.exists(path):
+                raise
+            # Evicted by another thread or process since the lookup
+            with self._lock:
+                self._forget(path)
+                self.hits -= 1
+                self.misses += 1
+            return False
+        return True
+
+    def store_to(self, key: str, data: bytes, destination: str) -> str:
+        """
+        Store data under key and point destination at the stored entry.
+        """
+        try:
+            link_or_copy(self.put(key, data), destination)
+        except FileNotFoundError:
+            # Evicted by another thread before it could be linked
+            temp_path = f"{destination}.{uuid.uuid4().hex}.tmp"
+            with open(temp_path, "wb") as f:
+                f.write(data)
+            os.replace(temp_path, destination)
+        return destination
+
+    def _load_index(self) -> "OrderedDict[str, int]":
+        if self._index is None:
+            entries = []
+            for dirpath, _, filenames in os.walk(self.root):
+                for filename in filenames:
+                    if filename.endswith(".tmp"):
+                        continue
+                    path = os.path.join(dirpath, filename)
+                    try:
+                        stat = os.stat(path)
+                    except FileNotFoundError:
+                        continue
+                    entries.append((stat.st_mtime, path, stat.st_size))
+            self._index = OrderedDict((path, size) for _, path, size in sorted(entries))
+            self._bytes = sum(self._index.values())
+        return self._index
+
+    def _record(self, path: str):
+        """Add or update an entry in the index as the most recently used one."""
+        index = self._load_index()
+        self._forget(path)
+        try:
+            size = os.path.getsize(path)
+        except FileNotFoundError:
+            return
+        index[path] = size
+        self._bytes += size
+
+    def _forget(self, path: str):
+        size = self._load_index().pop(path, None)
+        if size is not None:
+            self._bytes -= size
+
+    def _evict(self, keep: Optional[str] = None):
+        index = self._load_index()
+        for path in list(index):
+            if self._bytes <= self.max_bytes:
+                break
+            if path == keep:
+                continue
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            self._forget(path)
+            self.evictions += 1
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            index = self._load_index()
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": len(index),
+                "bytes": self._bytes,
+            }
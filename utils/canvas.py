@@ -0,0 +1,15 @@
+# Canvases (width, height) a video can be laid out on. Every canvas gets the same layout:
+# it is scaled to the canvas height, and wider canvases show more of the blurred background.
+CANVAS_SIZES = {
+    "vertical": (1080, 1920),  # 9:16, YouTube Shorts
+    "square": (1080, 1080),  # 1:1
+    "landscape": (1920, 1080),  # 16:9
+}
+DEFAULT_CANVAS = "vertical"
+
+
+def get_canvas_size(canvas: str = DEFAULT_CANVAS):
+    """Size of the canvas with the given name."""
+    if canvas not in CANVAS_SIZES:
+        raise ValueError(f"Unknown canvas '{canvas}', expected one of: {', '.join(CANVAS_SIZES)}")
+    return CANVAS_SIZES[canvas]
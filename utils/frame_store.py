@@ -0,0 +1,130 @@
+import os
+import threading
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+from PIL import Image
+
+PNG_COMPRESS_LEVEL = 1  # images handed over in memory are intermediates, favour encode speed
+FRAME_EXTENSION = ".npy"  # raw uint8 frames, see save_image
+PERSIST_WORKERS = 1  # background PNG writers; encoding must not compete with rendering for cores
+
+
+def _key(path: str) -> str:
+    return os.path.abspath(path)
+
+
+def save_image(image: Image.Image, path: str, compress_level: int = PNG_COMPRESS_LEVEL):
+    """
+    Write an image atomically. A path ending in .npy gets the raw uint8 pixels, which cost
+    nothing to encode and are memory-mapped by load_image; any other path is saved by Pillow.
+    """
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    temp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+    if path.endswith(FRAME_EXTENSION):
+        with open(temp_path, "wb") as f:
+            np.save(f, np.asarray(image))
+    else:
+        image.save(temp_path, format=Image.registered_extensions()[os.path.splitext(path)[1].lower()],
+                   compress_level=compress_level)
+    os.replace(temp_path, path)
+
+
+def load_image(path: str) -> Image.Image:
+    """
+    The image for path: from the frame store if a stage handed it over in memory,
+    otherwise read from disk. Raw .npy frames are memory-mapped rather than read and
+    decoded, so the only copy made is the one Pillow needs.
+    """
+    image = get_frame_store().get(path)
+    if image is not None:
+        return image
+    if path.endswith(FRAME_EXTENSION):
+        return Image.fromarray(np.load(path, mmap_mode="r"))
+    with Image.open(path) as opened:
+        opened.load()
+        return opened.copy()
+
+
+class FrameStore:
+    """
+    Decoded images handed from one pipeline stage to the next in memory, keyed by the
+    path the image has (or would have) on disk, so stages keep passing paths around and
+    only the reads change (see load_image). An image put with persist=True is also
+    written to its path (see save_image) by a background writer, off the critical path;
+    with persist=False it is never written at all.
+    Images stay in memory until they are discarded, so stages release what they no
+    longer need. Safe to use from several threads at once.
+    """
+
+    def __init__(self, persist_workers: int = PERSIST_WORKERS):
+        self._images: Dict[str, Image.Image] = {}
+        self._writes: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+        self._writer = ThreadPoolExecutor(max_workers=persist_workers, thread_name_prefix="frame-writer")
+
+    def put(self, path: str, image: Image.Image, persist: bool = True, compress_level: int = PNG_COMPRESS_LEVEL):
+        key = _key(path)
+        with self._lock:
+            self._images[key] = image
+            if persist:
+                self._writes[key] = self._writer.submit(save_image, image, path, compress_level)
+
+    def get(self, path: str) -> Optional[Image.Image]:
+        with self._lock:
+            return self._images.get(_key(path))
+
+    def pop(self, path: str) -> Optional[Image.Image]:
+        """Take the image for path out of the store, for its last reader."""
+        with self._lock:
+            return self._images.pop(_key(path), None)
+
+    def discard(self, paths: Iterable[str]):
+        with self._lock:
+            for path in paths:
+                self._images.pop(_key(path), None)
+
+    def discard_under(self, directory: str):
+        """Release every image whose path is inside directory, e.g. a finished run's workspace."""
+        prefix = _key(directory) + os.sep
+        with self._lock:
+            for key in [key for key in self._images if key.startswith(prefix)]:
+                del self._images[key]
+
+    def flush(self, directory: Optional[str] = None) -> List[str]:
+        """
+        Wait until the background writes of images inside directory (all of them by
+        default) are done. Returns the paths written; a failed write raises.
+        """
+        prefix = _key(directory) + os.sep if directory is not None else ""
+        with self._lock:
+            writes = {key: future for key, future in self._writes.items() if key.startswith(prefix)}
+        wait(writes.values())
+        with self._lock:
+            for key, future in writes.items():
+                if self._writes.get(key) is future:
+                    del self._writes[key]
+        for future in writes.values():
+            future.result()
+        return list(writes)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._images)
+
+
+_frame_store = None
+_frame_store_lock = threading.Lock()
+
+
+def get_frame_store() -> FrameStore:
+    """
+    Get or create the frame store shared by every stage.
+    """
+    global _frame_store
+    with _frame_store_lock:
+        if _frame_store is None:
+            _frame_store = FrameStore()
+    return _frame_store
@@ -5,4 +5,12 @@ def clean_json_input(json_str: str) -> str:
     # Remove markdown code block markers if present
     json_str = json_str.replace("```json", "").replace("```", "")
     # Remove any leading/trailing whitespace
-    return json_str.strip()
\ No newline at end of file
+    return json_str.strip()
+
+
+def get_topic_folder_name(topic: str) -> str:
+    """
+    Turn a topic into a folder or file name friendly slug.
+    """
+    folder_name = "".join(c if c.isalnum() else "_" for c in topic.lower())
+    return "_".join(folder_name.split())
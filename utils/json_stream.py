@@ -0,0 +1,61 @@
+import json
+from typing import Any, List
+
+
+class JsonArrayStream:
+    """
+    Incremental parser for a JSON array of objects arriving in chunks, e.g. a streamed
+    chat completion. Every top level object is returned as soon as its closing brace
+    arrives, without waiting for the rest of the array. Text before the opening bracket
+    (such as a markdown code fence) is ignored.
+    """
+
+    def __init__(self):
+        self._buffer = ""
+        self._position = 0
+        self._started = False
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+        self._object_start = None
+        self.items: List[Any] = []
+
+    def feed(self, text: str) -> List[Any]:
+        """
+        Add the next chunk of text. Returns the objects completed by this chunk.
+        """
+        self._buffer += text
+        completed = []
+        while self._position < len(self._buffer):
+            char = self._buffer[self._position]
+            if not self._started:
+                self._started = char == "["
+            elif self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                self._in_string = True
+            elif char in "{[":
+                if self._depth == 0 and char == "{":
+                    self._object_start = self._position
+                self._depth += 1
+            elif char in "}]":
+                self._depth -= 1
+                if self._depth == 0 and self._object_start is not None:
+                    completed.append(json.loads(self._buffer[self._object_start:self._position + 1]))
+                    self._object_start = None
+            self._position += 1
+
+        # Drop text that belongs to objects already returned
+        keep_from = self._object_start if self._object_start is not None else self._position
+        self._buffer = self._buffer[keep_from:]
+        self._position -= keep_from
+        if self._object_start is not None:
+            self._object_start = 0
+
+        self.items.extend(completed)
+        return completed
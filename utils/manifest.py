@@ -0,0 +1,131 @@
+import json
+import os
+import threading
+import time
+import uuid
+from typing import Any, Dict, Iterable, List, Optional
+
+from utils.asset_cache import AssetCache
+from utils.workspace import Workspace
+
+MANIFEST_FILE_NAME = "manifest.json"
+
+COMPLETE = "complete"
+
+
+class RunManifest:
+    """
+    Record of every asset a run has produced, stored as manifest.json in the run's
+    workspace: for each asset (named like the pipeline task that produces it, e.g.
+    "audio_3" or "titled_2_1") its path, size, sha256 and the checksums of the assets it
+    was made from. An asset counts as complete only while its file still matches the
+    recorded checksum and its inputs have not changed since, so a resumed run redoes
+    missing, corrupt and stale assets and nothing else.
+    Safe to use from several threads at once; the file is rewritten atomically after
+    every change, so a crash never leaves a half written manifest.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.info: Dict[str, Any] = {}
+        self.assets: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        if os.path.exists(path):
+            with open(path, "r") as f:
+                data = json.load(f)
+            self.info = data.get("info", {})
+            self.assets = data.get("assets", {})
+
+    @classmethod
+    def for_workspace(cls, workspace: Workspace) -> "RunManifest":
+        return cls(os.path.join(workspace.root, MANIFEST_FILE_NAME))
+
+    def _save(self):
+        # Called with the lock held
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        temp_path = f"{self.path}.{uuid.uuid4().hex}.tmp"
+        with open(temp_path, "w") as f:
+            json.dump({"info": self.info, "assets": self.assets}, f, indent=2)
+        os.replace(temp_path, self.path)
+
+    def set_info(self, **info: Any):
+        """
+        Store details about the run itself, e.g. the topic, needed to resume it.
+        """
+        with self._lock:
+            self.info.update(info)
+            self._save()
+
+    def record(self, name: str, path: str, inputs: Iterable[str] = ()):
+        """
+        Mark an asset as complete: checksum the file at path and remember which
+        recorded assets it was made from.
+        """
+        entry = {
+            "path": path,
+            "state": COMPLETE,
+            "size": os.path.getsize(path),
+            "sha256": AssetCache.hash_file(path),
+            "finished_at": time.time(),
+        }
+        with self._lock:
+            entry["inputs"] = {dep: self.assets.get(dep, {}).get("sha256") for dep in inputs}
+            self.assets[name] = entry
+            self._save()
+
+    def invalidate(self, name: str):
+        with self._lock:
+            if self.assets.pop(name, None) is not None:
+                self._save()
+
+    def is_complete(self, name: str) -> bool:
+        """
+        True if the asset was recorded, its file still has the recorded size and
+        checksum, and the assets it was made from are unchanged.
+        """
+        with self._lock:
+            entry = self.assets.get(name)
+            if entry is None or entry.get("state") != COMPLETE:
+                return False
+            inputs_unchanged = all(
+                self.assets.get(dep, {}).get("sha256") == sha256 for dep, sha256 in entry.get("inputs", {}).items()
+            )
+        if not inputs_unchanged:
+            return False
+
+        path = entry["path"]
+        try:
+            if os.path.getsize(path) != entry["size"]:
+                return False
+            return AssetCache.hash_file(path) == entry["sha256"]
+        except OSError:
+            return False
+
+    def missing(self, names: Iterable[str]) -> List[str]:
+        """
+        The assets among names that are not complete.
+        """
+        return [name for name in names if not self.is_complete(name)]
+
+    def recorded_sha256(self, name: str, path: str) -> Optional[str]:
+        """
+        The recorded checksum of the asset, if its file is the one at path and looks
+        unchanged since it was recorded (same size, not modified after): a stat, where
+        is_complete reads the whole file. None if it cannot be trusted.
+        """
+        with self._lock:
+            entry = self.assets.get(name)
+        if entry is None or entry.get("state") != COMPLETE or os.path.normpath(entry["path"]) != os.path.normpath(path):
+            return None
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        if stat.st_size != entry["size"] or stat.st_mtime > entry["finished_at"]:
+            return None
+        return entry["sha256"]
+
+    def path_of(self, name: str) -> Optional[str]:
+        with self._lock:
+            entry = self.assets.get(name)
+            return entry["path"] if entry else None
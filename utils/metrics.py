@@ -0,0 +1,190 @@
+import json
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple
+
+# Upper bounds (seconds) of the histogram buckets, shared by every duration metric
+DURATION_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+MAX_SAMPLES = 10000  # per histogram, for the percentiles in the JSON report
+
+METRICS_JSON_FILE_NAME = "metrics.json"
+METRICS_PROMETHEUS_FILE_NAME = "metrics.prom"
+
+METRIC_HELP = {
+    "stage_seconds": "Duration of pipeline tasks by stage",
+    "stage_tasks_total": "Pipeline tasks by stage and outcome",
+    "bytes_written_total": "Bytes of assets written, by stage",
+    "api_request_seconds": "OpenAI request latency until the response headers arrive",
+    "api_queue_seconds": "Time OpenAI calls waited for the rate limit governor",
+    "api_requests_total": "OpenAI requests by endpoint and outcome",
+    "api_retries_total": "Retried OpenAI calls, by operation",
+    "api_bytes_received_total": "Bytes of audio and image data received from OpenAI",
+    "titled_image_step_seconds": "Duration of the steps of composing a titled image",
+    "segment_step_seconds": "Time segment renders spent decoding images, rendering frames, waiting on and flushing x264",
+    "run_seconds": "Wall time of a whole pipeline run",
+    "list_item_arrival_seconds": "Time from the start of the list stream until each item was complete",
+}
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+class Histogram:
+    def __init__(self, buckets=DURATION_BUCKETS):
+        self.buckets = buckets
+        self.bucket_counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+        self.samples: List[float] = []
+
+    def observe(self, value: float):
+        self.count += 1
+        self.sum += value
+        for k, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.bucket_counts[k] += 1
+        if len(self.samples) < MAX_SAMPLES:
+            self.samples.append(value)
+
+    def percentile(self, q: float) -> Optional[float]:
+        if not self.samples:
+            return None
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, max(0, math.ceil(q * len(ordered)) - 1))]
+
+
+class MetricsRegistry:
+    """
+    Counters and latency histograms for one pipeline run, keyed by name and labels.
+    Safe to use from several threads at once. Written out at the end of a run as a
+    JSON report and as a Prometheus text format file.
+    """
+
+    def __init__(self):
+        self.counters: Dict[Tuple[str, LabelKey], float] = {}
+        self.histograms: Dict[Tuple[str, LabelKey], Histogram] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(name: str, labels: Dict[str, str]) -> Tuple[str, LabelKey]:
+        return name, tuple(sorted((label, str(value)) for label, value in labels.items()))
+
+    def increment(self, name: str, amount: float = 1, **labels):
+        key = self._key(name, labels)
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + amount
+
+    def observe(self, name: str, value: float, **labels):
+        key = self._key(name, labels)
+        with self._lock:
+            if key not in self.histograms:
+                self.histograms[key] = Histogram()
+            self.histograms[key].observe(value)
+
+    @contextmanager
+    def timer(self, name: str, **labels):
+        """Observe how long the with block takes, whether or not it raises."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            counters = [
+                {"name": name, "labels": dict(labels), "value": value}
+                for (name, labels), value in sorted(self.counters.items())
+            ]
+            histograms = []
+            for (name, labels), histogram in sorted(self.histograms.items()):
+                histograms.append({
+                    "name": name,
+                    "labels": dict(labels),
+                    "count": histogram.count,
+                    "sum": round(histogram.sum, 6),
+                    "mean": round(histogram.sum / histogram.count, 6) if histogram.count else None,
+                    "p50": histogram.percentile(0.5),
+                    "p95": histogram.percentile(0.95),
+                    "max": max(histogram.samples) if histogram.samples else None,
+                    "buckets": {str(bound): count for bound, count in zip(histogram.buckets, histogram.bucket_counts)},
+                })
+        return {"counters": counters, "histograms": histograms}
+
+    def to_prometheus(self) -> str:
+        def format_labels(labels: LabelKey, extra: Tuple[Tuple[str, str], ...] = ()) -> str:
+            pairs = list(labels) + list(extra)
+            if not pairs:
+                return ""
+            escaped = (value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, value in pairs)
+            return "{" + ",".join(f'{label}="{value}"' for (label, _), value in zip(pairs, escaped)) + "}"
+
+        lines = []
+        described = set()
+
+        def describe(name: str, metric_type: str):
+            if name not in described:
+                described.add(name)
+                lines.append(f"# HELP {name} {METRIC_HELP.get(name, name)}")
+                lines.append(f"# TYPE {name} {metric_type}")
+
+        with self._lock:
+            for (name, labels), value in sorted(self.counters.items()):
+                describe(name, "counter")
+                lines.append(f"{name}{format_labels(labels)} {value:g}")
+            for (name, labels), histogram in sorted(self.histograms.items()):
+                describe(name, "histogram")
+                for bound, count in zip(histogram.buckets, histogram.bucket_counts):
+                    lines.append(f"{name}_bucket{format_labels(labels, (('le', f'{bound:g}'),))} {count}")
+                lines.append(f"{name}_bucket{format_labels(labels, (('le', '+Inf'),))} {histogram.count}")
+                lines.append(f"{name}_sum{format_labels(labels)} {histogram.sum:.6f}")
+                lines.append(f"{name}_count{format_labels(labels)} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+    def write_report(self, directory: str, info: Optional[dict] = None) -> Tuple[str, str]:
+        """
+        Write metrics.json and metrics.prom to directory. Returns both paths.
+        """
+        os.makedirs(directory, exist_ok=True)
+        json_path = os.path.join(directory, METRICS_JSON_FILE_NAME)
+        prometheus_path = os.path.join(directory, METRICS_PROMETHEUS_FILE_NAME)
+        with open(json_path, "w") as f:
+            json.dump({"info": info or {}, **self.to_dict()}, f, indent=2)
+        with open(prometheus_path, "w") as f:
+            f.write(self.to_prometheus())
+        return json_path, prometheus_path
+
+
+_default_registry = MetricsRegistry()
+_active = threading.local()
+
+
+def get_metrics() -> MetricsRegistry:
+    """
+    The registry of the run the current thread is working for (see use_metrics),
+    or the process wide default registry outside of a run.
+    """
+    return getattr(_active, "registry", None) or _default_registry
+
+
+@contextmanager
+def use_metrics(registry: MetricsRegistry):
+    """
+    Send everything the current thread records inside the with block to registry.
+    Pipeline tasks run on shared pools, so each task activates its run's registry.
+    """
+    previous = getattr(_active, "registry", None)
+    _active.registry = registry
+    try:
+        yield registry
+    finally:
+        _active.registry = previous
+
+
+def record_retry(retry_state):
+    """
+    tenacity before_sleep hook counting retried calls by function name.
+    """
+    get_metrics().increment("api_retries_total", operation=retry_state.fn.__name__ if retry_state.fn else "unknown")
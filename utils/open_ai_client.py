@@ -1,6 +1,4 @@
 import os
-from openai import OpenAI
-from dotenv import load_dotenv
 
 _client = None
 
@@ -8,9 +6,17 @@ def get_open_ai_client():
     """
     Get or create a singleton instance of the OpenAI client.
     This ensures we only create one client instance across the application.
+    Set OPENAI_BASE_URL to point the client at a different server, e.g. a local stub.
+    The client's own retries are disabled so that every 429 reaches the shared
+    rate limit governor (utils/rate_limiter.py).
+    The openai package is imported on first use, since importing it takes most of a
+    second and stages that make no API calls never need it.
     """
     global _client
     if _client is None:
+        from dotenv import load_dotenv
+        from openai import OpenAI
+
         load_dotenv()
-        _client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+        _client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"), base_url=os.getenv("OPENAI_BASE_URL"), max_retries=0)
     return _client
\ No newline at end of file
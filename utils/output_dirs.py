@@ -1,5 +1,18 @@
-AUDIO_OUTPUT_DIR = "outputs/audio_output"
-IMAGE_OUTPUT_DIR = "outputs/image_output"
-JSON_OUTPUT_DIR = "outputs/json_output"
-TITLED_IMAGE_OUTPUT_DIR = "outputs/titled_image_output"
-VIDEO_OUTPUT_DIR = "outputs/video_output"
\ No newline at end of file
+OUTPUTS_DIR = "outputs"
+AUDIO_OUTPUT_DIR = f"{OUTPUTS_DIR}/audio_output"
+IMAGE_OUTPUT_DIR = f"{OUTPUTS_DIR}/image_output"
+JSON_OUTPUT_DIR = f"{OUTPUTS_DIR}/json_output"
+TITLED_IMAGE_OUTPUT_DIR = f"{OUTPUTS_DIR}/titled_image_output"
+VIDEO_OUTPUT_DIR = f"{OUTPUTS_DIR}/video_output"
+SEGMENT_OUTPUT_DIR = f"{OUTPUTS_DIR}/segment_output"
+BATCH_OUTPUT_DIR = f"{OUTPUTS_DIR}/batch_output"
+RUNS_DIR = f"{OUTPUTS_DIR}/runs"  # per-run workspaces, see utils/workspace.py
+
+CACHE_DIR = "cache"
+AUDIO_CACHE_DIR = f"{CACHE_DIR}/audio"
+IMAGE_CACHE_DIR = f"{CACHE_DIR}/images"
+SEGMENT_CACHE_DIR = f"{CACHE_DIR}/segments"
+
+GENERATED_DATA_DIR = "generated_data"  # archived lists, audio and images, see utils/archive.py
+ARCHIVE_BLOB_DIR = f"{GENERATED_DATA_DIR}/blobs"
+ARCHIVE_MANIFEST_DIR = f"{GENERATED_DATA_DIR}/manifests"
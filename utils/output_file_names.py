@@ -1,4 +1,9 @@
-from utils.output_dirs import JSON_OUTPUT_DIR, VIDEO_OUTPUT_DIR
+from utils.canvas import DEFAULT_CANVAS
+from utils.output_dirs import JSON_OUTPUT_DIR
+
+# Format of the titled images the renderer reads: "npy" (raw uint8 frames, memory-mapped
+# by the renderer, nothing to encode or decode) or "png" (about 30x smaller, slow to write and read)
+TITLED_IMAGE_FORMAT = "npy"
 
 
 def get_image_file_name(item_number: int, prompt_number: int):
@@ -7,14 +12,19 @@ def get_image_file_name(item_number: int, prompt_number: int):
 def get_audio_file_name(item_number: int):
     return f"item_{item_number:02d}.mp3"
 
-def get_video_file_name():
-    return f"final_video_short.mp4"
+def get_video_file_name(canvas: str = DEFAULT_CANVAS):
+    if canvas == DEFAULT_CANVAS:
+        return "final_video_short.mp4"
+    return f"final_video_short_{canvas}.mp4"
 
-def get_titled_image_file_name(item_number: int, prompt_number: int):
-    return f"item_{item_number:02d}_prompt_{prompt_number:02d}_short.png"
+def get_segment_file_name(item_number: int):
+    return f"segment_{item_number:02d}.mp4"
 
-def get_list_items_path():
-    return f"{JSON_OUTPUT_DIR}/list_items_with_prompts.json"
+def get_titled_image_file_name(item_number: int, prompt_number: int, image_format: str = TITLED_IMAGE_FORMAT):
+    return f"item_{item_number:02d}_prompt_{prompt_number:02d}_short.{image_format}"
 
-def get_video_output_path():
-    return f"{VIDEO_OUTPUT_DIR}/final_video_short.mp4"
\ No newline at end of file
+def get_list_items_file_name():
+    return "list_items_with_prompts.json"
+
+def get_list_items_path():
+    return f"{JSON_OUTPUT_DIR}/{get_list_items_file_name()}"
\ No newline at end of file
@@ -0,0 +1,63 @@
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, List, Optional, Sequence, Tuple
+
+
+def get_process_context():
+    """
+    Start method for every process pool: forkserver where available, spawn otherwise.
+    Pools are started while the scheduler's thread pools are running, and forking a
+    process with other threads can leave the child stuck on a lock one of them held.
+    """
+    if "forkserver" in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context("forkserver")
+    return multiprocessing.get_context("spawn")
+
+
+def run_in_parallel(
+    func: Callable[..., Any],
+    args_list: Sequence[Tuple],
+    max_workers: int = 1,
+    on_error: Optional[Callable[[int, Tuple, Exception], None]] = None,
+    use_processes: bool = False,
+) -> List[Any]:
+    """
+    Run func(*args) for every entry in args_list with at most max_workers calls in flight.
+    Results are returned in the same order as args_list. A failing call does not stop the
+    others: its slot in the result list is None and on_error(index, args, exception) is called.
+
+    Args:
+        func (Callable): Function to call for each entry
+        args_list (Sequence[Tuple]): Positional arguments for each call
+        max_workers (int): Maximum number of concurrent calls (1 runs everything serially)
+        on_error (Callable, optional): Callback invoked for every failed call
+        use_processes (bool): Run the calls in a process pool instead of a thread pool,
+            for CPU bound work. func and its arguments must be picklable.
+    """
+    results: List[Any] = [None] * len(args_list)
+
+    def handle_error(index: int, args: Tuple, e: Exception):
+        if on_error is not None:
+            on_error(index, args, e)
+
+    if max_workers <= 1:
+        for index, args in enumerate(args_list):
+            try:
+                results[index] = func(*args)
+            except Exception as e:
+                handle_error(index, args, e)
+        return results
+
+    if use_processes:
+        executor = ProcessPoolExecutor(max_workers=max_workers, mp_context=get_process_context())
+    else:
+        executor = ThreadPoolExecutor(max_workers=max_workers)
+    with executor:
+        futures = [executor.submit(func, *args) for args in args_list]
+        for index, future in enumerate(futures):
+            try:
+                results[index] = future.result()
+            except Exception as e:
+                handle_error(index, args_list[index], e)
+
+    return results
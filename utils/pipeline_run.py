@@ -0,0 +1,103 @@
+import os
+import time
+from typing import Any, Callable, Iterable, List, Optional
+
+from utils.canvas import DEFAULT_CANVAS
+from utils.frame_store import get_frame_store
+from utils.manifest import RunManifest
+from utils.metrics import MetricsRegistry, use_metrics
+from utils.workspace import Workspace
+
+
+class PipelineRun:
+    """
+    What the tasks of one pipeline run share: the workspace they write to, the run
+    manifest recording finished assets, and the metrics registry timing every stage.
+    With resume=True, assets the manifest already has complete are reused.
+    With in_memory=True, images are handed from stage to stage through the frame store
+    instead of being written and read back; persist_images=False skips writing the
+    titled images altogether. profile names the encoding profile of the video, and
+    canvases the canvases it is laid out on (just the default 9:16 one unless given).
+    """
+
+    def __init__(self, workspace: Workspace, resume: bool = False, in_memory: bool = False,
+                 persist_images: bool = True, profile: Optional[str] = None, canvases: Optional[List[str]] = None):
+        self.workspace = workspace
+        self.manifest = RunManifest.for_workspace(workspace)
+        self.metrics = MetricsRegistry()
+        self.resume = resume
+        self.in_memory = in_memory
+        self.persist_images = persist_images
+        self.profile = profile
+        self.canvases = canvases or [DEFAULT_CANVAS]
+        self.started_at = time.perf_counter()
+
+    @property
+    def renders_canvases(self) -> bool:
+        """Whether the video is rendered on other canvases than the default one, in one pass."""
+        return self.canvases != [DEFAULT_CANVAS]
+
+    def task(self, name: str, func: Callable[[], Any], path: Optional[str] = None, inputs: Iterable[str] = (),
+             reuse: Optional[Callable[[], Any]] = None) -> Callable[[], Any]:
+        """
+        Wrap func as a scheduler task. The task is timed under its stage (the task name up
+        to the first underscore) and everything it records goes to this run's metrics.
+        If path is given, the asset written there is recorded in the manifest under name:
+        the inputs (names of other assets) must be complete before func runs, so nothing is
+        built, and no render starts, from missing or corrupt files, and when resuming an
+        asset that is already complete is not made again: reuse() is returned instead
+        (the path by default).
+        """
+        stage = name.split("_")[0]
+        inputs = list(inputs)
+
+        def produce():
+            # Returns the result and the outcome the task is counted under
+            if path is None:
+                return func(), "done"
+            if self.resume and self.manifest.is_complete(name):
+                print(f"Resuming: {name} is complete, reusing {path}")
+                return (reuse() if reuse is not None else path), "reused"
+            missing = self.manifest.missing(inputs)
+            if missing:
+                raise RuntimeError(f"Cannot make {name}, missing or corrupt inputs: {', '.join(missing)}")
+            result = func()
+            self.manifest.record(name, path, inputs)
+            self.metrics.increment("bytes_written_total", os.path.getsize(path), stage=stage)
+            return result, "done"
+
+        def run():
+            with use_metrics(self.metrics):
+                started_at = time.perf_counter()
+                outcome = "failed"
+                try:
+                    result, outcome = produce()
+                    return result
+                finally:
+                    self.metrics.observe("stage_seconds", time.perf_counter() - started_at, stage=stage)
+                    self.metrics.increment("stage_tasks_total", stage=stage, outcome=outcome)
+
+        return run
+
+    def release(self):
+        """
+        Wait for the run's images to be written in the background, then drop whatever
+        the run still holds in the frame store.
+        """
+        store = get_frame_store()
+        try:
+            store.flush(self.workspace.root)
+        except Exception as e:
+            print(f"Error writing images handed over in memory: {str(e)}")
+        store.discard_under(self.workspace.root)
+
+    def write_report(self, **info: Any):
+        """
+        Write this run's metrics to metrics.json and metrics.prom in the workspace.
+        """
+        self.metrics.observe("run_seconds", time.perf_counter() - self.started_at)
+        json_path, prometheus_path = self.metrics.write_report(
+            self.workspace.root, {"workspace": self.workspace.root, "resume": self.resume, "in_memory": self.in_memory,
+             "encoding_profile": self.profile, "canvases": self.canvases, **info}
+        )
+        print(f"Metrics written to {json_path} and {prometheus_path}")
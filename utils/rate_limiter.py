@@ -0,0 +1,258 @@
+import re
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from typing import Any, Callable, Dict, Mapping, Optional
+
+from tenacity import wait_exponential
+
+from utils.metrics import get_metrics
+
+ENDPOINT_CHAT = "chat"
+ENDPOINT_AUDIO_SPEECH = "audio.speech"
+ENDPOINT_IMAGES = "images"
+
+# Starting limits per endpoint. The request rate is corrected from the
+# x-ratelimit-* response headers once the API reports the real limits.
+DEFAULT_LIMITS = {
+    ENDPOINT_CHAT: {"requests_per_minute": 60, "max_concurrency": 4},
+    ENDPOINT_AUDIO_SPEECH: {"requests_per_minute": 50, "max_concurrency": 8},
+    ENDPOINT_IMAGES: {"requests_per_minute": 12, "max_concurrency": 4},
+}
+
+DEFAULT_RETRY_AFTER = 5  # seconds, used when a 429 carries no Retry-After header
+
+_DURATION_PART = re.compile(r"(\d+(?:\.\d+)?)(ms|s|m|h)")
+_DURATION_UNITS = {"ms": 0.001, "s": 1, "m": 60, "h": 3600}
+
+
+def parse_duration(value: str) -> Optional[float]:
+    """
+    Parse an OpenAI reset duration such as "20ms", "1s" or "6m0s" into seconds.
+    """
+    parts = _DURATION_PART.findall(value or "")
+    if not parts:
+        return None
+    return sum(float(amount) * _DURATION_UNITS[unit] for amount, unit in parts)
+
+
+def parse_retry_after(headers: Mapping[str, str]) -> Optional[float]:
+    """
+    Read how long to back off from Retry-After style headers, in seconds.
+    Supports retry-after-ms, retry-after in seconds and retry-after as an HTTP date.
+    """
+    retry_after_ms = headers.get("retry-after-ms")
+    if retry_after_ms:
+        try:
+            return float(retry_after_ms) / 1000
+        except ValueError:
+            pass
+
+    retry_after = headers.get("retry-after")
+    if retry_after:
+        try:
+            return float(retry_after)
+        except ValueError:
+            try:
+                return max(0.0, parsedate_to_datetime(retry_after).timestamp() - time.time())
+            except (TypeError, ValueError):
+                pass
+    return None
+
+
+def is_rate_limit_error(e: BaseException) -> bool:
+    return getattr(e, "status_code", None) == 429
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket. acquire() blocks until a token is available and
+    pause_until() stops handing out tokens until the given time.
+    """
+
+    def __init__(self, rate_per_second: float, capacity: float):
+        self.rate = rate_per_second
+        self.capacity = capacity
+        self.tokens = capacity
+        self.blocked_until = 0.0
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if now < self.blocked_until:
+                    wait = self.blocked_until - now
+                elif self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                else:
+                    wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+    def pause_until(self, until: float):
+        with self._lock:
+            self.blocked_until = max(self.blocked_until, until)
+            self.tokens = 0
+
+    def set_rate(self, rate_per_second: float):
+        with self._lock:
+            self._refill(time.monotonic())
+            self.rate = rate_per_second
+
+
+class AdaptiveConcurrencyLimiter:
+    """
+    Additive-increase / multiplicative-decrease limit on requests in flight.
+    Every success grows the limit by roughly one per window, every throttled
+    request halves it.
+    """
+
+    def __init__(self, max_concurrency: int, initial: Optional[float] = None):
+        self.max_concurrency = max_concurrency
+        self.limit = float(initial if initial is not None else max_concurrency)
+        self.in_flight = 0
+        self._condition = threading.Condition()
+
+    def acquire(self):
+        with self._condition:
+            while self.in_flight >= max(1, int(self.limit)):
+                self._condition.wait()
+            self.in_flight += 1
+
+    def release(self, throttled: bool = False):
+        with self._condition:
+            self.in_flight -= 1
+            if throttled:
+                self.limit = max(1.0, self.limit / 2)
+            else:
+                self.limit = min(float(self.max_concurrency), self.limit + 1 / self.limit)
+            self._condition.notify_all()
+
+
+class EndpointGovernor:
+    """
+    Rate limiting state for a single OpenAI endpoint.
+    """
+
+    def __init__(self, name: str, requests_per_minute: float, max_concurrency: int):
+        self.name = name
+        self.bucket = TokenBucket(requests_per_minute / 60, capacity=max_concurrency)
+        self.concurrency = AdaptiveConcurrencyLimiter(max_concurrency)
+
+    def observe_headers(self, headers: Mapping[str, str]):
+        """
+        Update the request rate and pause the bucket based on x-ratelimit-* headers.
+        """
+        limit = headers.get("x-ratelimit-limit-requests")
+        if limit:
+            try:
+                self.bucket.set_rate(max(float(limit), 1.0) / 60)
+            except ValueError:
+                pass
+
+        remaining = headers.get("x-ratelimit-remaining-requests")
+        if remaining == "0":
+            reset = parse_duration(headers.get("x-ratelimit-reset-requests", ""))
+            if reset:
+                self.bucket.pause_until(time.monotonic() + reset)
+
+    def observe_rate_limited(self, headers: Mapping[str, str]):
+        retry_after = parse_retry_after(headers)
+        if retry_after is None:
+            retry_after = parse_duration(headers.get("x-ratelimit-reset-requests", ""))
+        if retry_after is None:
+            retry_after = DEFAULT_RETRY_AFTER
+        self.bucket.pause_until(time.monotonic() + retry_after)
+        print(f"Rate limited on {self.name}, backing off for {retry_after:.1f}s")
+
+
+class RateLimitGovernor:
+    """
+    Shared rate limiter for every OpenAI call, with one token bucket and one
+    adaptive concurrency limit per endpoint.
+    """
+
+    def __init__(self, limits: Optional[Dict[str, Dict[str, float]]] = None):
+        self._limits = dict(DEFAULT_LIMITS if limits is None else limits)
+        self._endpoints: Dict[str, EndpointGovernor] = {}
+        self._lock = threading.Lock()
+
+    def endpoint(self, name: str) -> EndpointGovernor:
+        with self._lock:
+            if name not in self._endpoints:
+                limits = self._limits.get(name, DEFAULT_LIMITS[ENDPOINT_CHAT])
+                self._endpoints[name] = EndpointGovernor(
+                    name, limits["requests_per_minute"], int(limits["max_concurrency"])
+                )
+            return self._endpoints[name]
+
+    def call(self, endpoint: str, func: Callable[[], Any]) -> Any:
+        """
+        Call func once the endpoint has capacity and return the parsed response.
+        func must return a raw response (client.<resource>.with_raw_response.create(...))
+        so the rate limit headers can be read.
+        """
+        governor = self.endpoint(endpoint)
+        metrics = get_metrics()
+        queued_at = time.perf_counter()
+        governor.concurrency.acquire()
+        throttled = False
+        outcome = "error"
+        try:
+            governor.bucket.acquire()
+            started_at = time.perf_counter()
+            metrics.observe("api_queue_seconds", started_at - queued_at, endpoint=endpoint)
+            try:
+                raw_response = func()
+            finally:
+                metrics.observe("api_request_seconds", time.perf_counter() - started_at, endpoint=endpoint)
+            governor.observe_headers(raw_response.headers)
+            outcome = "ok"
+            return raw_response.parse()
+        except Exception as e:
+            if is_rate_limit_error(e):
+                throttled = True
+                outcome = "rate_limited"
+                response = getattr(e, "response", None)
+                governor.observe_rate_limited(response.headers if response is not None else {})
+            raise
+        finally:
+            metrics.increment("api_requests_total", endpoint=endpoint, outcome=outcome)
+            governor.concurrency.release(throttled=throttled)
+
+
+_governor = None
+_governor_lock = threading.Lock()
+
+
+def get_rate_limit_governor() -> RateLimitGovernor:
+    """
+    Get or create the singleton rate limit governor shared by every stage.
+    """
+    global _governor
+    with _governor_lock:
+        if _governor is None:
+            _governor = RateLimitGovernor()
+    return _governor
+
+
+_wait_on_error = wait_exponential(multiplier=1, min=4, max=10)
+
+
+def retry_wait(retry_state) -> float:
+    """
+    tenacity wait strategy for OpenAI calls. Rate limited attempts retry right
+    away because the governor already blocks until the endpoint is available
+    again; other errors back off exponentially.
+    """
+    exception = retry_state.outcome.exception() if retry_state.outcome else None
+    if exception is not None and is_rate_limit_error(exception):
+        return 0
+    return _wait_on_error(retry_state)
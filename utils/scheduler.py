@@ -0,0 +1,183 @@
+import os
+import threading
+import time
+from concurrent.futures import Executor, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+IO = "io"
+CPU = "cpu"
+RENDER = "render"
+
+PENDING = "pending"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+SKIPPED = "skipped"
+
+
+class Task:
+    """
+    A unit of work in the scheduler. func is called without arguments once every
+    task named in deps has finished successfully.
+    """
+
+    def __init__(self, name: str, func: Callable[[], Any], deps: Iterable[str] = (), kind: str = IO):
+        self.name = name
+        self.func = func
+        self.deps = list(deps)
+        self.kind = kind
+        self.state = PENDING
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+
+    @property
+    def duration(self) -> Optional[float]:
+        if self.started_at is None or self.finished_at is None:
+            return None
+        return self.finished_at - self.started_at
+
+
+class DagScheduler:
+    """
+    Runs tasks as soon as their dependencies are done. Network bound tasks (IO), CPU
+    bound tasks (CPU) and video renders (RENDER) run on separate pools, so image
+    processing overlaps API waits and renders are limited independently of API calls.
+    Pass executors in to share them between several schedulers.
+    Tasks may be added while the scheduler is running, e.g. from inside another task.
+    A failed task does not stop the others; tasks that depend on it are skipped.
+    """
+
+    def __init__(
+        self,
+        io_workers: int = 8,
+        cpu_workers: Optional[int] = None,
+        io_executor: Optional[Executor] = None,
+        cpu_executor: Optional[Executor] = None,
+        render_workers: Optional[int] = None,
+        render_executor: Optional[Executor] = None,
+    ):
+        self._owned_executors: List[Executor] = []
+        if io_executor is None:
+            io_executor = ThreadPoolExecutor(max_workers=io_workers, thread_name_prefix="io")
+            self._owned_executors.append(io_executor)
+        if cpu_executor is None:
+            cpu_executor = ThreadPoolExecutor(max_workers=cpu_workers or os.cpu_count() or 1, thread_name_prefix="cpu")
+            self._owned_executors.append(cpu_executor)
+        if render_executor is None:
+            render_executor = ThreadPoolExecutor(max_workers=render_workers or os.cpu_count() or 1, thread_name_prefix="render")
+            self._owned_executors.append(render_executor)
+        self._executors = {IO: io_executor, CPU: cpu_executor, RENDER: render_executor}
+        self.tasks: Dict[str, Task] = {}
+        # Pending tasks waiting on each task name, and how many of each pending task's
+        # dependencies are not done yet, so a finished task only looks at its dependents
+        self._dependents: Dict[str, List[Task]] = {}
+        self._remaining: Dict[str, int] = {}
+        self._in_flight = 0
+        self._condition = threading.Condition()
+
+    def add(self, name: str, func: Callable[[], Any], deps: Iterable[str] = (), kind: str = IO) -> Task:
+        """
+        Add a task. Dependencies may name tasks that have not been added yet.
+        """
+        task = Task(name, func, deps, kind)
+        with self._condition:
+            if name in self.tasks:
+                raise ValueError(f"Task '{name}' already exists")
+            self.tasks[name] = task
+            remaining = 0
+            for dep in dict.fromkeys(task.deps):
+                dep_state = self.tasks[dep].state if dep in self.tasks else PENDING
+                if dep_state in (FAILED, SKIPPED):
+                    self._skip(task)
+                    break
+                if dep_state != DONE:
+                    remaining += 1
+                    self._dependents.setdefault(dep, []).append(task)
+            else:
+                self._remaining[name] = remaining
+                if remaining == 0:
+                    self._submit(task)
+            self._condition.notify_all()
+        return task
+
+    def result(self, name: str) -> Any:
+        return self.tasks[name].result
+
+    def _submit(self, task: Task):
+        # Called with the condition held
+        del self._remaining[task.name]
+        task.state = RUNNING
+        self._in_flight += 1
+        self._executors[task.kind].submit(self._run_task, task)
+
+    def _skip(self, task: Task):
+        # Called with the condition held. Skipping a task skips its dependents too.
+        stack = [task]
+        while stack:
+            task = stack.pop()
+            if task.state != PENDING:
+                continue
+            task.state = SKIPPED
+            self._remaining.pop(task.name, None)
+            stack.extend(self._dependents.pop(task.name, []))
+
+    def _finished(self, task: Task):
+        # Called with the condition held
+        dependents = self._dependents.pop(task.name, [])
+        if task.state != DONE:
+            for dependent in dependents:
+                self._skip(dependent)
+            return
+        for dependent in dependents:
+            if dependent.state != PENDING:
+                continue
+            self._remaining[dependent.name] -= 1
+            if self._remaining[dependent.name] == 0:
+                self._submit(dependent)
+
+    def _run_task(self, task: Task):
+        task.started_at = time.monotonic()
+        try:
+            result = task.func()
+            state = DONE
+        except BaseException as e:
+            print(f"Task {task.name} failed: {str(e)}")
+            task.error = e
+            result, state = None, FAILED
+        task.finished_at = time.monotonic()
+        with self._condition:
+            task.result = result
+            task.state = state
+            self._in_flight -= 1
+            self._finished(task)
+            self._condition.notify_all()
+
+    def run(self) -> Dict[str, Task]:
+        """
+        Block until every task has finished, failed or been skipped.
+        Tasks still waiting on dependencies that were never added are skipped.
+        """
+        try:
+            with self._condition:
+                while True:
+                    if self._in_flight == 0:
+                        waiting = [task for task in self.tasks.values() if task.state == PENDING]
+                        if not waiting:
+                            break
+                        for task in waiting:
+                            print(f"Skipping task {task.name}: missing dependencies")
+                            self._skip(task)
+                        continue
+                    self._condition.wait()
+        finally:
+            for executor in self._owned_executors:
+                executor.shutdown(wait=True)
+        return self.tasks
+
+    def summary(self) -> Dict[str, int]:
+        counts: Dict[str, int] = {}
+        for task in self.tasks.values():
+            counts[task.state] = counts.get(task.state, 0) + 1
+        return counts
@@ -0,0 +1,111 @@
+import os
+import uuid
+from datetime import datetime
+from typing import Optional
+
+from utils.helper_functions import get_topic_folder_name
+from utils.output_dirs import (
+    AUDIO_OUTPUT_DIR,
+    IMAGE_OUTPUT_DIR,
+    JSON_OUTPUT_DIR,
+    OUTPUTS_DIR,
+    RUNS_DIR,
+    SEGMENT_OUTPUT_DIR,
+    TITLED_IMAGE_OUTPUT_DIR,
+    VIDEO_OUTPUT_DIR,
+)
+from utils.output_file_names import (
+    get_audio_file_name,
+    get_image_file_name,
+    get_list_items_file_name,
+    get_segment_file_name,
+    get_titled_image_file_name,
+    get_video_file_name,
+)
+
+
+class Workspace:
+    """
+    The output directories of one run. Every stage takes a workspace, so several runs
+    can work on the same machine at once without overwriting each other's files.
+    The default workspace (root "outputs") uses the directories in utils/output_dirs.py;
+    Workspace.for_run creates a fresh one under outputs/runs/. The caches are shared by
+    every workspace. Workspaces are plain values and can be sent to worker processes.
+    """
+
+    def __init__(self, root: str = OUTPUTS_DIR):
+        self.root = root
+
+    @classmethod
+    def for_run(cls, topic: Optional[str] = None) -> "Workspace":
+        """
+        Create a workspace for a new run, named after the topic and the start time.
+        """
+        run_id = datetime.now().strftime("%Y%m%d_%H%M%S") + "_" + uuid.uuid4().hex[:6]
+        if topic:
+            run_id = f"{get_topic_folder_name(topic)}_{run_id}"
+        return cls(os.path.join(RUNS_DIR, run_id))
+
+    def _dir(self, default_dir: str) -> str:
+        return os.path.join(self.root, os.path.relpath(default_dir, OUTPUTS_DIR))
+
+    @property
+    def audio_dir(self) -> str:
+        return self._dir(AUDIO_OUTPUT_DIR)
+
+    @property
+    def image_dir(self) -> str:
+        return self._dir(IMAGE_OUTPUT_DIR)
+
+    @property
+    def json_dir(self) -> str:
+        return self._dir(JSON_OUTPUT_DIR)
+
+    @property
+    def titled_image_dir(self) -> str:
+        return self._dir(TITLED_IMAGE_OUTPUT_DIR)
+
+    @property
+    def video_dir(self) -> str:
+        return self._dir(VIDEO_OUTPUT_DIR)
+
+    @property
+    def segment_dir(self) -> str:
+        return self._dir(SEGMENT_OUTPUT_DIR)
+
+    def audio_path(self, item_number: int) -> str:
+        return os.path.join(self.audio_dir, get_audio_file_name(item_number))
+
+    def image_path(self, item_number: int, prompt_number: int) -> str:
+        return os.path.join(self.image_dir, get_image_file_name(item_number, prompt_number))
+
+    def titled_image_path(self, item_number: int, prompt_number: int) -> str:
+        return os.path.join(self.titled_image_dir, get_titled_image_file_name(item_number, prompt_number))
+
+    def video_path(self, canvas: str) -> str:
+        """Path of the final video laid out on the given canvas."""
+        return os.path.join(self.video_dir, get_video_file_name(canvas))
+
+    def segment_path(self, item_number: int) -> str:
+        return os.path.join(self.segment_dir, get_segment_file_name(item_number))
+
+    @property
+    def list_items_path(self) -> str:
+        return os.path.join(self.json_dir, get_list_items_file_name())
+
+    @property
+    def video_output_path(self) -> str:
+        return os.path.join(self.video_dir, get_video_file_name())
+
+    def __repr__(self) -> str:
+        return f"Workspace({self.root!r})"
+
+
+DEFAULT_WORKSPACE = Workspace()
+
+
+def get_workspace(workspace: Optional[Workspace] = None) -> Workspace:
+    """
+    The given workspace, or the default one when running a single pipeline from outputs/.
+    """
+    return workspace if workspace is not None else DEFAULT_WORKSPACE